@@ -54,6 +54,7 @@ import appconsts
 import audiomonitoring
 import audiowaveformrenderer
 import boxmove
+import capabilitycache
 import clipeffectseditor
 import clipmenuaction
 import compositeeditor
@@ -69,6 +70,7 @@ import editorlayout
 import editorpersistance
 import editorstate
 import editorwindow
+import filmstriprenderer
 import gmic
 import gui
 import guicomponents
@@ -94,10 +96,10 @@ import processutils
 import projectaction
 import projectdata
 import projectinfogui
+import projectsnapshot
 import propertyeditorbuilder
 import proxyediting
 import render
-import renderconsumer
 import respaths
 import resync
 import rotomask
@@ -105,6 +107,7 @@ import sequence
 import shortcuts
 import shortcutsquickeffects
 import snapping
+import startuptiming
 import threading
 import titler
 import tlinerender
@@ -117,6 +120,7 @@ import updater
 import userfolders
 import utils
 import utilsgtk
+import workerserver
 import workflow
 
 
@@ -148,6 +152,8 @@ def main(root_path):
     Called at application start.
     Initializes application with a default project.
     """
+    startuptiming.start()
+
     # DEBUG: Direct output to log file if log file set.
     if _log_file != None:
         log_print_output_to_file()
@@ -196,6 +202,7 @@ def main(root_path):
         editorstate.display_all_audio_levels = False
 
     editorpersistance.save()
+    startuptiming.mark("User folders and prefs")
 
     # Init translations module with translations data.
     translations.init_languages()
@@ -217,6 +224,7 @@ def main(root_path):
 
     # We need respaths and translations data available so we need to do init in a function.
     workflow.init_data()
+    startuptiming.mark("Translations and shortcuts")
 
     # Init gtk threads
     Gdk.threads_init()
@@ -243,6 +251,7 @@ def main(root_path):
 
     # Load drag'n'drop images.
     dnd.init()
+    startuptiming.mark("Theme")
 
     # Save screen size data and modify rendering based on screen size/s and number of monitors. 
     scr_w, scr_h = _set_screen_size_data()
@@ -260,25 +269,25 @@ def main(root_path):
     # Set numeric locale to use "." as radix, MLT initilizes this to OS locale and this causes bugs.
     locale.setlocale(locale.LC_NUMERIC, 'C')
 
+    startuptiming.mark("MLT init")
+
     # Check for codecs and formats on the system exit if detection failed.
-    mltenv.check_available_features(repo)
-    if mltenv.environment_detection_success == False:
+    # Render profiles and filter and compositor descriptions from xml files are loaded too,
+    # from cache if MLT environment has not changed since last start.
+    if capabilitycache.init_capabilities(repo) == False:
         _failed_environment_exit()
         return
-        
-    renderconsumer.load_render_profiles()
+    startuptiming.mark("MLT capabilities")
 
-    # Load filter and compositor descriptions from xml files.
-    mltfilters.load_filters_xml(mltenv.services)
     mltfilters.set_icons(gui.get_default_filter_icon(), \
                          gui.get_filter_group_icons(gui.get_default_filter_icon()))
-    mlttransitions.load_compositors_xml(mltenv.transitions)
     
     # Replace some services if better replacements available.
     mltfilters.replace_services(mltenv.services)
 
     # Create list of available mlt profiles.
     mltprofiles.load_profile_list()
+    startuptiming.mark("Filters and profiles")
 
     # If we have crashed we could have large amount of disk space wasted unless we delete all files here.
     tlinerender.app_launch_clean_up()
@@ -309,6 +318,7 @@ def main(root_path):
 
     # Media Plugins a.k.a Generators.
     mediaplugin.init()
+    startuptiming.mark("Tools integration")
 
     # Create player object.
     create_player()
@@ -327,6 +337,7 @@ def main(root_path):
 
     # Editor and modules need some more initializing.
     init_editor_state()
+    startuptiming.mark("Player and GUI")
 
     # Tracks need to be re-centered if window is resized.
     # Connect listener for this now that the tline panel size allocation is sure to be available.
@@ -393,12 +404,30 @@ def main(root_path):
     global disk_cache_timeout_id
     disk_cache_timeout_id = GLib.timeout_add(2500, check_disk_cache_size)
 
+    # Headless renders are run in pre-started worker processes if enabled.
+    workerserver.start_server()
+
+    # Cached MLT capabilities are checked when start-up is done.
+    GLib.timeout_add(5000, _revalidate_capabilities, repo)
+
+    startuptiming.mark("Project and session")
+    GLib.idle_add(_startup_done)
+
     # Launch gtk+ main loop
     Gtk.main()
 
     Gdk.threads_leave()
 
 # ----------------------------------- callback setting
+def _startup_done():
+    startuptiming.mark("First main loop iteration")
+    startuptiming.print_report()
+    return False
+
+def _revalidate_capabilities(repo):
+    capabilitycache.revalidate_in_background(repo)
+    return False
+
 def monkeypatch_callbacks():
 
     # We need to do this on app start-up or
@@ -450,6 +479,8 @@ def monkeypatch_callbacks():
     containeractions.get_edited_plugin_clip = mediaplugin.get_clip
     
     boxmove.set_move_selection_from_box_selection_func = movemodes.select_from_box_selection
+
+    projectdata.thumbnail_updated_func = updater.media_file_thumbnail_updated
     
     # These provide clues for possible further refactoring.
 
@@ -663,6 +694,7 @@ def open_project(new_project):
 
     audiomonitoring.close_audio_monitor()
     audiowaveformrenderer.clear_cache()
+    filmstriprenderer.clear_cache()
 
     editorstate.project = new_project
     editorstate.media_view_filter = appconsts.SHOW_ALL_FILES
@@ -687,7 +719,7 @@ def open_project(new_project):
     global loaded_autosave_file
     if loaded_autosave_file != None:
         print("Deleting", loaded_autosave_file)
-        os.remove(loaded_autosave_file)
+        projectsnapshot.delete_snapshot(loaded_autosave_file)
         loaded_autosave_file = None
 
     editorstate.update_current_proxy_paths()
@@ -723,6 +755,9 @@ def _do_window_resized_update():
     updater.window_resized()
     
 def change_current_sequence(index):
+    if load_sequence(editorstate.project.sequences[index]) == False:
+        return
+
     edit.do_gui_update = False  # This should not be necessery but we are doing this signal intention that GUI updates are disabled
     
     stop_autosave()
@@ -750,11 +785,27 @@ def change_current_sequence(index):
 
     audiomonitoring.recreate_master_meter_filter_for_new_sequence()
     
+    persistance.sequence_opened(editorstate.project, editorstate.project.c_seq)
+
     start_autosave()
 
     updater.set_timeline_height()
     updater.init_tline_view()
 
+def load_sequence(seq):
+    """
+    Creates MLT objects for sequence not loaded with project, returns False and shows info if media is missing.
+    """
+    try:
+        persistance.load_sequence_mlt(seq)
+        return True
+    except persistance.FileProducerNotFoundError as e:
+        primary_txt = _("Media asset was missing!")
+        secondary_txt = _("Sequence '") + seq.name + _("' could not be opened.") + "\n\n" + \
+                        _("Path of missing asset:") + "\n   <b>" + e.value + "</b>"
+        dialogutils.warning_message(primary_txt, secondary_txt, gui.editor_window.window)
+        return False
+
 def display_current_sequence():
     # Get shorter alias.
     player = editorstate.player
@@ -782,7 +833,7 @@ def autosave_dialog_callback(dialog, response):
         projectaction.actually_load_project(autosave_file, True, False, True)
     else:
         tlinerender.init_session()  # didn't do this in main and not going to do app-open_project
-        os.remove(autosave_file)
+        projectsnapshot.delete_snapshot(autosave_file)
         start_autosave()
 
 def autosaves_many_recovery_dialog():
@@ -836,7 +887,7 @@ def start_autosave():
         print("Autosave started...")
         autosave_timeout_id = GLib.timeout_add(autosave_delay_millis, do_autosave)
         autosave_file = userfolders.get_cache_dir() + get_instance_autosave_file()
-        persistance.save_project(editorstate.PROJECT(), autosave_file)
+        persistance.save_project_snapshot(editorstate.PROJECT(), autosave_file)
     else:
         print("Autosave disabled...")
         stop_autosave()
@@ -854,7 +905,7 @@ def stop_autosave():
 
 def do_autosave():
     autosave_file = userfolders.get_cache_dir() + get_instance_autosave_file()
-    persistance.save_project(editorstate.PROJECT(), autosave_file)
+    persistance.save_project_snapshot(editorstate.PROJECT(), autosave_file)
     return True
 
 # ------------------------------------------------- splash screen
@@ -1110,10 +1161,11 @@ def _app_destroy():
     # Close threads and stop mlt consumers
     editorstate.player.shutdown() # has ticker thread and player threads running
     audiomonitoring.close()
+    workerserver.stop_server()
 
     # Delete autosave file
     try:
-        os.remove(userfolders.get_cache_dir() + get_instance_autosave_file())
+        projectsnapshot.delete_snapshot(userfolders.get_cache_dir() + get_instance_autosave_file())
     except:
         print("Delete autosave file FAILED!")
 
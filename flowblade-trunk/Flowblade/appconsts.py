@@ -149,12 +149,18 @@ CONVERTING_TO_USE_ORIGINAL_MEDIA = 3
 
 # Autosave directory relative path
 AUTOSAVE_DIR = "autosave/"
+AUTOSAVE_CHUNKS_DIR = "autosave_chunks/"
 
 # Hidden media folders
 # NOTE: We have not been fully consistant with the ending forward slashes.
 AUDIO_LEVELS_DIR = "audiolevels/"
 PROXIES_DIR = "proxies/"
+IMG_SEQ_PROXY_EXTENSIONS = {"png":"png", "jpeg":"jpg", "webp":"webp"} # Image sequence proxy frame format -> file extension
 THUMBNAILS_DIR = "thumbnails"
+FILMSTRIP_DIR = "filmstrip"
+CONTAINER_PREVIEWS_DIR = "container_previews"
+RENDER_CHUNKS_DIR = "render_chunks"
+CAPABILITIES_CACHE_FILE = "mlt_capabilities.pickle"
 RENDERED_CLIPS_DIR = "rendered_clips"
 TLINE_RENDERS_DIR = "tlinerenders"
 GMIC_DIR = "gmic"
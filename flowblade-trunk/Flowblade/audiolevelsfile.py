@@ -0,0 +1,242 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module handles computing audio levels data and reading and writing it in compact binary levels files.
+
+Levels file layout:
+    - header: magic, version, frame count, mip levels count
+    - for each mip level: uint8 peak levels followed by uint8 RMS levels.
+
+Mip level 0 has one value per frame, each following level has half the values of the previous level.
+Values are audio levels scaled into range 0-255 using IEC scale also used by MLT 'audiolevel' filter.
+"""
+
+import math
+import struct
+import subprocess
+
+import numpy as np
+
+import atomicfile
+
+
+LEVELS_FILE_EXTENSION = ".lvl"
+
+LEVELS_FILE_MAGIC = b"FBLEVELS"
+LEVELS_FILE_VERSION = 1
+HEADER_FORMAT = "<8sIII"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+MAX_MIP_LEVELS = 10
+
+ANALYSIS_SAMPLE_RATE = 16000 # This is enough for displaying levels and keeps decoded data small.
+READ_BLOCK_SECONDS = 10
+
+# MLT 'audiolevel' filter IEC scale as piecewise linear function of dB values.
+_IEC_DB_POINTS = [-70.0, -60.0, -50.0, -40.0, -30.0, -20.0, 0.0]
+_IEC_SCALE_POINTS = [0.0, 0.025, 0.075, 0.15, 0.3, 0.5, 1.0]
+
+
+# ------------------------------------------------- levels computation
+def compute_levels(media_file_path, frame_rate_num, frame_rate_den, frame_count):
+    """
+    Decodes audio in large blocks with ffmpeg and computes per frame peak and RMS levels.
+
+    Returns tuple (peak_levels, rms_levels) of float32 arrays of length frame_count with values in range 0.0 - 1.0.
+    Raises OSError if decoding fails.
+    """
+    samples_per_frame = float(ANALYSIS_SAMPLE_RATE) * float(frame_rate_den) / float(frame_rate_num)
+
+    peak_levels = np.zeros(frame_count, dtype=np.float32)
+    rms_levels = np.zeros(frame_count, dtype=np.float32)
+
+    ffmpeg_call = [ "ffmpeg",
+                    "-i", str(media_file_path),
+                    "-vn",
+                    "-ac", "1",
+                    "-ar", str(ANALYSIS_SAMPLE_RATE),
+                    "-f", "f32le",
+                    "-loglevel", "error",
+                    "-" ]
+
+    sp = subprocess.Popen(ffmpeg_call, bufsize=-1, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    block_bytes = ANALYSIS_SAMPLE_RATE * READ_BLOCK_SECONDS * 4
+    buf = np.zeros(0, dtype=np.float32)
+    buf_start_sample = 0 # Absolute sample index of buf[0].
+    decoded_samples = 0
+    frame = 0
+    eof = False
+    while frame < frame_count and eof == False:
+        data = sp.stdout.read(block_bytes)
+        eof = (len(data) < block_bytes)
+        samples = np.frombuffer(data[:len(data) - len(data) % 4], dtype=np.float32)
+        decoded_samples += len(samples)
+        buf = np.concatenate((buf, np.abs(samples)))
+
+        # Compute levels for all frames that have all their samples in buffer.
+        if eof:
+            last_frame = frame_count
+        else:
+            last_frame = min(frame_count, int((buf_start_sample + len(buf)) / samples_per_frame))
+        if last_frame <= frame:
+            continue
+
+        bounds = np.floor(np.arange(frame, last_frame + 1) * samples_per_frame).astype(np.int64) - buf_start_sample
+        bounds = np.clip(bounds, 0, len(buf))
+        starts = bounds[:-1]
+        lengths = np.diff(bounds)
+        has_samples = lengths > 0
+
+        if np.any(has_samples):
+            frames_samples = buf[:bounds[-1]]
+            # Frames without samples have zero length, so the start of next frame with samples is the end of previous one.
+            reduce_indices = starts[has_samples]
+            peaks = np.maximum.reduceat(frames_samples, reduce_indices)
+            squares_sums = np.add.reduceat(frames_samples * frames_samples, reduce_indices)
+            peak_levels[frame:last_frame][has_samples] = peaks
+            rms_levels[frame:last_frame][has_samples] = np.sqrt(squares_sums / lengths[has_samples])
+
+        buf = buf[bounds[-1]:]
+        buf_start_sample += int(bounds[-1])
+        frame = last_frame
+
+    sp.stdout.close()
+    return_code = sp.wait()
+    if return_code != 0 and decoded_samples == 0:
+        raise OSError("ffmpeg audio decode failed for " + str(media_file_path) + ", return code: " + str(return_code))
+
+    return (_iec_scale(peak_levels), _iec_scale(rms_levels))
+
+def _iec_scale(levels):
+    db = 20.0 * np.log10(np.maximum(levels, 1e-10))
+    return np.interp(db, _IEC_DB_POINTS, _IEC_SCALE_POINTS, left=0.0, right=1.0).astype(np.float32)
+
+
+# ------------------------------------------------- levels file
+def write_levels_file(levels_file_path, peak_levels, rms_levels=None):
+    """
+    Writes levels file. If rms_levels is None, peak levels are also used as RMS levels.
+    """
+    peak = _quantize(peak_levels)
+    if rms_levels is None:
+        rms = peak
+    else:
+        rms = _quantize(rms_levels)
+
+    frame_count = len(peak)
+    mip_count = _get_mip_count(frame_count)
+
+    with atomicfile.AtomicFileWriter(levels_file_path, "wb") as afw:
+        write_file = afw.get_file()
+        write_file.write(struct.pack(HEADER_FORMAT, LEVELS_FILE_MAGIC, LEVELS_FILE_VERSION, frame_count, mip_count))
+        for mip_level in range(0, mip_count):
+            if mip_level > 0:
+                peak = _reduce_pairs(peak, np.maximum)
+                rms = _reduce_pairs(rms, _mean_uint8)
+            write_file.write(peak.tobytes())
+            write_file.write(rms.tobytes())
+
+def load_levels_file(levels_file_path):
+    """
+    Returns AudioLevels object for file, raises ValueError if file is not a levels file.
+    """
+    with open(levels_file_path, "rb") as f:
+        header = f.read(HEADER_SIZE)
+    if len(header) < HEADER_SIZE:
+        raise ValueError("Audio levels file header too short: " + levels_file_path)
+
+    magic, version, frame_count, mip_count = struct.unpack(HEADER_FORMAT, header)
+    if magic != LEVELS_FILE_MAGIC or version != LEVELS_FILE_VERSION:
+        raise ValueError("Not a supported audio levels file: " + levels_file_path)
+
+    if frame_count == 0:
+        data = np.zeros(0, dtype=np.uint8)
+    else:
+        data = np.memmap(levels_file_path, dtype=np.uint8, mode="r", offset=HEADER_SIZE)
+
+    return AudioLevels(data, frame_count, mip_count)
+
+def _quantize(levels):
+    levels = np.clip(np.asarray(levels, dtype=np.float32), 0.0, 1.0)
+    return np.rint(levels * 255.0).astype(np.uint8)
+
+def _get_mip_count(frame_count):
+    mip_count = 1
+    length = frame_count
+    while length > 1 and mip_count < MAX_MIP_LEVELS:
+        length = _get_mip_length(length, 1)
+        mip_count += 1
+    return mip_count
+
+def _get_mip_length(frame_count, mip_level):
+    return int(math.ceil(frame_count / float(2 ** mip_level)))
+
+def _reduce_pairs(values, pair_func):
+    if len(values) % 2 == 1:
+        values = np.append(values, values[-1])
+    return pair_func(values[0::2], values[1::2])
+
+def _mean_uint8(a, b):
+    return ((a.astype(np.uint16) + b.astype(np.uint16)) // 2).astype(np.uint8)
+
+
+class AudioLevels:
+    """
+    Read-only levels data that is indexed with frame numbers like the list of float levels used by earlier versions.
+    """
+    def __init__(self, data, frame_count, mip_count):
+        self.frame_count = frame_count
+        self.mip_count = mip_count
+        self.peak_mips = []
+        self.rms_mips = []
+
+        offset = 0
+        for mip_level in range(0, mip_count):
+            length = _get_mip_length(frame_count, mip_level)
+            self.peak_mips.append(data[offset:offset + length])
+            offset += length
+            self.rms_mips.append(data[offset:offset + length])
+            offset += length
+
+    def __len__(self):
+        return self.frame_count
+
+    def __getitem__(self, frame):
+        return self.peak_mips[0][frame] / 255.0
+
+    def get_nbytes(self):
+        return 2 * sum(len(mip) for mip in self.peak_mips)
+
+    def get_mip_level_for_step(self, frames_step):
+        """
+        Returns highest mip level that has at least one value per frames_step frames.
+        """
+        mip_level = 0
+        while mip_level + 1 < self.mip_count and 2 ** (mip_level + 1) <= frames_step:
+            mip_level += 1
+        return mip_level
+
+    def get_peak_levels(self, mip_level=0):
+        return self.peak_mips[mip_level]
+
+    def get_rms_levels(self, mip_level=0):
+        return self.rms_mips[mip_level]
@@ -63,6 +63,10 @@ _tline_sync_data = None # Compound clip and tline clip sync functions can't pass
 
 _compare_dialog_thread = None
 
+_batch_render_players = [] # Batch sync compound clips waiting to be rendered.
+
+BATCH_SYNC_COARSE_FACTOR = 8
+
 class ClapperlesLaunchThread(threading.Thread):
     def __init__(self, video_file, audio_file, completed_callback):
         threading.Thread.__init__(self)
@@ -73,6 +77,16 @@ class ClapperlesLaunchThread(threading.Thread):
     def run(self):
         _write_offsets(self.video_file, self.audio_file, self.completed_callback)
 
+class ClapperlesBatchLaunchThread(threading.Thread):
+    def __init__(self, reference_file, angle_files, completed_callback):
+        threading.Thread.__init__(self)
+        self.reference_file = reference_file
+        self.angle_files = angle_files
+        self.completed_callback = completed_callback
+        
+    def run(self):
+        _write_batch_offsets(self.reference_file, self.angle_files, self.completed_callback)
+
 # ------------------------------------------------------- module funcs
 def _write_offsets(video_file_path, audio_file_path, completed_callback):
     print("Starting clapperless analysis...")
@@ -88,6 +102,23 @@ def _write_offsets(video_file_path, audio_file_path, completed_callback):
     # Offsets are now available
     GLib.idle_add(completed_callback, (video_file_path, audio_file_path, idstr))
 
+def _write_batch_offsets(reference_file_path, angle_file_paths, completed_callback):
+    print("Starting clapperless batch analysis...")
+    fps = str(int(utils.fps() + 0.5))
+    idstr = _get_offset_file_idstr(reference_file_path, "".join(angle_file_paths))
+
+    FLOG = open(userfolders.get_cache_dir() + "log_clapperless", 'w')
+    
+    # All angles are aligned against reference in one run, envelopes are decoded in parallel and cached.
+    command_list = [sys.executable, respaths.LAUNCH_DIR + "flowbladeclapperless", reference_file_path]
+    command_list.extend(angle_file_paths)
+    command_list.extend(["--rate", fps, "--idstr", idstr, "--batch", "--coarse-factor", str(BATCH_SYNC_COARSE_FACTOR)])
+    p = subprocess.Popen(command_list, stdin=FLOG, stdout=FLOG, stderr=FLOG)
+    p.wait()
+    
+    # Offsets are now available
+    GLib.idle_add(completed_callback, (reference_file_path, angle_file_paths, idstr))
+
 def _get_offset_file_idstr(file_1, file_2):
     return hashlib.md5((file_1 + file_2).encode('utf-8')).hexdigest()
     
@@ -257,6 +288,9 @@ class TLineSyncData:
 # ------------------------------------------------------- compound clip audio sync
 def create_audio_sync_compound_clip():
     selection = gui.media_list_view.get_selected_media_objects()
+    if len(selection) > 2:
+        _create_batch_audio_sync_compound_clips([media_object.media_file for media_object in selection])
+        return
     if len(selection) != 2:
         return
 
@@ -320,7 +354,15 @@ def _do_create_sync_compound_clip(dialog, response_id, data):
     media_name = name_entry.get_text()
     
     dialog.destroy()
-    
+
+    # Get offset
+    offset = float(files_offsets[audio_file])
+    print(audio_file, offset)
+
+    render_player = _get_sync_compound_clip_render_player(video_file, audio_file, offset, media_name, projectaction._xml_compound_render_done_callback)
+    render_player.start()
+
+def _get_sync_compound_clip_render_player(video_file, audio_file, offset, media_name, render_done_callback):
     # Create unique file path in hidden render folder
     folder = userfolders.get_render_dir()
     uuid_str = hashlib.md5(str(os.urandom(32)).encode('utf-8')).hexdigest()
@@ -339,10 +381,6 @@ def _do_create_sync_compound_clip(dialog, response_id, data):
     video_clip = mlt.Producer(PROJECT().profile, str(video_file)) 
     audio_clip = mlt.Producer(PROJECT().profile, str(audio_file))
     
-    # Get offset
-    offset = float(files_offsets[audio_file])
-    print(audio_file, offset)
-    
     # Add clips
     if offset > 0:
         offset_frames = int(float(offset) + 0.5)
@@ -359,8 +397,86 @@ def _do_create_sync_compound_clip(dialog, response_id, data):
         track_audio.append(audio_clip, 0, audio_clip.get_length() - 1)
 
     # render MLT XML, callback in projectaction.py creates media object
-    render_player = renderconsumer.XMLCompoundRenderPlayer(write_file, media_name, projectaction._xml_compound_render_done_callback, tractor, PROJECT())
-    render_player.start()
+    return renderconsumer.XMLCompoundRenderPlayer(write_file, media_name, render_done_callback, tractor, PROJECT())
+
+
+# ------------------------------------------------------- batch compound clips audio sync
+def _create_batch_audio_sync_compound_clips(media_files):
+    # Can't sync coumpound clips
+    for media_file in media_files:
+        if utils.is_mlt_xml_file(media_file.path) == True:
+            dialogutils.warning_message(_("Cannot Create Audio Sync Clip from  MLT XML Container Clips!"), 
+                                        _("Audio syncing MLT XML Container Clips is not supported."),
+                                        gui.editor_window.window,
+                                        True)
+            return
+
+    # Audio recording is reference if there is exactly one, otherwise first selected media item.
+    audio_files = [media_file for media_file in media_files if media_file.type == appconsts.AUDIO]
+    if len(audio_files) == 1:
+        reference_file = audio_files[0]
+    else:
+        reference_file = media_files[0]
+
+    angle_files = [media_file for media_file in media_files if media_file is not reference_file and media_file.type == appconsts.VIDEO]
+    if len(angle_files) == 0:
+        dialogutils.warning_message(_("Cannot Create Audio Sync Container Clips from Audio Clips!"), 
+                                    _("At least one of the media items needs to be a video clip."),
+                                    gui.editor_window.window,
+                                    True)
+        return
+
+    global _compare_dialog_thread
+    _compare_dialog_thread = AudioCompareActiveThread()
+
+    # This or GUI freezes, we really can't do Popen.wait() in a Gtk thread
+    clapperless_thread = ClapperlesBatchLaunchThread(reference_file.path, [media_file.path for media_file in angle_files], _batch_offsets_complete)
+    clapperless_thread.start()
+
+def _batch_offsets_complete(data):
+    print("Clapperless done for batch compound clips")
+
+    global _compare_dialog_thread
+    _compare_dialog_thread.compare_done()
+    
+    reference_file_path, angle_file_paths, idstr = data
+    files_offsets = _read_offsets(idstr)
+    sync_data = (files_offsets, data)
+
+    # Angle number is added to this for each clip.
+    default_name = _("SYNC_CLIP_") +  str(datetime.date.today()) + "_" + time.strftime("%H%M%S")
+    dialogs.compound_clip_name_dialog(_do_create_batch_sync_compound_clips, default_name, _("Save Sync Compound Clips XML"), sync_data)
+
+def _do_create_batch_sync_compound_clips(dialog, response_id, data):
+    if response_id != Gtk.ResponseType.ACCEPT:
+        dialog.destroy()
+        return
+
+    sync_data, name_entry = data
+    files_offsets, clips = sync_data
+    reference_file, angle_files, idstr = clips
+    media_name = name_entry.get_text()
+    
+    dialog.destroy()
+
+    # Clapperless offsets are for angles against reference, compound clips want reference offset against video.
+    render_players = []
+    for i in range(0, len(angle_files)):
+        angle_file = angle_files[i]
+        offset = -float(files_offsets[angle_file])
+        print(angle_file, offset)
+        angle_media_name = media_name + "_" + str(i + 1) + ".xml"
+        render_players.append(_get_sync_compound_clip_render_player(angle_file, reference_file, offset, angle_media_name, _batch_sync_clip_render_done))
+
+    global _batch_render_players
+    _batch_render_players = render_players
+    _batch_render_players.pop(0).start()
+
+def _batch_sync_clip_render_done(filename, media_name):
+    # Clips are rendered one after another, MLT XML consumers are not run concurrently.
+    projectaction._xml_compound_render_done_callback(filename, media_name)
+    if len(_batch_render_players) > 0:
+        _batch_render_players.pop(0).start()
 
 
 # This is not a thread anymore but successive calls to Gdk.threads_add_timeout() 
@@ -31,22 +31,26 @@ from gi.repository import Gtk # We need to import Gtk first because this module
 from gi.repository import GLib
 from gi.repository import Gdk
 
+import cairo
+import collections
 import locale
+import math
 try:
     import mlt7 as mlt
 except:
     import mlt
+import multiprocessing
 import os
-import pickle
+import queue
 import subprocess
 import sys
 import threading
 
 import appconsts
-import atomicfile
+import audiolevelsfile
 import editorpersistance
 import editorstate
-import mltinit
+import mltheadlessutils
 import mltprofiles
 import processutils
 import renderconsumer
@@ -55,41 +59,55 @@ import translations
 import updater
 import userfolders
 import utils
+import workerserver
 
 LEFT_CHANNEL = "_audio_level.0"
 RIGHT_CHANNEL = "_audio_level.1"
 
 FILE_SEPARATOR = "#&#file:"
+FILE_COMPLETED_MSG = "#&#levels_completed:" # Render process writes this with file path into stdout when levels for file are ready.
 
-_waveforms = {} # Memory cache for waveform data
+_waveforms = None # WaveformCache, memory cache for waveform data
+_waveform_tiles = None # WaveformTileCache, memory cache for rasterized waveform images
 _queued_waveform_renders = [] # Media queued for render during one timeline repaint
 _render_already_requested = [] # Files that have been sent to rendering since last project load
 
+LEGACY_LEVELS_VALUE_BYTES = 32 # Approximate memory used for one value in legacy list of floats levels data.
+
+WAVEFORM_TILE_WIDTH = 512 # Width in pixels of rasterized waveform image tiles.
+
 
 # ------------------------------------------------- waveform cache
 def clear_cache():
-    global _waveforms, _queued_waveform_renders, _render_already_requested
+    global _waveforms, _waveform_tiles, _queued_waveform_renders, _render_already_requested
 
-    _waveforms = {}
+    _waveforms = WaveformCache(editorpersistance.prefs.audio_levels_memory_cache_mb * 1024 * 1024)
+    _waveform_tiles = WaveformTileCache(editorpersistance.prefs.waveform_tiles_memory_cache_mb * 1024 * 1024)
     _queued_waveform_renders = []
     _render_already_requested = []
 
+def get_cache_stats():
+    """
+    Returns tuple (hits, misses, used_bytes, budget_bytes, entries_count).
+    """
+    if _waveforms == None:
+        return (0, 0, 0, 0, 0)
+    return _waveforms.get_stats()
+
 def get_waveform_data(clip):
-    # Return from memory if present
     global _waveforms
-    try:
-        waveform = _waveforms[clip.path]
+    if _waveforms == None:
+        clear_cache()
+
+    # Return from memory if present
+    waveform = _waveforms.get(clip.path)
+    if waveform != None:
         return waveform
-    except:
-        pass
         
     # Load from disk if found, otherwise queue for levels render
-    levels_file_path = _get_levels_file_path(clip.path, editorstate.PROJECT().profile)
-    if os.path.isfile(levels_file_path):
-        if os.path.getsize(levels_file_path) == 0:
-             print( "Size zero Audio levels file, this is error!", levels_file_path)
-        waveform = utils.unpickle(levels_file_path)
-        _waveforms[clip.path] = waveform
+    waveform = _load_waveform_data(clip.path)
+    if waveform != None:
+        _waveforms.put(clip.path, waveform)
         return waveform
     else:
         # We keep queing everything that does not have waveform data.
@@ -99,7 +117,170 @@ def get_waveform_data(clip):
         _queued_waveform_renders.append(clip.path)
 
         return None
+
+def _load_waveform_data(media_file_path):
+    levels_file_path = _get_levels_file_path(media_file_path, editorstate.PROJECT().profile)
+    if os.path.isfile(levels_file_path + audiolevelsfile.LEVELS_FILE_EXTENSION):
+        return audiolevelsfile.load_levels_file(levels_file_path + audiolevelsfile.LEVELS_FILE_EXTENSION)
+    elif os.path.isfile(levels_file_path):
+        # Pickled list of floats levels file written by earlier versions.
+        if os.path.getsize(levels_file_path) == 0:
+             print( "Size zero Audio levels file, this is error!", levels_file_path)
+        waveform = utils.unpickle(levels_file_path)
+        # Convert to levels file so that data can be memory mapped and reloaded cheaply after eviction.
+        try:
+            audiolevelsfile.write_levels_file(levels_file_path + audiolevelsfile.LEVELS_FILE_EXTENSION, waveform)
+            os.remove(levels_file_path)
+            return audiolevelsfile.load_levels_file(levels_file_path + audiolevelsfile.LEVELS_FILE_EXTENSION)
+        except Exception as e:
+            print("Converting legacy audio levels file failed", levels_file_path, e)
+            return waveform
+    else:
+        return None
+
+def _get_waveform_data_nbytes(waveform):
+    try:
+        return waveform.get_nbytes()
+    except AttributeError:
+        return len(waveform) * LEGACY_LEVELS_VALUE_BYTES
+
+def _release_clips_waveform_data(media_file_path):
+    # Clips keep references to their waveform data, so those need to be cleared to release evicted data.
+    # Data is reloaded from cache or disk when clip is next drawn.
+    if editorstate.PROJECT() == None:
+        return
+    for seq in editorstate.PROJECT().sequences:
+        for track in seq.tracks:
+            for clip in track.clips:
+                if clip.is_blanck_clip == False and clip.path == media_file_path:
+                    clip.waveform_data = None
+
+
+class WaveformCache:
+    """
+    LRU memory cache for waveform data with memory budget in bytes.
+    """
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self.entries = collections.OrderedDict() # media file path -> (waveform, nbytes)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, media_file_path):
+        try:
+            waveform, nbytes = self.entries[media_file_path]
+        except KeyError:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(media_file_path)
+        self.hits += 1
+        return waveform
+
+    def put(self, media_file_path, waveform):
+        if media_file_path in self.entries:
+            self._remove(media_file_path)
+
+        nbytes = _get_waveform_data_nbytes(waveform)
+        self.entries[media_file_path] = (waveform, nbytes)
+        self.used_bytes += nbytes
+
+        # Evict least recently used data, but always keep latest added data.
+        while self.used_bytes > self.budget_bytes and len(self.entries) > 1:
+            evicted_path = next(iter(self.entries))
+            self._remove(evicted_path)
+            _release_clips_waveform_data(evicted_path)
+
+    def _remove(self, media_file_path):
+        waveform, nbytes = self.entries.pop(media_file_path)
+        self.used_bytes -= nbytes
+
+    def get_stats(self):
+        return (self.hits, self.misses, self.used_bytes, self.budget_bytes, len(self.entries))
+
+# ------------------------------------------------- waveform tiles
+def get_waveform_tile(media_file_path, waveform, pix_per_frame, bar_height, tile_index):
+    """
+    Returns cairo.ImageSurface alpha mask with waveform image for media pixels range 
+    tile_index * WAVEFORM_TILE_WIDTH -> (tile_index + 1) * WAVEFORM_TILE_WIDTH at given zoom level.
+    
+    Tiles are in media frames space and do not depend on clip in and out frames,
+    so they stay valid when clips are trimmed or moved.
+    """
+    if _waveform_tiles == None:
+        clear_cache()
+
+    key = (media_file_path, pix_per_frame, bar_height, tile_index)
+    tile = _waveform_tiles.get(key)
+    if tile == None:
+        tile = _render_waveform_tile(waveform, pix_per_frame, bar_height, tile_index)
+        _waveform_tiles.put(key, tile)
+    return tile
+
+def _render_waveform_tile(waveform, pix_per_frame, bar_height, tile_index):
+    surface = cairo.ImageSurface(cairo.FORMAT_A8, WAVEFORM_TILE_WIDTH, int(math.ceil(bar_height)))
+    cr = cairo.Context(surface)
     
+    # Draw all frames only if pixels per frame > 2, otherwise.
+    # draw only every other or fewer frames.
+    draw_pix_per_frame = pix_per_frame
+    if draw_pix_per_frame < 2:
+        draw_pix_per_frame = 2
+        step = int(2 // pix_per_frame)
+        if step < 1:
+            step = 1
+    else:
+        step = 1
+
+    # Bars are on media frames step grid so that they stay in place when timeline is scrolled.
+    tile_x = tile_index * WAVEFORM_TILE_WIDTH
+    first = max(0, int((tile_x - draw_pix_per_frame) / pix_per_frame))
+    first = first - first % step
+    last = min(len(waveform), int((tile_x + WAVEFORM_TILE_WIDTH) / pix_per_frame) + 1)
+
+    for f in range(first, last, step):
+        if step == 1:
+            level = waveform[f]
+        else:
+            level = max(waveform[f:f + step])
+        h = bar_height * level
+        if h < 1:
+            h = 1
+        cr.rectangle(f * pix_per_frame - tile_x, bar_height - h, draw_pix_per_frame, h)
+
+    cr.fill()
+    surface.flush()
+    return surface
+
+
+class WaveformTileCache:
+    """
+    LRU memory cache for rasterized waveform tiles with memory budget in bytes.
+    """
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self.tiles = collections.OrderedDict() # (media file path, pix per frame, bar height, tile index) -> cairo.ImageSurface
+
+    def get(self, key):
+        try:
+            tile = self.tiles[key]
+        except KeyError:
+            return None
+
+        self.tiles.move_to_end(key)
+        return tile
+
+    def put(self, key, tile):
+        self.tiles[key] = tile
+        self.used_bytes += tile.get_stride() * tile.get_height()
+        
+        while self.used_bytes > self.budget_bytes and len(self.tiles) > 1:
+            evicted_key, evicted_tile = self.tiles.popitem(last=False)
+            self.used_bytes -= evicted_tile.get_stride() * evicted_tile.get_height()
+
+
 # ------------------------------------------------- launching render
 def launch_queued_renders():
     # Render files that were not found when timeline was displayed
@@ -117,7 +298,7 @@ def launch_audio_levels_rendering(file_names):
 
     for media_file in file_names:
         levels_file_path = _get_levels_file_path(media_file, editorstate.PROJECT().profile)
-        if os.path.isfile(levels_file_path):
+        if os.path.isfile(levels_file_path + audiolevelsfile.LEVELS_FILE_EXTENSION) or os.path.isfile(levels_file_path):
             continue
         else:
             global _render_already_requested
@@ -151,10 +332,19 @@ class AudioRenderLaunchThread(threading.Thread):
         # Launch render process and wait for it to end
         FLOG = open(userfolders.get_cache_dir() + "log_audio_levels_render", 'w')
         # Sep-2018 - SvdB - Added self. to be able to access the thread through 'process'
-        self.process = subprocess.Popen([sys.executable, respaths.LAUNCH_DIR + "flowbladeaudiorender", \
+        self.process = workerserver.launch_process([sys.executable, respaths.LAUNCH_DIR + "flowbladeaudiorender", \
                   self.rendered_media, self.profile_desc, respaths.ROOT_PATH], \
-                  stdin=FLOG, stdout=FLOG, stderr=FLOG)
+                  stdin=FLOG, stdout=subprocess.PIPE, stderr=FLOG, universal_newlines=True)
+
+        # Repaint timeline each time levels data for a file becomes available.
+        for line in self.process.stdout:
+            if line.startswith(FILE_COMPLETED_MSG):
+                Gdk.threads_add_timeout(GLib.PRIORITY_HIGH_IDLE, 10, _repaint)
+            else:
+                FLOG.write(line)
+
         self.process.wait()
+        FLOG.close()
 
         Gdk.threads_add_timeout(GLib.PRIORITY_HIGH_IDLE, 10, _repaint)
 
@@ -164,22 +354,9 @@ def _repaint():
     
 # --------------------------------------------------------- rendering
 def main():
-    # Set paths.
+    # Set paths, load prefs and init MLT.
     root_path = sys.argv[3]
-    respaths.set_paths(root_path)
-
-    try:
-        editorstate.mlt_version = mlt.LIBMLT_VERSION
-    except:
-        editorstate.mlt_version = "0.0.99" # magic string for "not found"
-    
-    # Set folders paths
-    userfolders.init()
-    
-    # Load editor prefs and list of recent projects
-    editorpersistance.load()
-    
-    mltinit.init_with_translations()
+    mltheadlessutils.init_env(root_path)
     
     profile_desc = sys.argv[2]
     profile = mltprofiles.get_profile(profile_desc) # not used, but will provide useful info if crashes.
@@ -189,10 +366,76 @@ def main():
     
     files = files_paths.split(FILE_SEPARATOR)
 
+    threads = _get_render_processes_count(len(files))
+    if threads == 1:
+        for f in files:
+           t = WaveformCreator(f, profile_desc)
+           t.start()
+           t.join()
+           _report_file_completed(f)
+        return
+
+    # Render files in multiple processes, each process takes next file from queue when done with previous one.
+    # Fork context, spawned processes would run the launch script again.
+    mp_context = multiprocessing.get_context("fork")
+    files_queue = mp_context.Queue()
     for f in files:
-       t = WaveformCreator(f, profile_desc)
-       t.start()
-       t.join()
+        files_queue.put(f)
+    for i in range(threads):
+        files_queue.put(None) # Tells process to exit.
+
+    result_queue = mp_context.Queue()
+
+    jobs = []
+    for i in range(threads):
+        p = mp_context.Process(target=_render_process_launch, args=(profile_desc, files_queue, result_queue))
+        jobs.append(p)
+        p.start()
+
+    completed_count = 0
+    while completed_count < len(files):
+        try:
+            clip_path, error_msg = result_queue.get(timeout=1.0)
+        except queue.Empty:
+            # Stop waiting if all render processes have died.
+            if not any(proc.is_alive() for proc in jobs):
+                print("Audio levels render processes exited before all files were rendered.")
+                break
+            continue
+
+        completed_count += 1
+        if error_msg != None:
+            print("Audio levels render failed for", clip_path, error_msg)
+        _report_file_completed(clip_path)
+
+    for proc in jobs:
+        proc.join()
+
+def _get_render_processes_count(files_count):
+    # Same heuristics as used for Fluxity rendering, leave some cores free and cap at 8.
+    threads = multiprocessing.cpu_count() - 2
+    if threads < 2:
+        threads = 1
+    if threads > 8:
+        threads = 8
+    if threads > files_count:
+        threads = files_count
+    return threads
+
+def _render_process_launch(profile_desc, files_queue, result_queue):
+    while True:
+        clip_path = files_queue.get()
+        if clip_path == None:
+            return
+        try:
+            creator = WaveformCreator(clip_path, profile_desc)
+            creator.run()
+            result_queue.put((clip_path, None))
+        except Exception as e:
+            result_queue.put((clip_path, str(e)))
+
+def _report_file_completed(clip_path):
+    print(FILE_COMPLETED_MSG + clip_path, flush=True)
 
 
 class WaveformCreator(threading.Thread):    
@@ -200,11 +443,26 @@ class WaveformCreator(threading.Thread):
         threading.Thread.__init__(self)
         self.clip_path = clip_path
         profile = mltprofiles.get_profile(profile_desc)
+        self.frame_rate_num = profile.frame_rate_num()
+        self.frame_rate_den = profile.frame_rate_den()
         self.temp_clip = self._get_temp_producer(clip_path, profile)
-        self.file_cache_path =_get_levels_file_path(clip_path, profile)
+        self.file_cache_path =_get_levels_file_path(clip_path, profile) + audiolevelsfile.LEVELS_FILE_EXTENSION
         self.last_rendered_frame = 0
 
     def run(self):
+        # Streaming block decode is much faster, per frame MLT levels computation is used if it fails.
+        try:
+            peak_levels, rms_levels = audiolevelsfile.compute_levels(self.clip_path, self.frame_rate_num, 
+                                                                     self.frame_rate_den, self.clip_media_length)
+        except Exception as e:
+            print("Streaming audio levels computation failed, using per frame render for", self.clip_path, e)
+            peak_levels = self._get_frame_levels()
+            rms_levels = None
+        
+        self.last_rendered_frame = self.clip_media_length - 1
+        audiolevelsfile.write_levels_file(self.file_cache_path, peak_levels, rms_levels)
+
+    def _get_frame_levels(self):
         frame_levels = [None] * self.clip_media_length 
 
         for frame in range(0, len(frame_levels)):
@@ -216,9 +474,7 @@ class WaveformCreator(threading.Thread):
             frame_levels[frame] = float(val)
             self.last_rendered_frame = frame
 
-        with atomicfile.AtomicFileWriter(self.file_cache_path, "wb") as afw:
-            write_file = afw.get_file()
-            pickle.dump(frame_levels, write_file)
+        return frame_levels
 
     def _get_temp_producer(self, clip_path, profile):
         temp_producer = mlt.Producer(profile, str(clip_path))
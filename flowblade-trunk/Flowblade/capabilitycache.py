@@ -0,0 +1,208 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module caches MLT environment detection results and objects built from filter, compositor
+and render encoding xml files.
+
+Cache is keyed by MLT version, names of services in MLT repository, resource file modification times,
+ffmpeg binary and translations in use. On a cache hit codecs and formats probing, GPU encoder tests
+and xml parsing are skipped. Detection that is not covered by the key, e.g. system ffmpeg libraries
+being updated, is revalidated in background after start-up and cache is dropped if results differ.
+"""
+
+try:
+    import mlt7 as mlt
+except:
+    import mlt
+import hashlib
+import os
+import pickle
+import shutil
+import threading
+
+import appconsts
+import atomicfile
+import editorstate
+import mltenv
+import mltfilters
+import mlttransitions
+import renderconsumer
+import respaths
+import translations
+import userfolders
+
+CACHE_VERSION = 1 # Increment when cached data or objects change.
+
+# Module global names that are saved in cache and restored on cache hit.
+_CACHED_GLOBALS = [(mltenv, ["acodecs", "vcodecs", "formats", "services", "transitions"]),
+                   (renderconsumer, ["H_264_NVENC_AVAILABLE", "HEVC_NVENC_AVAILABLE", "H_264_VAAPI_AVAILABLE",
+                                     "quality_option_groups", "quality_option_groups_default_index",
+                                     "encoding_options", "categorized_encoding_options", "not_supported_encoding_options",
+                                     "non_user_encodings", "proxy_encodings"]),
+                   (mltfilters, ["groups", "not_found_filters", "compositor_filters", "_filter_mask_filters",
+                                 "_volume_filter_info", "_shape_filter_info", "_brightness_filter_info", "_colorize_filter_info"]),
+                   (mlttransitions, ["mlt_compositor_transition_infos", "not_found_transitions"])]
+
+_cache_hit = False
+
+
+# ------------------------------------------------- interface
+def init_capabilities(repo):
+    """
+    Detects available features and loads filters, compositors and render profiles,
+    either from cache or by probing MLT and parsing xml files.
+    Returns True if environment detection succeeded.
+    """
+    global _cache_hit
+    _cache_hit = False
+
+    try:
+        key = _get_cache_key(repo)
+    except Exception as e:
+        print("Capabilities cache key creation failed:", e)
+        key = None
+
+    if key != None and _load_cache(key) == True:
+        print("MLT capabilities loaded from cache, " + str(len(mltenv.formats)) + " formats, "  \
+        + str(len(mltenv.vcodecs)) + " video codecs and " + str(len(mltenv.acodecs)) + " audio codecs.")
+        mltenv.environment_detection_success = True
+        _cache_hit = True
+        return True
+
+    mltenv.check_available_features(repo)
+    renderconsumer.load_render_profiles()
+
+    mltfilters.load_filters_xml(mltenv.services)
+    mlttransitions.load_compositors_xml(mltenv.transitions)
+
+    if mltenv.environment_detection_success == False:
+        return False
+
+    if key != None:
+        _save_cache(key)
+
+    return True
+
+def revalidate_in_background(repo):
+    """
+    Runs detection again if capabilities were loaded from cache and drops cache if results have changed.
+    """
+    if _cache_hit == False:
+        return
+
+    revalidation_thread = threading.Thread(target=_revalidate, args=(repo,))
+    revalidation_thread.daemon = True
+    revalidation_thread.start()
+
+def clear_cache():
+    try:
+        os.remove(_get_cache_path())
+    except OSError:
+        pass
+
+
+# ------------------------------------------------- cache
+def _get_cache_path():
+    return userfolders.get_cache_dir() + appconsts.CAPABILITIES_CACHE_FILE
+
+def _get_cache_key(repo):
+    key_parts = [str(CACHE_VERSION), editorstate.appversion]
+
+    try:
+        key_parts.append(mlt.LIBMLT_VERSION)
+    except:
+        key_parts.append(str(editorstate.mlt_version))
+
+    # MLT plugins being added or removed change available services.
+    for services in [mlt.Repository.filters(repo), mlt.Repository.transitions(repo),
+                     mlt.Repository.producers(repo), mlt.Repository.consumers(repo)]:
+        names = []
+        for i in range(mlt.Properties.count(services)):
+            names.append(mlt.Properties.get_name(services, i))
+        key_parts.append(",".join(sorted(names)))
+
+    for file_path in [respaths.FILTERS_XML_DOC, respaths.COMPOSITORS_XML_DOC,
+                      respaths.ROOT_PATH + renderconsumer.RENDER_ENCODING_FILE]:
+        st = os.stat(file_path)
+        key_parts.append(file_path + str(st.st_size) + str(st.st_mtime_ns))
+
+    # GPU encoder tests are run with ffmpeg binary.
+    ffmpeg_path = shutil.which("ffmpeg")
+    if ffmpeg_path != None:
+        st = os.stat(ffmpeg_path)
+        key_parts.append(ffmpeg_path + str(st.st_mtime_ns))
+
+    # Filter groups are keyed and sorted by translated names.
+    key_parts.append(repr(sorted(translations.filter_groups.items())))
+    key_parts.append(repr(sorted(translations.filter_names.items())))
+
+    return hashlib.md5("\n".join(key_parts).encode('utf-8')).hexdigest()
+
+def _load_cache(key):
+    try:
+        with open(_get_cache_path(), "rb") as f:
+            cache_key, cached_state = pickle.load(f)
+    except FileNotFoundError:
+        return False
+    except Exception as e:
+        print("Capabilities cache load failed:", e)
+        return False
+
+    if cache_key != key:
+        print("Capabilities cache is outdated.")
+        return False
+
+    for module, names in _CACHED_GLOBALS:
+        for name in names:
+            setattr(module, name, cached_state[module.__name__ + "." + name])
+
+    return True
+
+def _save_cache(key):
+    cached_state = {}
+    for module, names in _CACHED_GLOBALS:
+        for name in names:
+            cached_state[module.__name__ + "." + name] = getattr(module, name)
+
+    try:
+        with atomicfile.AtomicFileWriter(_get_cache_path(), "wb") as afw:
+            pickle.dump((key, cached_state), afw.get_file())
+    except Exception as e:
+        print("Capabilities cache save failed:", e)
+
+def _revalidate(repo):
+    try:
+        acodecs, vcodecs, formats, services, transitions = mltenv.detect_features(repo)
+        h264_nvenc, hevc_nvenc, h264_vaapi = renderconsumer.test_gpu_encoders()
+    except Exception as e:
+        print("Capabilities revalidation failed:", e)
+        return
+
+    if (sorted(acodecs) != sorted(mltenv.acodecs) or sorted(vcodecs) != sorted(mltenv.vcodecs)
+        or sorted(formats) != sorted(mltenv.formats) or services != mltenv.services
+        or transitions != mltenv.transitions
+        or h264_nvenc != renderconsumer.H_264_NVENC_AVAILABLE
+        or hevc_nvenc != renderconsumer.HEVC_NVENC_AVAILABLE
+        or h264_vaapi != renderconsumer.H_264_VAAPI_AVAILABLE):
+        print("MLT capabilities have changed since they were cached, detection is done again at next start.")
+        clear_cache()
+    else:
+        print("Cached MLT capabilities revalidated.")
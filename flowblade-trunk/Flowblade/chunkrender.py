@@ -0,0 +1,434 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module renders final renders in parallel chunks.
+
+Render range is split into chunks with lengths that are multiples of encoding GOP length.
+Each chunk is rendered as video only file by a worker process that loads the saved project,
+audio for the whole range is rendered by one more worker to avoid gaps at chunk boundaries.
+Every chunk is encoded by its own encoder so it starts with a keyframe and chunks are joined
+and muxed with audio using ffmpeg concat demuxer without re-encoding.
+"""
+
+try:
+    import mlt7 as mlt
+except:
+    import mlt
+import multiprocessing
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import appconsts
+import atomicfile
+import editorpersistance
+import editorstate
+import mltinit
+import mltprofiles
+import persistance
+import renderconsumer
+import respaths
+import userfolders
+import utils
+
+CHUNK_RENDER_RETRIES = 2
+JOIN_PROGRESS_SHARE = 0.02 # Part of progress bar left for joining chunks.
+AUDIO_PROGRESS_WEIGHT = 0.1 # Audio render of whole range counts as this part of range video frames in progress.
+
+# Chunk render worker processes report progress by writing these prefixed lines into their stdout.
+WORKER_PROGRESS_MSG = "CHUNK_WORKER_PROGRESS:"
+WORKER_DONE_MSG = "CHUNK_WORKER_DONE"
+
+RENDER_JOB_FILE = "render_job"
+PROJECT_FILE = "render_project.flb"
+AUDIO_CHUNK_INDEX = -1
+
+
+# --------------------------------------------------------------- interface
+def use_chunked_render(render_item, start_frame, end_frame):
+    """
+    Returns True if render item was created with chunked rendering settings and range is long enough to be split.
+    """
+    # Render items queued before chunked rendering was available don't have chunk settings.
+    if not hasattr(render_item.render_data, "chunk_frames"):
+        return False
+    if render_item.render_data.chunk_frames <= 0:
+        return False
+
+    if end_frame - start_frame + 1 <= render_item.render_data.chunk_frames:
+        return False
+
+    if shutil.which("ffmpeg") == None:
+        print("ffmpeg not found, chunked rendering not available")
+        return False
+
+    return True
+
+def get_chunk_settings(encoding_option, user_args):
+    """
+    Returns (chunk_frames, chunk_workers) for encoding, chunk_frames is 0 if encoding is not rendered in chunks.
+    """
+    if editorpersistance.prefs.chunked_render == False or user_args == True:
+        return (0, 0)
+
+    # Image sequences are not joined and joined compressed audio would have gaps at chunk boundaries.
+    if encoding_option.type == "audio" or encoding_option.type == "img_seq":
+        return (0, 0)
+
+    # Encodings define 'chunkframes="0"' if their output cannot be joined without re-encoding.
+    chunk_frames = encoding_option.chunk_frames
+    if chunk_frames == None:
+        chunk_frames = editorpersistance.prefs.render_chunk_frames
+
+    chunk_workers = editorpersistance.prefs.render_chunk_workers
+    if chunk_workers <= 0:
+        chunk_workers = min(max(multiprocessing.cpu_count() - 2, 1), 8)
+    # Encodings define 'chunkworkers' to limit concurrent encoders e.g. for hardware encoding sessions.
+    if encoding_option.chunk_workers != None:
+        chunk_workers = min(chunk_workers, encoding_option.chunk_workers)
+
+    return (chunk_frames, chunk_workers)
+
+
+# --------------------------------------------------------------- rendering
+class ChunkedRenderPlayer(threading.Thread):
+    """
+    Renders range in chunks in worker processes and joins them.
+
+    Has the same interface as renderconsumer.FileRenderPlayer for code that monitors rendering.
+    """
+    def __init__(self, project_file_path, render_item, start_frame, stop_frame):
+        threading.Thread.__init__(self)
+
+        self.render_path = render_item.render_path
+        self.args_vals_list = render_item.args_vals_list
+        self.profile_name = render_item.render_data.profile_name
+        self.chunk_frames = _get_gop_aligned_length(render_item.render_data.chunk_frames, self.args_vals_list)
+        self.max_workers = render_item.render_data.chunk_workers
+        self.start_frame = start_frame
+        self.stop_frame = stop_frame
+        self.wait_for_producer_end_stop = True # Not used, set by callsites for FileRenderPlayer.
+
+        # Several items may start rendering at the same time in batch queue, each gets its own unique folder.
+        chunks_root = userfolders.get_cache_dir() + appconsts.RENDER_CHUNKS_DIR
+        os.makedirs(chunks_root, exist_ok=True)
+        self.chunks_dir = tempfile.mkdtemp(prefix=str(os.getpid()) + "_", dir=chunks_root)
+        # Worker processes load project copy, render launches may overwrite project file while we are rendering.
+        self.project_file_path = self.chunks_dir + "/" + PROJECT_FILE
+        shutil.copyfile(project_file_path, self.project_file_path)
+        self.job_file_path = self.chunks_dir + "/" + RENDER_JOB_FILE
+        with atomicfile.AtomicFileWriter(self.job_file_path, "wb") as afw:
+            pickle.dump({"args_vals_list":self.args_vals_list, "profile_name":self.profile_name}, afw.get_file())
+
+        self.extension = os.path.splitext(self.render_path)[1]
+        self.chunks = [] # (chunk index, range in, range out)
+        chunk_in = start_frame
+        while chunk_in <= stop_frame:
+            chunk_out = min(chunk_in + self.chunk_frames - 1, stop_frame)
+            self.chunks.append((len(self.chunks), chunk_in, chunk_out))
+            chunk_in = chunk_out + 1
+
+        self.has_audio = _has_audio(self.args_vals_list)
+
+        self.workers = []
+        self.workers_lock = threading.Lock()
+        self.chunk_fractions = {} # chunk index -> fraction, for chunks rendered or being rendered.
+        self.join_process = None
+        self.error = None
+
+        self.running = False
+        self.has_started_running = False
+        self.stopped = False
+        self.aborted = False
+
+    def run(self):
+        start_time = time.monotonic()
+        self.running = True
+        self.has_started_running = True
+
+        waiting_chunks = list(self.chunks)
+        if self.has_audio:
+            # Audio for whole range is the longest job, start it first.
+            waiting_chunks.insert(0, (AUDIO_CHUNK_INDEX, self.start_frame, self.stop_frame))
+        attempts = {}
+
+        while (len(waiting_chunks) > 0 or len(self.workers) > 0) and self.aborted == False and self.error == None:
+            with self.workers_lock:
+                # Collect completed workers and queue failed chunks for retry.
+                for worker in list(self.workers):
+                    if worker.is_running() == True:
+                        continue
+                    self.workers.remove(worker)
+                    if worker.succeeded():
+                        self.chunk_fractions[worker.chunk_index] = 1.0
+                        continue
+
+                    attempts[worker.chunk_index] = attempts.get(worker.chunk_index, 0) + 1
+                    print("chunk render worker failed for chunk", worker.chunk_index, "attempt", attempts[worker.chunk_index])
+                    if attempts[worker.chunk_index] > CHUNK_RENDER_RETRIES:
+                        self.error = "rendering chunk " + str(worker.chunk_index) + " failed"
+                        break
+                    self.chunk_fractions[worker.chunk_index] = 0.0
+                    waiting_chunks.insert(0, (worker.chunk_index, worker.range_in, worker.range_out))
+
+                # Fill free worker slots, shutdown() may have stopped workers after loop condition was checked.
+                while (len(self.workers) < self.max_workers and len(waiting_chunks) > 0 and self.error == None 
+                       and self.aborted == False):
+                    chunk_index, range_in, range_out = waiting_chunks.pop(0)
+                    worker = ChunkRenderWorker(self, chunk_index, range_in, range_out)
+                    worker.start()
+                    self.workers.append(worker)
+
+            time.sleep(0.1)
+
+        if self.error != None:
+            self._abort_workers()
+        elif self.aborted == False:
+            self._join_chunks()
+
+        if self.error != None:
+            print("Chunked render failed:", self.error)
+        else:
+            print("chunked render done, chunks:", len(self.chunks), "workers:", self.max_workers, "time:", time.monotonic() - start_time)
+
+        shutil.rmtree(self.chunks_dir, ignore_errors=True)
+
+        self.running = False
+        self.stopped = True
+
+    def _join_chunks(self):
+        list_file_path = self.chunks_dir + "/chunks.txt"
+        with open(list_file_path, "w") as f:
+            for chunk_index, range_in, range_out in self.chunks:
+                chunk_path = self.get_chunk_path(chunk_index)
+                f.write("file '" + chunk_path.replace("'", "'\\''") + "'\n")
+
+        command_list = ["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_file_path]
+        if self.has_audio:
+            command_list.extend(["-i", self.get_chunk_path(AUDIO_CHUNK_INDEX), "-map", "0:v", "-map", "1:a"])
+        command_list.extend(["-c", "copy"])
+        for arg, val in self.args_vals_list:
+            if arg == "movflags":
+                command_list.extend(["-movflags", str(val)])
+        command_list.append(self.render_path)
+
+        try:
+            self.join_process = subprocess.Popen(command_list, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        except OSError as e:
+            self.error = "launching ffmpeg failed: " + str(e)
+            return
+        if self.aborted == True:
+            self.join_process.kill() # shutdown() was called while process was being launched.
+        err_out = self.join_process.communicate()[1]
+        if self.join_process.returncode != 0 and self.aborted == False:
+            self.error = "joining chunks failed: " + err_out.decode("utf-8", "replace")
+
+    def get_chunk_path(self, chunk_index):
+        if chunk_index == AUDIO_CHUNK_INDEX:
+            return self.chunks_dir + "/audio" + self.extension
+        return self.chunks_dir + "/chunk_" + str(chunk_index) + self.extension
+
+    def get_render_fraction(self):
+        if self.stopped == True:
+            return 1.0
+
+        done_frames = 0.0
+        render_frames = 0
+        chunk_fractions = dict(self.chunk_fractions)
+        with self.workers_lock:
+            for worker in self.workers:
+                chunk_fractions[worker.chunk_index] = worker.fraction
+        for chunk_index, range_in, range_out in self.chunks:
+            done_frames += chunk_fractions.get(chunk_index, 0.0) * (range_out - range_in + 1)
+            render_frames += range_out - range_in + 1
+        if self.has_audio:
+            audio_frames = (self.stop_frame - self.start_frame + 1) * AUDIO_PROGRESS_WEIGHT
+            done_frames += chunk_fractions.get(AUDIO_CHUNK_INDEX, 0.0) * audio_frames
+            render_frames += audio_frames
+
+        return (done_frames / float(render_frames)) * (1.0 - JOIN_PROGRESS_SHARE)
+
+    def failed(self):
+        """
+        Returns True if render ended without creating output file, reason is in self.error.
+        """
+        return self.error != None
+
+    def shutdown(self):
+        self.aborted = True
+        self._abort_workers()
+        if self.join_process != None and self.join_process.poll() == None:
+            self.join_process.kill()
+
+    def _abort_workers(self):
+        with self.workers_lock:
+            for worker in self.workers:
+                worker.abort()
+            self.workers = []
+
+
+class ChunkRenderWorker:
+    """
+    Launches a worker process that renders single chunk and reads its progress from process stdout.
+    """
+    def __init__(self, render_player, chunk_index, range_in, range_out):
+        self.render_player = render_player
+        self.chunk_index = chunk_index
+        self.range_in = range_in
+        self.range_out = range_out
+        self.chunk_path = render_player.get_chunk_path(chunk_index)
+        self.fraction = 0.0
+        self.done = False
+        self.process = None
+        self.reader_thread = None
+
+    def start(self):
+        if self.chunk_index == AUDIO_CHUNK_INDEX:
+            media = "audio"
+        else:
+            media = "video"
+
+        args = [sys.executable, respaths.LAUNCH_DIR + "flowbladechunkrender",
+                "project_path:" + str(self.render_player.project_file_path),
+                "job_path:" + str(self.render_player.job_file_path),
+                "chunk_path:" + str(self.chunk_path),
+                "range_in:" + str(self.range_in),
+                "range_out:" + str(self.range_out),
+                "media:" + media]
+
+        FLOG = open(userfolders.get_cache_dir() + "log_chunk_render_worker", 'a')
+        self.process = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                        stderr=FLOG, universal_newlines=True)
+
+        self.reader_thread = threading.Thread(target=self._read_worker_output)
+        self.reader_thread.daemon = True
+        self.reader_thread.start()
+
+    def _read_worker_output(self):
+        for line in self.process.stdout:
+            line = line.strip()
+            if line.startswith(WORKER_PROGRESS_MSG):
+                try:
+                    self.fraction = float(line[len(WORKER_PROGRESS_MSG):])
+                except ValueError:
+                    pass
+            elif line == WORKER_DONE_MSG:
+                self.done = True
+                self.fraction = 1.0
+
+    def is_running(self):
+        return self.process.poll() == None
+
+    def succeeded(self):
+        # Process may exit before reader thread has handled its last output lines.
+        self.reader_thread.join()
+        if self.done == False or self.process.returncode != 0:
+            return False
+        try:
+            return os.path.getsize(self.chunk_path) > 0
+        except OSError:
+            return False
+
+    def abort(self):
+        if self.process.poll() == None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+
+# --------------------------------------------------------------------- chunk worker process
+def chunk_render_main(root_path, project_path, job_path, chunk_path, range_in, range_out, media):
+    """
+    Entry point for worker processes launched by ChunkedRenderPlayer.
+    """
+    try:
+        editorstate.mlt_version = mlt.LIBMLT_VERSION
+    except:
+        editorstate.mlt_version = "0.0.99" # magic string for "not found"
+
+    userfolders.init()
+    respaths.set_paths(root_path)
+    editorpersistance.load()
+    mltinit.init_with_translations()
+
+    render_job = utils.unpickle(job_path)
+    profile = mltprofiles.get_profile(render_job["profile_name"])
+
+    persistance.show_messages = False
+    project = persistance.load_project(project_path, False)
+    project.c_seq.fix_v1_for_render()
+
+    args_vals_list = list(render_job["args_vals_list"])
+    if media == "audio":
+        args_vals_list.extend([("vn", "1"), ("video_off", "1")])
+    else:
+        args_vals_list.extend([("an", "1"), ("audio_off", "1")])
+    consumer = renderconsumer.get_mlt_render_consumer(chunk_path, profile, args_vals_list)
+
+    # Range is rendered as whole producer so that rendering stops exactly on range last frame.
+    chunk_length = range_out - range_in + 1
+    tractor = mlt.Tractor()
+    multitrack = tractor.multitrack()
+    track0 = mlt.Playlist()
+    multitrack.connect(track0, 0)
+    track0.insert(project.c_seq.tractor, 0, range_in, range_out)
+
+    render_thread = renderconsumer.FileRenderPlayer(None, tractor, consumer, 0, chunk_length - 1)
+    render_thread.wait_for_producer_end_stop = True
+    render_thread.start()
+
+    while render_thread.stopped == False:
+        print(WORKER_PROGRESS_MSG + str(render_thread.get_render_fraction()), flush=True)
+        time.sleep(0.2)
+
+    render_thread.shutdown()
+
+    print(WORKER_DONE_MSG, flush=True)
+
+
+# --------------------------------------------------------------------- utils
+def _get_gop_aligned_length(chunk_frames, args_vals_list):
+    # Chunk lengths are made multiples of GOP length so that keyframes are where single encoder would put them.
+    for arg, val in args_vals_list:
+        if arg == "g":
+            try:
+                gop_length = int(val)
+            except ValueError:
+                break
+            if gop_length > 1:
+                chunk_frames = ((chunk_frames + gop_length - 1) // gop_length) * gop_length
+            break
+
+    return chunk_frames
+
+def _has_audio(args_vals_list):
+    for arg, val in args_vals_list:
+        if arg == "an" or arg == "audio_off":
+            return False
+    return True
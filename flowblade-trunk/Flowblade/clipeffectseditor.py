@@ -1123,6 +1123,7 @@ class PropertyChangePollingThread(threading.Thread):
                 if changed:
                     global filter_changed_since_last_save
                     filter_changed_since_last_save = True
+                    tlinerender.get_renderer().clip_changed(_filter_stack.clip)
                     tlinerender.get_renderer().timeline_changed()
 
                 self.last_properties = new_properties
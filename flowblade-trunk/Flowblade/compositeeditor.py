@@ -420,6 +420,7 @@ class PropertyChangePollingThread(threading.Thread):
                 if changed:
                     global compositor_changed_since_last_save
                     compositor_changed_since_last_save = True
+                    tlinerender.get_renderer().compositor_changed(compositor)
                     tlinerender.get_renderer().timeline_changed()
 
                 self.last_properties = new_properties
@@ -40,6 +40,7 @@ import appconsts
 import atomicfile
 import blenderheadless
 import ccrutils
+import containerpreviewcache
 import dialogutils
 import edit
 import editorstate
@@ -62,6 +63,7 @@ import toolsencoding
 import updater
 import userfolders
 import utils
+import workerserver
 
 """
 This module creates <ConatainerClipType>Actions wrapper objects for container clips data that are used to execute
@@ -530,7 +532,7 @@ class GMicContainerActions(AbstractContainerActionObject):
         for arg in args:
             command_list.append(arg)
 
-        subprocess.Popen(command_list)
+        workerserver.launch_process(command_list)
         
     def update_render_status(self):
         GLib.idle_add(self._do_update_render_status)
@@ -678,7 +680,7 @@ class FluxityContainerActions(AbstractContainerActionObject):
         for arg in args:
             command_list.append(arg)
 
-        subprocess.Popen(command_list)
+        workerserver.launch_process(command_list)
         
     def update_render_status(self):
         GLib.idle_add(self._do_update_render_status)
@@ -803,12 +805,20 @@ class FluxityContainerActions(AbstractContainerActionObject):
         if not os.path.exists(out_folder):
             os.mkdir(out_folder)
 
+        # Script output only depends on script, editor values, profile and frame.
+        cache_key = containerpreviewcache.get_frame_key(self.container_data.program, new_editors_list, 
+                                                        current_sequence().profile.description(), preview_frame)
+        if containerpreviewcache.get_frame(cache_key, out_folder + "/preview.png") == True:
+            completed_callback()
+            return
+
         fctx = fluxity.render_preview_frame(user_script, script_file, preview_frame, out_folder, profile_file_path, editors_data_json)
         if fctx.error != None:
             error_callback(fctx.error)
             return
                     
         fctx.priv_context.write_out_frame(True)
+        containerpreviewcache.put_frame(cache_key, fctx.priv_context.get_preview_frame_path())
         
         completed_callback()
 
@@ -885,7 +895,7 @@ class MLTXMLContainerActions(AbstractContainerActionObject):
         for arg in args:
             command_list.append(arg)
 
-        subprocess.Popen(command_list)
+        workerserver.launch_process(command_list)
 
     def update_render_status(self):
         GLib.idle_add(self._do_update_render_status)
@@ -1074,6 +1084,7 @@ class BlenderContainerActions(AbstractContainerActionObject):
             if self.render_type != PREVIEW_RENDER:
                 GLib.idle_add(self.create_producer_and_do_update_edit, None)
             else:
+                containerpreviewcache.put_frame(self.preview_cache_key, self.get_preview_frame_path(self.render_range_in))
                 self.program_editor_window.preview_render_complete()
                 
         else:
@@ -1109,8 +1120,24 @@ class BlenderContainerActions(AbstractContainerActionObject):
     def render_blender_preview(self, program_editor_window, editors, preview_frame):
         self.program_editor_window = program_editor_window
         self.update_program_values_from_editors(editors)
+
+        # Rendered frame only depends on project file, edited values, profile and frame.
+        self.preview_cache_key = containerpreviewcache.get_frame_key(self.container_data.program, self.container_data.data_slots["project_edit_info"], 
+                                                                     current_sequence().profile.description(), preview_frame)
+        self.create_data_dirs_if_needed()
+        if self.container_data.render_data == None:
+            self.container_data.render_data = toolsencoding.create_container_clip_default_render_data_object(current_sequence().profile)
+        if not os.path.exists(self.get_preview_media_dir()):
+            os.mkdir(self.get_preview_media_dir())
+        if containerpreviewcache.get_frame(self.preview_cache_key, self.get_preview_frame_path(preview_frame)) == True:
+            GLib.idle_add(program_editor_window.preview_render_complete)
+            return
+
         self.render_preview(None, preview_frame, 0)
 
+    def get_preview_frame_path(self, frame):
+        return self.get_preview_media_dir() + "/frame" + str(frame).zfill(4) + ".png"
+
     def project_edit_done(self, response_is_accept, dialog, editors, orig_program_info_json):
         if response_is_accept == True:
             self.update_program_values_from_editors(editors)
@@ -0,0 +1,126 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module handles disk cache for rendered container clip preview frames.
+
+Frames are named with hash of program file contents, editor values, profile and frame number,
+so cached frames are reused across sessions and container clips using same program
+and a frame is rendered again only when some of its inputs change.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import appconsts
+import atomicfile
+import editorpersistance
+import userfolders
+
+PROGRAM_READ_BLOCK_SIZE = 1024 * 1024
+
+_program_digests = {} # (program path, size, mtime) -> program file contents md5
+
+
+# ------------------------------------------------- interface
+def get_frame_key(program_path, editors_data, profile_desc, frame):
+    """
+    Returns cache key for preview frame, editors_data is any JSON serializable data describing editor values.
+    """
+    key_str = get_program_digest(program_path) + json.dumps(editors_data, sort_keys=True) + profile_desc + str(frame)
+    return hashlib.md5(key_str.encode('utf-8')).hexdigest()
+
+def get_program_digest(program_path):
+    st = os.stat(program_path)
+    file_key = (program_path, st.st_size, st.st_mtime_ns)
+    try:
+        return _program_digests[file_key]
+    except KeyError:
+        pass
+
+    # Blender project files can be large, contents are only hashed again when file changes.
+    md5 = hashlib.md5()
+    with open(program_path, "rb") as f:
+        for block in iter(lambda: f.read(PROGRAM_READ_BLOCK_SIZE), b""):
+            md5.update(block)
+
+    digest = md5.hexdigest()
+    _program_digests[file_key] = digest
+    return digest
+
+def get_frame(key, out_path):
+    """
+    Copies cached frame to out_path and returns True, or returns False if frame is not in cache.
+    """
+    frame_path = _get_frame_path(key)
+    try:
+        shutil.copyfile(frame_path, out_path)
+    except OSError:
+        return False
+
+    os.utime(frame_path) # Cache is trimmed in least recently used order.
+    return True
+
+def put_frame(key, rendered_path):
+    try:
+        with open(rendered_path, "rb") as f:
+            data = f.read()
+        with atomicfile.AtomicFileWriter(_get_frame_path(key), "wb") as afw:
+            afw.get_file().write(data)
+    except Exception as e:
+        print("Adding container clip preview frame to cache failed:", e)
+        return
+
+    _trim_cache()
+
+def _get_frame_path(key):
+    return _get_cache_dir() + "/" + key + ".png"
+
+def _get_cache_dir():
+    return userfolders.get_cache_dir() + appconsts.CONTAINER_PREVIEWS_DIR
+
+def _trim_cache():
+    budget_bytes = editorpersistance.prefs.container_preview_cache_mb * 1024 * 1024
+
+    cache_dir = _get_cache_dir()
+    frame_files = []
+    for frame_file in os.listdir(cache_dir):
+        try:
+            st = os.stat(cache_dir + "/" + frame_file)
+        except OSError:
+            continue
+        frame_files.append((st.st_mtime, st.st_size, frame_file))
+
+    used_bytes = sum([frame_size for mtime, frame_size, frame_file in frame_files])
+    if used_bytes <= budget_bytes:
+        return
+
+    # Remove least recently used frames until cache is at 80% of budget.
+    frame_files.sort()
+    for mtime, frame_size, frame_file in frame_files:
+        if used_bytes <= budget_bytes * 0.8:
+            break
+        try:
+            os.remove(cache_dir + "/" + frame_file)
+        except OSError:
+            pass
+        used_bytes -= frame_size
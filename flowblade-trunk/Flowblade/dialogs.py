@@ -41,6 +41,7 @@ import mltprofiles
 import mltfilters
 import mlttransitions
 import panels
+import projectsnapshot
 import renderconsumer
 import respaths
 import shortcuts
@@ -1084,7 +1085,7 @@ def autosaves_many_recovery_dialog(response_callback, autosaves, parent_window):
 
 def _autosaves_delete_all_clicked(autosaves, autosaves_view, dialog):
     for autosave in autosaves:
-        os.remove(autosave.path)
+        projectsnapshot.delete_snapshot(autosave.path)
     dialog.set_response_sensitive(Gtk.ResponseType.OK, False)
     del autosaves[:]
     autosaves_view.fill_data_model(autosaves)
@@ -1092,7 +1093,7 @@ def _autosaves_delete_all_clicked(autosaves, autosaves_view, dialog):
 def _autosaves_delete_unselected(autosaves, autosaves_view):
     selected_autosave = autosaves.pop(autosaves_view.get_selected_indexes_list()[0])
     for autosave in autosaves:
-        os.remove(autosave.path)
+        projectsnapshot.delete_snapshot(autosave.path)
     del autosaves[:]
     autosaves.append(selected_autosave)
     autosaves_view.fill_data_model(autosaves)
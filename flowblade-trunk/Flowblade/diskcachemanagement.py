@@ -233,6 +233,8 @@ def _get_disk_dir_panels():
     panels.append(DiskFolderManagementPanel(userfolders.get_render_dir(), "/" + appconsts.PROXIES_DIR, _("Proxy Files"), PROJECT_DATA_WARNING))
     panels.append(DiskFolderManagementPanel(userfolders.get_data_dir(), appconsts.CONTAINER_CLIPS_DIR, _("Container Clips"), PROJECT_DATA_WARNING, True))
     panels.append(DiskFolderManagementPanel(userfolders.get_cache_dir(), appconsts.THUMBNAILS_DIR, _("Thumbnails"), RECREATE_WARNING))
+    panels.append(DiskFolderManagementPanel(userfolders.get_cache_dir(), appconsts.FILMSTRIP_DIR, _("Timeline Filmstrip Frames"), NO_WARNING))
+    panels.append(DiskFolderManagementPanel(userfolders.get_cache_dir(), appconsts.CONTAINER_PREVIEWS_DIR, _("Container Clip Preview Frames"), NO_WARNING))
     panels.append(DiskFolderManagementPanel(userfolders.get_data_dir(), appconsts.USER_PROFILES_DIR_NO_SLASH, _("User Created Custom Profiles"), PROJECT_DATA_WARNING))
 
     return panels
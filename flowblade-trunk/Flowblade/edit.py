@@ -65,6 +65,7 @@ def append_clip(track, clip, clip_in, clip_out):
     clip.clip_out = clip_out
     track.clips.append(clip) # py
     track.append(clip, clip_in, clip_out) # mlt
+    track.sequence.clip_index.track_changed(track)
     resync.clip_added_to_timeline(clip, track)
 
 def _insert_clip(track, clip, index, clip_in, clip_out):
@@ -75,6 +76,7 @@ def _insert_clip(track, clip, index, clip_in, clip_out):
     clip.clip_out = clip_out
     track.clips.insert(index, clip) # py
     track.insert(clip, index, clip_in, clip_out) # mlt
+    track.sequence.clip_index.track_changed(track)
     resync.clip_added_to_timeline(clip, track)
 
 def _insert_blank(track, index, length):
@@ -85,6 +87,7 @@ def _insert_blank(track, index, length):
     blank_clip.clip_out = length - 1 # -1, end inclusive
     blank_clip.is_blanck_clip = True
     track.clips.insert(index, blank_clip)
+    track.sequence.clip_index.track_changed(track)
     
 def _remove_clip(track, index):
     """
@@ -92,6 +95,7 @@ def _remove_clip(track, index):
     """
     track.remove(index)
     clip = track.clips.pop(index)
+    track.sequence.clip_index.track_changed(track)
     resync.clip_removed_from_timeline(clip)
     
     return clip
@@ -132,6 +136,7 @@ def _add_blank_to_py(track, index, length):
     blank_clip.clip_out = length - 1 # -1, end inclusive
     blank_clip.is_blanck_clip = True
     track.clips.insert(index, blank_clip)
+    track.sequence.clip_index.track_changed(track)
     return blank_clip
 
 # --------------------------------- util methods
@@ -142,6 +147,7 @@ def _set_in_out(clip, c_in, c_out):
     clip.clip_in = c_in
     clip.clip_out = c_out
     clip.set_in_and_out(c_in, c_out)
+    current_sequence().clip_index.invalidate() # We don't know the track here.
     
 def _clip_length(clip): # check if can be removed
     return clip.clip_out - clip.clip_in + 1 # +1, end inclusive
@@ -337,6 +343,10 @@ class EditAction:
         # Pasting filters to clip might not be detected by our quite naive algorithm as
         # clip's filters stack having being changed, so we use this to force update on that edit action. 
         self.force_effects_editor_update = False 
+
+        # Edits that set this can be collapsed into previous edit of same kind in undo stack,
+        # func(self, next_edit) updates this edit to also contain next edit and returns True if that could be done.
+        self.merge_func = None
         
     def do_edit(self):
         if self.exit_active_trimmode_on_edit:
@@ -356,6 +366,15 @@ class EditAction:
 
         trackaction.maybe_do_auto_expand(tracks_clips_count_before)
         
+    def merge(self, next_edit):
+        """
+        Collapses already done next edit into this edit, returns True if edits were merged.
+        """
+        if self.merge_func == None or getattr(next_edit, "merge_func", None) != self.merge_func:
+            return False
+        
+        return self.merge_func(self, next_edit)
+
     def undo(self):
         PLAYER().stop_playback()
 
@@ -484,6 +503,9 @@ class ConsolidatedEditAction:
         if self.edit_actions[0].stop_for_edit or self.edit_actions[0].turn_on_stop_for_edit:
             PLAYER().consumer.start()
             
+    def merge(self, next_edit):
+        return False
+
     def redo(self):
         for edit_action in self.edit_actions:
             edit_action.redo()
@@ -1571,6 +1593,7 @@ def trim_start_action(data):
     action = EditAction(_trim_start_undo,_trim_start_redo, data)
     action.exit_active_trimmode_on_edit = False
     action.update_hidden_track_blank = False
+    action.merge_func = _trim_merge
     return action
 
 def _trim_start_undo(self):
@@ -1596,6 +1619,7 @@ def trim_end_action(data):
     action = EditAction(_trim_end_undo,_trim_end_redo, data)
     action.exit_active_trimmode_on_edit = False
     action.update_hidden_track_blank = False
+    action.merge_func = _trim_merge
     return action
 
 def _trim_end_undo(self):
@@ -1613,6 +1637,15 @@ def _trim_end_redo(self):
         self.first_do = False
         self.undo_done_callback(self.track, self.index + 1, False)
 
+def _trim_merge(self, next_edit):
+    # Successive trims of the same clip end are collapsed into one trim with summed delta.
+    if next_edit.undo_func != self.undo_func or next_edit.track != self.track \
+        or next_edit.clip != self.clip or next_edit.index != self.index:
+        return False
+    
+    self.delta = self.delta + next_edit.delta
+    return True
+
 #------------------ TRIM LAST CLIP END
 # "track","clip","index","delta", "first_do"
 # "undo_done_callback" <- THIS IS BADLY NAMED, IT SHOULD BE FIRST DO CALLBACK
@@ -2123,6 +2156,7 @@ def _delete_compositor_redo(self):
 def move_compositor_action(data):
     action = EditAction(_move_compositor_undo, _move_compositor_redo, data)
     action.first_do = True
+    action.merge_func = _move_compositor_merge
     return action  
 
 def _move_compositor_undo(self):
@@ -2145,6 +2179,16 @@ def _move_compositor_redo(self):
 
     compositeeditor.set_compositor(self.compositor) # This is different to updating e.g filter kfeditors, those are done in EditAction._update_gui()
 
+def _move_compositor_merge(self, next_edit):
+    # Successive moves of the same compositor are collapsed into one move from first original position.
+    if next_edit.destroy_id != self.destroy_id:
+        return False
+
+    self.compositor = next_edit.compositor
+    self.clip_in = next_edit.clip_in
+    self.clip_out = next_edit.clip_out
+    return True
+
 #----------------- AUDIO SPLICE
 # "parent_clip", "audio_clip", "track"
 def audio_splice_action(data):
@@ -190,7 +190,8 @@ def update_prefs_from_widgets(widgets_tuples_tuple):
     window_mode_combo, full_names, double_track_hights, top_row_layout, layout_monitor, colorized_icons = view_prefs_widgets
 
     # Jan-2017 - SvdB
-    perf_render_threads, perf_drop_frames = performance_widgets
+    perf_render_threads, perf_drop_frames, chunked_render, render_chunk_workers, batch_render_slots, \
+        headless_worker_server, headless_worker_pool_size, max_loaded_sequences = performance_widgets
 
     global prefs
     prefs.open_in_last_opended_media_dir = open_in_last_opened_check.get_active()
@@ -229,6 +230,12 @@ def update_prefs_from_widgets(widgets_tuples_tuple):
     # Jan-2017 - SvdB
     prefs.perf_render_threads = int(perf_render_threads.get_adjustment().get_value())
     prefs.perf_drop_frames = perf_drop_frames.get_active()
+    prefs.chunked_render = chunked_render.get_active()
+    prefs.render_chunk_workers = int(render_chunk_workers.get_adjustment().get_value())
+    prefs.batch_render_slots = int(batch_render_slots.get_adjustment().get_value())
+    prefs.headless_worker_server = headless_worker_server.get_active()
+    prefs.headless_worker_pool_size = int(headless_worker_pool_size.get_adjustment().get_value())
+    prefs.max_loaded_sequences = int(max_loaded_sequences.get_adjustment().get_value())
     # Feb-2017 - SvdB - for full file names
     prefs.show_full_file_names = full_names.get_active()
     prefs.center_on_arrow_move = auto_center_on_updown.get_active()
@@ -372,4 +379,23 @@ class EditorPreferences:
         self.auto_expand_tracks = True
         self.quick_effects = None
         self.auto_render_media_plugins = True
-        
\ No newline at end of file
+        self.tline_render_max_workers = 1 # 1 renders segments sequentially in render server process, > 1 renders segments concurrently in worker processes.
+        self.audio_levels_memory_cache_mb = 64 # Memory budget for audio levels data cache.
+        self.waveform_tiles_memory_cache_mb = 32 # Memory budget for rasterized timeline waveform images cache.
+        self.undo_memory_budget_mb = 256 # Memory budget for undo stack, oldest undos are dropped when exceeded.
+        self.gmic_render_workers = 0 # Number of parallel gmic processes used to render frames, 0 decides from available cores.
+        self.gmic_stream_render = True # Render G'MIC video clips by piping frames between MLT, gmic and encoder instead of writing frame files.
+        self.proxy_render_max_jobs = 0 # Max number of concurrent proxy renders, 0 decides from available cores and memory.
+        self.proxy_img_seq_format = "png" # Image format for image sequence proxy frames, "png", "jpeg" or "webp".
+        self.thumbnail_format = "jpeg" # Image format for media thumbnails, "jpeg", "webp" or "png".
+        self.filmstrip_tiles_memory_cache_mb = 64 # Memory budget for timeline filmstrip frame images cache.
+        self.filmstrip_disk_cache_mb = 256 # Disk space budget for timeline filmstrip frame images.
+        self.container_preview_cache_mb = 256 # Disk space budget for rendered container clip preview frames.
+        self.lazy_sequence_load = True # Create MLT objects for sequences when they are first opened instead of on project load.
+        self.max_loaded_sequences = 0 # Max number of sequences kept loaded counting current sequence, least recently opened are unloaded, 0 keeps all opened sequences loaded.
+        self.chunked_render = False # Render final renders in parallel chunks that are joined without re-encoding.
+        self.render_chunk_frames = 1500 # Default chunk length for chunked rendering, encodings may override this.
+        self.render_chunk_workers = 0 # Number of concurrent chunk render processes, 0 decides from available cores.
+        self.batch_render_slots = 0 # Sum of CPU weights of batch render queue items rendered concurrently, 0 decides from available cores.
+        self.headless_worker_server = False # Run headless tool renders in pre-started worker processes with initialized MLT environment.
+        self.headless_worker_pool_size = 0 # Number of pre-started headless worker processes, 0 decides from available cores.
@@ -0,0 +1,259 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module handles decoding and caching frame image tiles for timeline clip filmstrips.
+
+Tiles are indexed by (media file path, frame, height). Timeline drawing only looks up tiles from memory cache
+and requests missing ones, worker threads load requested tiles from disk cache or decode them with MLT
+and timeline is repainted when tiles become available.
+"""
+
+from gi.repository import GLib
+
+import cairo
+import collections
+import hashlib
+try:
+    import mlt7 as mlt
+except:
+    import mlt
+import os
+from PIL import Image
+import queue
+import threading
+
+import appconsts
+import atomicfile
+import editorpersistance
+import updater
+import userfolders
+
+FILMSTRIP_WORKERS = 2
+WORKER_PRODUCERS = 4 # Number of open producers kept by each worker for reuse.
+REPAINT_DELAY_MS = 100 # Repaints for tiles arriving during this time are combined.
+
+_filmstrips = None # FilmstripTiles
+
+
+# ------------------------------------------------- interface
+def clear_cache():
+    global _filmstrips
+    if _filmstrips != None:
+        _filmstrips.shutdown()
+
+    _filmstrips = FilmstripTiles(editorpersistance.prefs.filmstrip_tiles_memory_cache_mb * 1024 * 1024,
+                                 editorpersistance.prefs.filmstrip_disk_cache_mb * 1024 * 1024)
+
+def new_repaint():
+    """
+    Called at timeline repaint start, requests not repeated during this or next repaint are dropped.
+    """
+    if _filmstrips != None:
+        _filmstrips.repaint_count += 1
+
+def get_tile(profile, media_file_path, frame, height):
+    """
+    Returns cairo.ImageSurface for frame or None and queues decode if tile is not yet available.
+    """
+    if _filmstrips == None:
+        clear_cache()
+
+    return _filmstrips.get_tile(profile, media_file_path, frame, height)
+
+def get_tile_width(profile, height):
+    return int(round(height * profile.display_aspect_num() / float(profile.display_aspect_den())))
+
+
+# ------------------------------------------------- cache
+class FilmstripTiles:
+
+    def __init__(self, budget_bytes, disk_budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.disk_budget_bytes = disk_budget_bytes
+        self.used_bytes = 0
+        self.tiles = collections.OrderedDict() # (media file path, frame, height) -> cairo.ImageSurface
+        self.requested = {} # (media file path, frame, height) -> repaint count when last requested
+        self.failed = set() # Tiles that could not be decoded are not requested again.
+        self.repaint_count = 0
+        self.repaint_pending = False
+
+        self.jobs = queue.LifoQueue() # Latest requests are for the currently displayed timeline area.
+        self.disk_used_bytes = None # Computed by first worker that writes a tile.
+        self.disk_lock = threading.Lock()
+        self.workers = []
+        for i in range(0, FILMSTRIP_WORKERS):
+            worker = threading.Thread(target=self._run_worker)
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+
+    def get_tile(self, profile, media_file_path, frame, height):
+        key = (media_file_path, frame, height)
+        try:
+            tile = self.tiles[key]
+            self.tiles.move_to_end(key)
+            return tile
+        except KeyError:
+            pass
+
+        if key in self.failed:
+            return None
+        if key not in self.requested:
+            self.jobs.put((profile, key))
+        self.requested[key] = self.repaint_count
+        return None
+
+    def shutdown(self):
+        for worker in self.workers:
+            self.jobs.put(None)
+
+    def _tile_done(self, key, tile):
+        self.requested.pop(key, None)
+        if tile == None:
+            self.failed.add(key)
+            return False
+
+        self.tiles[key] = tile
+        self.used_bytes += tile.get_stride() * tile.get_height()
+        while self.used_bytes > self.budget_bytes and len(self.tiles) > 1:
+            evicted_key, evicted_tile = self.tiles.popitem(last=False)
+            self.used_bytes -= evicted_tile.get_stride() * evicted_tile.get_height()
+
+        if self.repaint_pending == False:
+            self.repaint_pending = True
+            GLib.timeout_add(REPAINT_DELAY_MS, self._repaint)
+        return False
+
+    def _request_dropped(self, profile, key):
+        if self.requested.get(key, -1) >= self.repaint_count - 1:
+            self.jobs.put((profile, key)) # Requested again after worker dropped it.
+        else:
+            self.requested.pop(key, None)
+        return False
+
+    def _repaint(self):
+        self.repaint_pending = False
+        if self is _filmstrips:
+            updater.repaint_tline()
+        return False
+
+    # --------------------------------------------- workers
+    def _run_worker(self):
+        producers = collections.OrderedDict() # media file path -> mlt.Producer
+        while True:
+            job = self.jobs.get()
+            if job == None:
+                return
+
+            profile, key = job
+            # Timeline has been scrolled or zoomed away from tile if it was not requested by latest repaints.
+            if self.requested.get(key, self.repaint_count) < self.repaint_count - 1:
+                GLib.idle_add(self._request_dropped, profile, key)
+                continue
+
+            try:
+                tile = self._get_tile_image(profile, key, producers)
+            except Exception as e:
+                print("Filmstrip tile decode failed for", key, e)
+                tile = None
+
+            GLib.idle_add(self._tile_done, key, tile)
+
+    def _get_tile_image(self, profile, key, producers):
+        media_file_path, frame, height = key
+        width = get_tile_width(profile, height)
+
+        tile_path = _get_tile_path(media_file_path, frame, height)
+        if os.path.isfile(tile_path):
+            os.utime(tile_path) # Disk cache is trimmed in least recently used order.
+            image = Image.open(tile_path)
+            image.load()
+            return _get_surface(image.convert("RGB"))
+
+        try:
+            producer = producers[media_file_path]
+            producers.move_to_end(media_file_path)
+        except KeyError:
+            producer = mlt.Producer(profile, str(media_file_path))
+            if producer.is_valid() == False:
+                return None
+            producer.set_speed(0)
+            producers[media_file_path] = producer
+            if len(producers) > WORKER_PRODUCERS:
+                producers.popitem(last=False)
+
+        producer.seek(frame)
+        mlt_frame = producer.get_frame()
+        mlt_frame.set("consumer_deinterlace", 1)
+        rgba = mlt_frame.get_image(mlt.mlt_image_rgba, width, height)
+        image = Image.frombuffer("RGBA", (width, height), rgba, "raw", "RGBA", 0, 1).convert("RGB")
+
+        with atomicfile.AtomicFileWriter(tile_path, "wb") as afw:
+            image.save(afw.get_file(), "JPEG", quality=80)
+        self._tile_written(os.path.getsize(tile_path))
+
+        return _get_surface(image)
+
+    def _tile_written(self, size):
+        with self.disk_lock:
+            tiles_dir = userfolders.get_cache_dir() + appconsts.FILMSTRIP_DIR
+            if self.disk_used_bytes != None:
+                self.disk_used_bytes += size
+                if self.disk_used_bytes <= self.disk_budget_bytes:
+                    return
+
+            # Get disk usage on first write and when budget is exceeded, files being written by other worker may disappear.
+            tile_files = []
+            for tile_file in os.listdir(tiles_dir):
+                try:
+                    st = os.stat(tiles_dir + "/" + tile_file)
+                except OSError:
+                    continue
+                tile_files.append((st.st_mtime, st.st_size, tile_file))
+            self.disk_used_bytes = sum([tile_size for mtime, tile_size, tile_file in tile_files])
+            if self.disk_used_bytes <= self.disk_budget_bytes:
+                return
+
+            # Remove least recently used tiles until disk cache is at 80% of budget.
+            tile_files.sort()
+            for mtime, tile_size, tile_file in tile_files:
+                if self.disk_used_bytes <= self.disk_budget_bytes * 0.8:
+                    break
+                try:
+                    os.remove(tiles_dir + "/" + tile_file)
+                except OSError:
+                    pass
+                self.disk_used_bytes -= tile_size
+
+
+def _get_tile_path(media_file_path, frame, height):
+    try:
+        st = os.stat(media_file_path)
+        key = media_file_path + str(st.st_size) + str(st.st_mtime_ns)
+    except OSError:
+        key = media_file_path # Image sequence resource names are not files.
+    md_str = hashlib.md5(key.encode('utf-8')).hexdigest()
+    return userfolders.get_cache_dir() + appconsts.FILMSTRIP_DIR + "/" + md_str + "_" + str(frame) + "_" + str(height) + ".jpg"
+
+def _get_surface(image):
+    w, h = image.size
+    data = bytearray(image.convert("RGBA").tobytes("raw", "BGRA")) # cairo ARGB32 is BGRA in memory on little endian.
+    return cairo.ImageSurface.create_for_data(data, cairo.FORMAT_ARGB32, w, h, w * 4)
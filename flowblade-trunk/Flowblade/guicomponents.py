@@ -3449,6 +3449,14 @@ def get_audio_levels_popup_menu(event, callback):
 
     menu.append(thumbs_item)
 
+    filmstrip_item = Gtk.CheckMenuItem()
+    filmstrip_item.set_label(_("Display Clip Filmstrips"))
+    filmstrip_item.set_active(editorstate.display_clip_filmstrips)
+    filmstrip_item.set_sensitive(editorstate.display_clip_media_thumbnails)
+    filmstrip_item.connect("activate", callback, "filmstrip")
+
+    menu.append(filmstrip_item)
+
     allways_item = Gtk.CheckMenuItem()
     allways_item.set_label(_("Display Audio Levels"))
     allways_item.set_active(editorstate.display_all_audio_levels)
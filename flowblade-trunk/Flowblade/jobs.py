@@ -23,13 +23,14 @@ from gi.repository import Gtk, GLib, Gdk, GdkPixbuf
 from gi.repository import GObject
 from gi.repository import Pango
 
+import multiprocessing
 import os
-import subprocess
 import sys
 import time
 import threading
 
 import appconsts
+import ccrutils
 import editorlayout
 import editorpersistance
 from editorstate import PROJECT
@@ -42,6 +43,7 @@ import proxyheadless
 import respaths
 import userfolders
 import utils
+import workerserver
 
 QUEUED = 0
 RENDERING = 1
@@ -56,6 +58,9 @@ MOTION_MEDIA_ITEM_RENDER = 4
 PROXY_RENDER = 5
 CONTAINER_CLIP_RENDER_FLUXITY = 6
 
+PROXY_BACKGROUND_NICENESS = 5 # Added niceness for proxy renders of media not on timeline.
+PROXY_JOB_MEMORY_ESTIMATE_MB = 512 # Used to limit concurrent proxy renders by available memory.
+
 open_media_file_callback = None
 
 _status_polling_thread = None
@@ -68,6 +73,10 @@ _remove_list = [] # objects are removed from GUI with delay to give user time to
 
 _jobs_render_progress_window = None
 
+_proxy_stats_label = None
+_proxy_batch_start_time = None # Set when first proxy render in a batch of proxy renders starts.
+_proxy_completed_frames = 0
+
 
 class JobProxy: # This object represnts job in job queue. 
 
@@ -131,17 +140,15 @@ class JobQueueMessage:  # Jobs communicate with job queue by sending these objec
 #---------------------------------------------------------------- interface
 def add_job(job_proxy):
     global _jobs, _jobs_list_view 
+    # Render processes launched after this report status through channel.
+    ccrutils.start_status_channel(_status_channel_message)
+
     _jobs.append(job_proxy)
     _jobs_list_view.fill_data_model()
     if editorpersistance.prefs.open_jobs_panel_on_add == True:
         editorlayout.show_panel(appconsts.PANEL_JOBS)
     
-    if editorpersistance.prefs.render_jobs_sequentially == False: # Feature not active for first release 2.6.
-        job_proxy.start_render()
-    else:
-         running = _get_jobs_with_status(RENDERING)
-         if len(running) == 0:
-             job_proxy.start_render()
+    _start_queued_jobs()
 
     # Get polling going if needed.
     global _status_polling_thread
@@ -177,9 +184,10 @@ def update_job_queue(job_msg): # We're using JobProxy objects as messages to upd
         _jobs[row].progress = 1.0
         _remove_list.append(_jobs[row])
         GLib.timeout_add(4000, _remove_jobs)
-        waiting_jobs = _get_jobs_with_status(QUEUED)
-        if len(waiting_jobs) > 0:
-            waiting_jobs[0].start_render()
+        if _jobs[row].type == PROXY_RENDER:
+            global _proxy_completed_frames
+            _proxy_completed_frames += _jobs[row].length
+        _start_queued_jobs()
     else:
         _jobs[row].status = job_msg.status
 
@@ -193,6 +201,9 @@ def update_job_queue(job_msg): # We're using JobProxy objects as messages to upd
 
     _jobs_list_view.scroll.queue_draw()
 
+    if _jobs[row].type == PROXY_RENDER:
+        _update_proxy_stats()
+
 def _cancel_all_jobs():
     global _jobs, _remove_list
     _remove_list = []
@@ -235,9 +246,14 @@ def get_jobs_panel():
     actions_menu.connect_launched_menu(_hamburger_menu)
     guiutils.set_margins(actions_menu.widget, 8, 2, 2, 18)
 
+    global _proxy_stats_label
+    _proxy_stats_label = Gtk.Label()
+    guiutils.set_margins(_proxy_stats_label, 8, 2, 2, 18)
+
     row2 =  Gtk.HBox()
     row2.pack_start(actions_menu.widget, False, True, 0)
     row2.pack_start(Gtk.Label(), True, True, 0)
+    row2.pack_start(_proxy_stats_label, False, True, 0)
 
     panel = Gtk.VBox()
     panel.pack_start(_jobs_list_view, True, True, 0)
@@ -320,17 +336,97 @@ def _remove_jobs():
         else:
             pass
 
-    running = _get_jobs_with_status(RENDERING)
-    if len(running) == 0:
-        in_queue = _get_jobs_with_status(QUEUED)
-        if len(in_queue) > 0:
-            in_queue[0].start_render()
+    _start_queued_jobs()
 
     _jobs_list_view.fill_data_model()
     _jobs_list_view.scroll.queue_draw()
 
     _remove_list = []
 
+    _update_proxy_stats()
+
+def _start_queued_jobs():
+    # Proxy renders are scheduled separately from other renders so a large batch of proxy files
+    # does not block e.g. container clip renders and vice versa.
+    running = _get_jobs_with_status(RENDERING)
+    queued = _get_jobs_with_status(QUEUED)
+
+    running_proxy_jobs = [job for job in running if job.type == PROXY_RENDER]
+    running_other_jobs = [job for job in running if job.type != PROXY_RENDER]
+
+    # Proxies for media already on timeline first, otherwise in order added.
+    queued_proxy_jobs = [job for job in queued if job.type == PROXY_RENDER]
+    queued_proxy_jobs.sort(key=lambda job: job.on_timeline == False)
+    free_proxy_slots = _get_proxy_jobs_limit() - len(running_proxy_jobs)
+    for job in queued_proxy_jobs[0:max(free_proxy_slots, 0)]:
+        _start_proxy_job(job)
+
+    queued_other_jobs = [job for job in queued if job.type != PROXY_RENDER]
+    if editorpersistance.prefs.render_jobs_sequentially == False:
+        for job in queued_other_jobs:
+            job.start_render()
+    elif len(running_other_jobs) == 0 and len(queued_other_jobs) > 0:
+        queued_other_jobs[0].start_render()
+
+def _start_proxy_job(job):
+    global _proxy_batch_start_time, _proxy_completed_frames
+    if _proxy_batch_start_time == None:
+        _proxy_batch_start_time = time.monotonic()
+        _proxy_completed_frames = 0
+    job.start_render()
+
+def _get_proxy_jobs_limit():
+    limit = editorpersistance.prefs.proxy_render_max_jobs
+    if limit > 0:
+        return limit
+
+    # Leave some cores free and cap at 8, proxy encoders use multiple threads too.
+    limit = min(max(multiprocessing.cpu_count() - 2, 1), 8)
+
+    available_mb = _get_available_memory_mb()
+    if available_mb != None:
+        limit = min(limit, max(available_mb // PROXY_JOB_MEMORY_ESTIMATE_MB, 1))
+
+    return limit
+
+def _get_available_memory_mb():
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+def _update_proxy_stats():
+    global _proxy_batch_start_time
+    if _proxy_stats_label == None:
+        return
+
+    proxy_jobs = [job for job in _jobs if job.type == PROXY_RENDER and (job.status == RENDERING or job.status == QUEUED)]
+    if len(proxy_jobs) == 0 or _proxy_batch_start_time == None:
+        _proxy_batch_start_time = None
+        _proxy_stats_label.set_text("")
+        return
+
+    done_frames = _proxy_completed_frames
+    left_frames = 0
+    for job in proxy_jobs:
+        if job.status == RENDERING:
+            done_frames += job.progress * job.length
+        left_frames += (1.0 - max(job.progress, 0.0)) * job.length
+
+    elapsed = time.monotonic() - _proxy_batch_start_time
+    if done_frames <= 0 or elapsed <= 0.0:
+        _proxy_stats_label.set_text(_("Proxy Renders: ") + str(len(proxy_jobs)))
+        return
+
+    fps = done_frames / elapsed
+    eta = left_frames / fps
+    _proxy_stats_label.set_text(_("Proxy Renders: ") + str(len(proxy_jobs)) + "  " + str(int(fps)) + _(" fps") \
+                                + "  " + _("ETA ") + utils.get_time_str_for_sec_float(eta))
+
 
 # --------------------------------------------------------- GUI 
 class JobsQueueView(Gtk.VBox):
@@ -495,7 +591,7 @@ class MotionRenderJobQueueObject(AbstractJobQueueObject):
         for arg in self.args:
             command_list.append(arg)
 
-        subprocess.Popen(command_list)
+        workerserver.launch_process(command_list)
         
     def update_render_status(self):
         GLib.idle_add(self._update_from_gui_thread)
@@ -542,11 +638,13 @@ class MotionRenderJobQueueObject(AbstractJobQueueObject):
 
 class ProxyRenderJobQueueObject(AbstractJobQueueObject):
 
-    def __init__(self, session_id, render_data):
+    def __init__(self, session_id, render_data, on_timeline=False, length=0):
         
         AbstractJobQueueObject.__init__(self, session_id, PROXY_RENDER)
         
         self.render_data = render_data
+        self.on_timeline = on_timeline # Proxies for media used in sequences are rendered first with normal priority.
+        self.length = length # Media length in frames, used for throughput stats.
 
     def get_job_name(self):
         folder, file_name = os.path.split(self.render_data.media_file_path)
@@ -568,7 +666,10 @@ class ProxyRenderJobQueueObject(AbstractJobQueueObject):
         session_arg = "session_id:" + str(self.session_id)
         command_list.append(session_arg)
 
-        subprocess.Popen(command_list)
+        if self.on_timeline == True:
+            workerserver.launch_process(command_list)
+        else:
+            workerserver.launch_process(command_list, niceness=PROXY_BACKGROUND_NICENESS)
     
     def update_render_status(self):
 
@@ -636,6 +737,7 @@ class ContainerStatusPollingThread(threading.Thread):
     def __init__(self):
 
         self.abort = False
+        self.update_event = threading.Event()
 
         threading.Thread.__init__(self)
 
@@ -652,20 +754,29 @@ class ContainerStatusPollingThread(threading.Thread):
             elif _jobs_render_progress_window != None and len(_jobs) == 0:
                 _jobs_render_progress_window.jobs_completed()
                 self.abort = True
-                
-            time.sleep(0.5)
+
+            # Completion messages from status channel wake us up before poll interval ends.
+            self.update_event.wait(0.5)
+            self.update_event.clear()
 
     def shutdown(self):
         for job in _jobs:
             job.abort_render()
         
         self.abort = True
+        self.update_event.set()
+
+def _status_channel_message(session_id, msg_type):
+    # Called from status channel thread, progress updates are left for next poll.
+    if msg_type == "completed" and _status_polling_thread != None:
+        _status_polling_thread.update_event.set()
 
 def shutdown_polling():
     if _status_polling_thread == None:
         return
     
     _status_polling_thread.shutdown()
+    ccrutils.stop_status_channel()
 
 
 
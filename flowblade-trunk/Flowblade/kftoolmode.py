@@ -40,6 +40,7 @@ import propertyedit
 import propertyparse
 import respaths
 import sequence
+import tlinerender
 import tlinewidgets
 import updater
 
@@ -528,6 +529,7 @@ class TLineKeyFrameEditor:
     # ------------------------------------------------------ value write out
     def update_property_value(self):
         edit_data["editable_property"].write_out_keyframes(self.keyframes)
+        tlinerender.get_renderer().clip_changed(edit_data["clip"])
 
     # ------------------------------------------------------- debug
     def print_keyframes(self):
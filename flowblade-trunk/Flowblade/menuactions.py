@@ -66,7 +66,7 @@ class RecreateIconsThread(threading.Thread):
                     icon_path = respaths.IMAGE_PATH + "audio_file.png"
                     media_file.info = None
                 else:
-                    (icon_path, length, info) = projectdata.thumbnailer.write_image(media_file.path)
+                    (icon_path, length, info) = projectdata.thumbnailer.write_image(media_file.path, use_cache=False)
                     media_file.info = info
                 media_file.icon_path = icon_path
                 media_file.create_icon()
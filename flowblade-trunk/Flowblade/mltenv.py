@@ -43,45 +43,7 @@ def check_available_features(repo):
         global services
         global transitions
         global environment_detection_success
-        acodecs = []
-        vcodecs = []
-        formats = []
-        services = {}
-        transitions = {}
-
-        # video codecs
-        cv = mlt.Consumer(mlt.Profile(), "avformat")
-        cv.set('vcodec', 'list')
-        cv.start()
-        codecs = mlt.Properties(cv.get_data('vcodec'))
-        for i in range(0, codecs.count()):
-            vcodecs.append(codecs.get(i))
-
-        # audio codecs
-        ca = mlt.Consumer(mlt.Profile(), "avformat")
-        ca.set('acodec', 'list')
-        ca.start()
-        codecs = mlt.Properties(ca.get_data('acodec'))
-        for i in range(0, codecs.count()):
-            acodecs.append(codecs.get(i))
-            
-        # formats
-        cf = mlt.Consumer(mlt.Profile(), "avformat")
-        cf.set('f', 'list')
-        cf.start()
-        codecs = mlt.Properties(cf.get_data('f'))
-        for i in range(0, codecs.count()):
-                formats.append(codecs.get(i))
-
-        # filters
-        envservices = mlt.Repository.filters(repo)
-        for i in range(mlt.Properties.count(envservices)):
-            services[mlt.Properties.get_name(envservices, i)] = True
-
-        # transitions
-        envtransitions = mlt.Repository.transitions(repo)
-        for i in range(mlt.Properties.count(envtransitions)):
-            transitions[mlt.Properties.get_name(envtransitions, i)] = True
+        acodecs, vcodecs, formats, services, transitions = detect_features(repo)
             
         print("MLT detection succeeded, " + str(len(formats)) + " formats, "  \
         + str(len(vcodecs)) + " video codecs and " + str(len(acodecs)) + " audio codecs found.")
@@ -92,6 +54,52 @@ def check_available_features(repo):
     except:
         return
 
+def detect_features(repo):
+    """
+    Returns (acodecs, vcodecs, formats, services, transitions) without setting module state.
+    """
+    d_acodecs = []
+    d_vcodecs = []
+    d_formats = []
+    d_services = {}
+    d_transitions = {}
+
+    # video codecs
+    cv = mlt.Consumer(mlt.Profile(), "avformat")
+    cv.set('vcodec', 'list')
+    cv.start()
+    codecs = mlt.Properties(cv.get_data('vcodec'))
+    for i in range(0, codecs.count()):
+        d_vcodecs.append(codecs.get(i))
+
+    # audio codecs
+    ca = mlt.Consumer(mlt.Profile(), "avformat")
+    ca.set('acodec', 'list')
+    ca.start()
+    codecs = mlt.Properties(ca.get_data('acodec'))
+    for i in range(0, codecs.count()):
+        d_acodecs.append(codecs.get(i))
+        
+    # formats
+    cf = mlt.Consumer(mlt.Profile(), "avformat")
+    cf.set('f', 'list')
+    cf.start()
+    codecs = mlt.Properties(cf.get_data('f'))
+    for i in range(0, codecs.count()):
+            d_formats.append(codecs.get(i))
+
+    # filters
+    envservices = mlt.Repository.filters(repo)
+    for i in range(mlt.Properties.count(envservices)):
+        d_services[mlt.Properties.get_name(envservices, i)] = True
+
+    # transitions
+    envtransitions = mlt.Repository.transitions(repo)
+    for i in range(mlt.Properties.count(envtransitions)):
+        d_transitions[mlt.Properties.get_name(envtransitions, i)] = True
+
+    return (d_acodecs, d_vcodecs, d_formats, d_services, d_transitions)
+
 def render_profile_supported(frmt, vcodec, acodec):
     # ??!!??
     if environment_detection_success == False:
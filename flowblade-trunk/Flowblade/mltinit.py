@@ -28,12 +28,10 @@ except:
 
 import locale
 
-import mltenv
-import mltfilters
+import capabilitycache
 import mltprofiles
 import mlttransitions
 import processutils
-import renderconsumer
 import translations
 
 def init_with_translations():
@@ -51,13 +49,9 @@ def init_with_translations():
     # Set numeric locale to use "." as radix, MLT initilizes this to OS locale and this causes bugs 
     locale.setlocale(locale.LC_NUMERIC, 'C')
 
-    # Check for codecs and formats on the system
-    mltenv.check_available_features(repo)
-    renderconsumer.load_render_profiles()
-
-    # Load filter and compositor descriptions from xml files.
-    mltfilters.load_filters_xml(mltenv.services)
-    mlttransitions.load_compositors_xml(mltenv.transitions)
+    # Check for codecs and formats on the system and load render profiles and
+    # filter and compositor descriptions from xml files, or get them all from cache.
+    capabilitycache.init_capabilities(repo)
 
     # Create list of available mlt profiles
     mltprofiles.load_profile_list()
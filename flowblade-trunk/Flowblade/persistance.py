@@ -45,6 +45,8 @@ import mltprofiles
 import mltfilters
 import mlttransitions
 import persistancecompat
+import projectdata
+import projectsnapshot
 import propertyparse
 import resync
 import userfolders
@@ -52,13 +54,13 @@ import utils
 
 # Unpickleable attributes for all objects
 # These are removed at save and recreated at load.
-PROJECT_REMOVE = ['profile','c_seq']
-SEQUENCE_REMOVE = ['profile','field','multitrack','tractor','monitor_clip','vectorscope','audiowave','rgbparade','outputfilter','watermark_filter']
+PROJECT_REMOVE = ['profile','c_seq','unloaded_load_state','sequences_open_order']
+SEQUENCE_REMOVE = ['profile','field','multitrack','tractor','monitor_clip','vectorscope','audiowave','rgbparade','outputfilter','watermark_filter','clip_index','mlt_loaded']
 PLAY_LIST_REMOVE = ['this','sequence','get_name','gain_filter','pan_filter']
 CLIP_REMOVE = ['this','clip_length']
 TRANSITION_REMOVE = ['this']
 FILTER_REMOVE = ['mlt_filter','mlt_filters']
-MEDIA_FILE_REMOVE = ['icon']
+MEDIA_FILE_REMOVE = ['icon', '_icon']
 
 # Used to flag a not found relative path
 NOT_FOUND = "/not_found_not_found/not_found"
@@ -197,10 +199,43 @@ def save_project(project, file_path, changed_profile_desc=None):
         outfile = afw.get_file()
         pickle.dump(s_proj, outfile)
 
+def save_project_snapshot(project, file_path):
+    """
+    Saves incremental project snapshot for autosave, see projectsnapshot.py.
+    """
+    # Proxy conversion saves change paths in all data and are always done as full saves.
+    if (project.proxy_data.proxy_mode == appconsts.CONVERTING_TO_USE_PROXY_MEDIA or 
+        project.proxy_data.proxy_mode == appconsts.CONVERTING_TO_USE_ORIGINAL_MEDIA):
+        save_project(project, file_path)
+        return
+
+    projectsnapshot.save_snapshot(project, file_path)
+
+def init_for_save_conversions(project):
+    """
+    Sets conversion state used by get_p_*() functions for saves that do not change profile or proxy mode.
+    """
+    global _fps_conv_mult, _xml_new_paths_for_profile_change, project_proxy_mode, proxy_path_dict
+    _fps_conv_mult = 1.0
+    _xml_new_paths_for_profile_change = None
+    project_proxy_mode = project.proxy_data.proxy_mode
+    proxy_path_dict = {}
+
 def get_p_sequence(sequence):
     """
     Creates pickleable sequence object from MLT Playlist
     """
+    if is_sequence_loaded(sequence) == False:
+        if _fps_conv_mult == 1.0 and _xml_new_paths_for_profile_change == None and snapshot_paths == None \
+            and project_proxy_mode != appconsts.CONVERTING_TO_USE_PROXY_MEDIA and project_proxy_mode != appconsts.CONVERTING_TO_USE_ORIGINAL_MEDIA:
+            # Unloaded sequence data is already in saved form.
+            s_seq = copy.copy(sequence)
+            remove_attrs(s_seq, SEQUENCE_REMOVE)
+            return s_seq
+        else:
+            # Saves that change paths or frames need to do conversions for all clips.
+            load_sequence_mlt(sequence)
+
     s_seq = copy.copy(sequence)
     
     # Replace tracks with pickleable objects
@@ -455,34 +490,33 @@ def load_project(file_path, icons_and_thumnails=True, relinker_load=False):
 
         _show_msg("Loading Media Item: " + media_file.name)
 
-    # Add MLT objects to sequences.
-    global all_clips, sync_clips
+    # Add MLT objects to sequences, with lazy load only current sequence gets them now.
+    # Sequences left unloaded are kept as pickled python data until opened, data needed
+    # to create their MLT objects is kept in project.
+    project.unloaded_load_state = (project.SAVEFILE_VERSION, _load_file_path, project_proxy_mode, proxy_path_dict)
+    project.sequences_open_order = [] # Sequences with MLT objects, most recently opened last.
     seq_count = 1
     for seq in project.sequences:
             
         persistancecompat.FIX_MISSING_SEQUENCE_ATTRS(seq)
-
-        _show_msg(_("Building sequence ") + str(seq_count))
-        all_clips = {}
-        sync_clips = []
-                
         seq.profile = project.profile
-        fill_sequence_mlt(seq, project.SAVEFILE_VERSION)
-
-        handle_seq_watermark(seq)
 
-        if not hasattr(seq, "seq_len"):
-            seq.update_edit_tracks_length()
+        if editorpersistance.prefs.lazy_sequence_load == True and seq_count - 1 != project.c_seq_index:
+            _fix_unloaded_sequence_clip_paths(seq)
+            seq.mlt_loaded = False
+        else:
+            _show_msg(_("Building sequence ") + str(seq_count))
+            _build_sequence_mlt(seq, project.SAVEFILE_VERSION)
+            seq.mlt_loaded = True
+            project.sequences_open_order.append(seq)
 
         seq_count = seq_count + 1
 
-    all_clips = {}
-    sync_clips = []
-
     if icons_and_thumnails == True:
-        _show_msg(_("Loading icons"))
+        # Media file icons are created when first displayed.
         for k, media_file in project.media_files.items():
-            media_file.create_icon()
+            if not isinstance(media_file, projectdata.MediaFile):
+                media_file.create_icon()
     
     project.c_seq = project.sequences[project.c_seq_index]
     if icons_and_thumnails == True:
@@ -490,6 +524,107 @@ def load_project(file_path, icons_and_thumnails=True, relinker_load=False):
 
     return project
 
+def _build_sequence_mlt(seq, SAVEFILE_VERSION):
+    global all_clips, sync_clips
+    all_clips = {}
+    sync_clips = []
+
+    fill_sequence_mlt(seq, SAVEFILE_VERSION)
+
+    handle_seq_watermark(seq)
+
+    if not hasattr(seq, "seq_len"):
+        seq.update_edit_tracks_length()
+
+    all_clips = {}
+    sync_clips = []
+
+def _fix_unloaded_sequence_clip_paths(seq):
+    # Clip paths of unloaded sequences are used when looking up media usage, 
+    # so relative paths search is done on load. Missing files are detected when sequence is opened.
+    for py_track in seq.tracks:
+        for clip in py_track.clips:
+            persistancecompat.FIX_MISSING_CLIP_ATTRS(clip)
+            if clip.is_blanck_clip == True or clip.media_type == appconsts.PATTERN_PRODUCER:
+                continue
+            if clip.container_data != None and clip.container_data.rendered_media != None:
+                continue
+            if clip.media_type != appconsts.IMAGE_SEQUENCE:
+                fixed_path = get_media_asset_path(clip.path, _load_file_path)
+            else:
+                fixed_path = get_img_seq_media_path(clip.path, _load_file_path)
+            if fixed_path != NOT_FOUND:
+                clip.path = fixed_path
+
+def is_sequence_loaded(seq):
+    # Sequences created during editing do not have this attribute and always have MLT objects.
+    if not hasattr(seq, "mlt_loaded"):
+        return True
+    return seq.mlt_loaded
+
+def load_sequence_mlt(seq):
+    """
+    Creates MLT objects for sequence left unloaded on project load or by unload_inactive_sequences().
+    Does nothing for loaded sequences. Raises FileProducerNotFoundError if media is missing and leaves sequence unloaded.
+    """
+    if is_sequence_loaded(seq):
+        return
+
+    # This can happen during save that has set these globals for its conversions.
+    global _load_file_path, project_proxy_mode, proxy_path_dict
+    saved_state = (_load_file_path, project_proxy_mode, proxy_path_dict)
+    SAVEFILE_VERSION, _load_file_path, project_proxy_mode, proxy_path_dict = editorstate.project.unloaded_load_state
+
+    c_seq = editorstate.project.c_seq # fill_sequence_mlt() changes this.
+    py_tracks = seq.tracks
+    py_compositors = seq.compositors
+    try:
+        _build_sequence_mlt(seq, SAVEFILE_VERSION)
+    except:
+        seq.tracks = py_tracks
+        seq.compositors = py_compositors
+        remove_attrs(seq, [attr for attr in SEQUENCE_REMOVE if attr != 'profile'])
+        raise
+    finally:
+        editorstate.project.c_seq = c_seq
+        _load_file_path, project_proxy_mode, proxy_path_dict = saved_state
+
+    seq.mlt_loaded = True
+
+def sequence_opened(project, seq):
+    """
+    Called when sequence becomes current sequence, least recently opened sequences are unloaded
+    if there are more loaded sequences than preference value allows.
+
+    Unload policy is count based, memory use of sequences is not measured.
+    """
+    # Projects created during editing have all sequences loaded.
+    if not hasattr(project, "sequences_open_order"):
+        project.sequences_open_order = []
+
+    # Drop deleted sequences.
+    project.sequences_open_order = [loaded_seq for loaded_seq in project.sequences_open_order 
+                                    if loaded_seq is not seq and is_sequence_loaded(loaded_seq) and loaded_seq in project.sequences]
+    project.sequences_open_order.append(seq)
+
+    # Sequences can only be loaded again with load state of project loaded from file.
+    max_loaded = editorpersistance.prefs.max_loaded_sequences
+    if max_loaded <= 0 or not hasattr(project, "unloaded_load_state"):
+        return
+
+    while len(project.sequences_open_order) > max_loaded:
+        unload_seq = project.sequences_open_order.pop(0)
+        _unload_sequence_mlt(project, unload_seq)
+
+def _unload_sequence_mlt(project, seq):
+    # Replace MLT objects with the same pickleable data that is saved.
+    init_for_save_conversions(project)
+    p_seq = get_p_sequence(seq)
+    seq.__dict__.clear()
+    seq.__dict__.update(p_seq.__dict__)
+    seq.profile = project.profile
+    seq.mlt_loaded = False
+
 def fill_sequence_mlt(seq, SAVEFILE_VERSION):
     """
     Replaces sequences py objects with mlt objects
@@ -546,6 +681,9 @@ def fill_sequence_mlt(seq, SAVEFILE_VERSION):
     seq.compositors = mlt_compositors
     seq.restack_compositors()
 
+    # Tracks were filled without edit ops.
+    seq.clip_index.invalidate()
+
     # Apply the STANDARD FULL TRACK COMPOSITORR change done for 2.10. 
     persistancecompat.FIX_FULLTRACK_COMPOSITING_MODE_COMPOSITORS(seq)
     
@@ -812,6 +950,10 @@ compositors_index_to_type_id = ["##affine","##opacity_kf","##pict_in_pict", "##r
 
 # ------------------------------------------------------- unpickling with mlt module fixes
 def unpickle(path):
+    # Autosaves are incremental snapshots, see projectsnapshot.py.
+    if projectsnapshot.is_snapshot_file(path):
+        return _load_snapshot(path)
+
     try:
         f = open(path, "rb")
         return pickle.load(f)
@@ -838,3 +980,12 @@ def unpickle(path):
         except:
             f = open(path, "rb")
             return pickle.load(f, encoding='latin1') 
+
+def _load_snapshot(path):
+    try:
+        return projectsnapshot.load_snapshot(path)
+    except ImportError:
+        # Same 'import mlt' fix as above.
+        import mlt7 as mlt
+        sys.modules["mlt"] = mlt
+        return projectsnapshot.load_snapshot(path)
@@ -476,25 +476,66 @@ def _performance_panel():
     perf_drop_frames = Gtk.CheckButton()
     perf_drop_frames.set_active(prefs.perf_drop_frames)
 
+    chunked_render = Gtk.CheckButton()
+    chunked_render.set_active(prefs.chunked_render)
+
+    spin_adj = Gtk.Adjustment(value=prefs.render_chunk_workers, lower=0, upper=multiprocessing.cpu_count(), step_increment=1)
+    render_chunk_workers = Gtk.SpinButton(adjustment=spin_adj)
+    render_chunk_workers.set_numeric(True)
+
+    spin_adj = Gtk.Adjustment(value=prefs.batch_render_slots, lower=0, upper=multiprocessing.cpu_count(), step_increment=1)
+    batch_render_slots = Gtk.SpinButton(adjustment=spin_adj)
+    batch_render_slots.set_numeric(True)
+
+    headless_worker_server = Gtk.CheckButton()
+    headless_worker_server.set_active(prefs.headless_worker_server)
+
+    spin_adj = Gtk.Adjustment(value=prefs.headless_worker_pool_size, lower=0, upper=multiprocessing.cpu_count(), step_increment=1)
+    headless_worker_pool_size = Gtk.SpinButton(adjustment=spin_adj)
+    headless_worker_pool_size.set_numeric(True)
+
+    spin_adj = Gtk.Adjustment(value=prefs.max_loaded_sequences, lower=0, upper=50, step_increment=1)
+    max_loaded_sequences = Gtk.SpinButton(adjustment=spin_adj)
+    max_loaded_sequences.set_numeric(True)
+
     # Tooltips
     perf_render_threads.set_tooltip_text(_("Between 1 and the number of CPU Cores"))
     perf_drop_frames.set_tooltip_text(_("Allow Frame Dropping for real-time rendering, when needed"))
+    chunked_render.set_tooltip_text(_("Render in parallel chunks that are joined without re-encoding"))
+    render_chunk_workers.set_tooltip_text(_("Number of chunks rendered at the same time, 0 decides from the number of CPU Cores"))
+    batch_render_slots.set_tooltip_text(_("Sum of CPU Weights of Batch Render Queue items rendered at the same time, 0 decides from the number of CPU Cores"))
+    headless_worker_server.set_tooltip_text(_("Run proxy, container clip, motion clip and audio levels renders in pre-started processes, applied on next start"))
+    headless_worker_pool_size.set_tooltip_text(_("Number of pre-started render processes, 0 decides from the number of CPU Cores"))
+    max_loaded_sequences.set_tooltip_text(_("Number of Sequences kept ready for editing in memory, when exceeded the least recently opened Sequences are released from memory.\n0 keeps all opened Sequences in memory."))
 
     # Layout
     row0 = _row(guiutils.get_left_justified_box([warning_icon, warning_label]))
     row1 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Render Threads:")), perf_render_threads, PREFERENCES_LEFT))
     row2 = _row(guiutils.get_checkbox_row_box(perf_drop_frames, Gtk.Label(label=_("Allow Frame Dropping"))))
+    row3 = _row(guiutils.get_checkbox_row_box(chunked_render, Gtk.Label(label=_("Render In Parallel Chunks"))))
+    row4 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Parallel Chunk Renders:")), render_chunk_workers, PREFERENCES_LEFT))
+    row5 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Batch Render Slots:")), batch_render_slots, PREFERENCES_LEFT))
+    row6 = _row(guiutils.get_checkbox_row_box(headless_worker_server, Gtk.Label(label=_("Use Pre-Started Render Processes"))))
+    row7 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Pre-Started Render Processes:")), headless_worker_pool_size, PREFERENCES_LEFT))
+    row8 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Max Sequences In Memory:")), max_loaded_sequences, PREFERENCES_LEFT))
 
     vbox = Gtk.VBox(False, 2)
     vbox.pack_start(row0, False, False, 0)
     vbox.pack_start(guiutils.pad_label(12, 12), False, False, 0)
     vbox.pack_start(row1, False, False, 0)
     vbox.pack_start(row2, False, False, 0)
+    vbox.pack_start(row3, False, False, 0)
+    vbox.pack_start(row4, False, False, 0)
+    vbox.pack_start(row5, False, False, 0)
+    vbox.pack_start(row6, False, False, 0)
+    vbox.pack_start(row7, False, False, 0)
+    vbox.pack_start(row8, False, False, 0)
     vbox.pack_start(Gtk.Label(), True, True, 0)
 
     guiutils.set_margins(vbox, 12, 0, 12, 12)
 
-    return vbox, (perf_render_threads, perf_drop_frames)
+    return vbox, (perf_render_threads, perf_drop_frames, chunked_render, render_chunk_workers, batch_render_slots,
+                  headless_worker_server, headless_worker_pool_size, max_loaded_sequences)
 
 def _row(row_cont):
     row_cont.set_size_request(10, 26)
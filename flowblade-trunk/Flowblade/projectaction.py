@@ -826,6 +826,7 @@ def _write_out_render_item(single_render_item_item):
     profile_name = profile.description()
     r_data = batchrendering.RenderData(enc_index, quality_index, user_args, profile_text, profile_name, fps)
     r_data.proxy_mode = PROJECT().proxy_data.proxy_mode 
+    r_data.chunk_frames, r_data.chunk_workers = render.get_chunk_settings_for_current_selections()
     if user_args == True:
         r_data.args_vals_list = args_vals_list # pack these to go for display purposes if used
     
@@ -1425,6 +1426,8 @@ def _do_create_sequence_compound_clip_from_selected(dialog, response_id, name_en
     (model, rows) = selection.get_selected_rows()
     row = max(rows[0])
     selected_sequence = PROJECT().sequences[row]
+    if app.load_sequence(selected_sequence) == False:
+        return
 
     render_player = renderconsumer.XMLRenderPlayer( write_file, _sequence_xml_compound_render_done_callback, 
                                                     (write_file, media_name), selected_sequence, 
@@ -1872,6 +1875,9 @@ def _combine_sequences_dialog_callback(dialog, response_id, action_select, seq_s
     seq = selectable_seqs[seq_select.get_active()]
     
     dialog.destroy()
+
+    if app.load_sequence(seq) == False:
+        return
     
     if action == 0:
         _append_sequence(seq)
@@ -2100,7 +2106,7 @@ def media_file_menu_item_selected(widget, data):
     if item_id == "Load Container Data":
         media_file.load_program_edit_info()
     if item_id == "Recreate Icon":
-        (icon_path, length, info) = projectdata.thumbnailer.write_image(media_file.path)
+        (icon_path, length, info) = projectdata.thumbnailer.write_image(media_file.path, use_cache=False)
         media_file.info = info
         media_file.icon_path = icon_path
         media_file.create_icon()
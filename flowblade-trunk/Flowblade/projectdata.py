@@ -30,7 +30,7 @@ except:
 import hashlib
 import os
 
-from gi.repository import GdkPixbuf
+from gi.repository import Gdk, GdkPixbuf
 
 import appconsts
 import editorpersistance
@@ -40,6 +40,7 @@ import patternproducer
 import miscdataobjects
 import respaths
 import sequence
+import thumbnailpool
 import userfolders
 import utils
 
@@ -62,6 +63,7 @@ EVENT_MEDIA_ADDED = 6
 EVENT_PROFILE_CHANGED_SAVE = 7
 
 thumbnailer = None
+thumbnail_updated_func = None # Set at app start to repaint views showing media file icons.
 
 # Default values for project properties.
 _project_properties_default_values = {appconsts.P_PROP_TLINE_SHRINK_VERTICAL:False, # Shink timeline max height if < 9 tracks
@@ -136,8 +138,9 @@ class Project:
             icon_path = respaths.IMAGE_PATH + "audio_file.png"
             length = thumbnailer.get_file_length(file_path)
             info = None
-        else: # For non-audio we need write a thumbbnail file and get file lengh while we're at it
-             (icon_path, length, info) = thumbnailer.write_image(file_path)
+            thumbnail_pending = False
+        else: # For non-audio we need a thumbnail file and get file lengh while we're at it
+             (icon_path, length, info, thumbnail_pending) = thumbnailer.get_media_data(file_path)
 
         # Hide file extension if enabled in user preferences
         clip_name = file_name
@@ -155,6 +158,10 @@ class Project:
         media_object.ttl = None
 
         self._add_media_object(media_object, target_bin)
+
+        # Placeholder icon is replaced when thumbnail is written in background.
+        if thumbnail_pending == True:
+            thumbnailer.queue_thumbnail(media_object, length // 2)
         
         return media_object
 
@@ -384,6 +391,21 @@ class MediaFile:
             self.mark_out = out_fr
             self.length = l
  
+    def _get_icon(self):
+        # Icons of loaded projects are created when first displayed.
+        try:
+            icon = self._icon
+        except AttributeError:
+            icon = None
+        if icon == None:
+            self.create_icon()
+        return self._icon
+
+    def _set_icon(self, icon):
+        self._icon = icon
+
+    icon = property(_get_icon, _set_icon)
+
     def create_icon(self):
         try:
             self.icon = self._create_image_surface(self.icon_path)
@@ -393,11 +415,17 @@ class MediaFile:
             self.icon = self._create_image_surface(self.icon_path)
 
     def _create_image_surface(self, path):
-        icon = cairo.ImageSurface.create_from_png(self.icon_path)
         scaled_icon = cairo.ImageSurface(cairo.FORMAT_ARGB32, appconsts.THUMB_WIDTH, appconsts.THUMB_HEIGHT)
         cr = cairo.Context(scaled_icon)
-        cr.scale(float(appconsts.THUMB_WIDTH) / float(icon.get_width()), float(appconsts.THUMB_HEIGHT) / float(icon.get_height()))
-        cr.set_source_surface(icon, 0, 0)
+        if self.icon_path.endswith(".png"):
+            icon = cairo.ImageSurface.create_from_png(self.icon_path)
+            cr.scale(float(appconsts.THUMB_WIDTH) / float(icon.get_width()), float(appconsts.THUMB_HEIGHT) / float(icon.get_height()))
+            cr.set_source_surface(icon, 0, 0)
+        else:
+            # JPEG and WebP thumbnails.
+            icon = GdkPixbuf.Pixbuf.new_from_file(self.icon_path)
+            cr.scale(float(appconsts.THUMB_WIDTH) / float(icon.get_width()), float(appconsts.THUMB_HEIGHT) / float(icon.get_height()))
+            Gdk.cairo_set_source_pixbuf(cr, icon, 0, 0)
         cr.paint()
         
         return scaled_icon
@@ -418,6 +446,13 @@ class MediaFile:
         if hasattr(self, "use_unique_proxy"): # This may have been added in proxyediting.py to prevent interfering with existing projects
             proxy_md_key = proxy_md_key + str(os.urandom(16))
         md_str = hashlib.md5(proxy_md_key.encode('utf-8')).hexdigest()
+
+        # Proxy frames have extension of proxy frames image format, resource name may have '?begin=<frame>' part.
+        resource_parts = file_name.split("?", 1)
+        name, ext = os.path.splitext(resource_parts[0])
+        resource_parts[0] = name + "." + appconsts.IMG_SEQ_PROXY_EXTENSIONS[editorpersistance.prefs.proxy_img_seq_format]
+        file_name = "?".join(resource_parts)
+
         return str(userfolders.get_render_dir() + "/"+ appconsts.PROXIES_DIR + md_str + "/" + file_name)
 
     def add_proxy_file(self, proxy_path):
@@ -504,38 +539,53 @@ class Thumbnailer:
     def set_context(self, profile):
         self.profile = profile
     
-    def write_image(self, file_path):
+    def write_image(self, file_path, use_cache=True):
         """
         Writes thumbnail image from file producer
         """
-        # Get data
-        md_str = hashlib.md5(file_path.encode('utf-8')).hexdigest()
-        thumbnail_path = userfolders.get_cache_dir() + appconsts.THUMBNAILS_DIR + "/" + md_str +  ".png"
+        producer = self._get_producer(file_path)
+        info = utils.get_file_producer_info(producer)
+        length = producer.get_length()
 
-        # Create consumer
-        consumer = mlt.Consumer(self.profile, "avformat", 
-                                     thumbnail_path)
-        consumer.set("real_time", 0)
-        consumer.set("vcodec", "png")
+        thumbnail_path = thumbnailpool.get_thumbnail_path(file_path)
+        if use_cache == False or not os.path.isfile(thumbnail_path):
+            thumbnailpool.write_thumbnails(producer, file_path, length // 2)
+
+        return (thumbnail_path, length, info)
 
-        # Create one frame producer
+    def get_media_data(self, file_path):
+        """
+        Returns cached thumbnail or placeholder icon path, length, info and flag telling if thumbnail needs to be written.
+        """
+        producer = self._get_producer(file_path)
+        info = utils.get_file_producer_info(producer)
+        length = producer.get_length()
+
+        thumbnail_path = thumbnailpool.get_thumbnail_path(file_path)
+        if os.path.isfile(thumbnail_path):
+            return (thumbnail_path, length, info, False)
+
+        return (respaths.IMAGE_PATH + FALLBACK_THUMB, length, info, True)
+
+    def queue_thumbnail(self, media_file, frame):
+        thumbnailpool.add_job(self.profile, media_file.path, frame,
+                              lambda file_path, thumbnail_path: self._thumbnail_written(media_file, thumbnail_path))
+
+    def _thumbnail_written(self, media_file, thumbnail_path):
+        if thumbnail_path == None:
+            return
+        media_file.icon_path = thumbnail_path
+        media_file.create_icon()
+        if thumbnail_updated_func != None:
+            thumbnail_updated_func(media_file)
+
+    def _get_producer(self, file_path):
         producer = mlt.Producer(self.profile, str(file_path))
         if producer.is_valid() == False:
             raise ProducerNotValidError(file_path)
         #if producer.get("seekable") == "0": lets see about this
         #    raise ProducerNotValidError("Video file not seekable, cannot be edited. Transcode to another format.\n\n" + file_path)
-            
-        info = utils.get_file_producer_info(producer)
-
-        length = producer.get_length()
-        frame = length // 2
-        producer = producer.cut(frame, frame)
-
-        # Connect and write image
-        consumer.connect(producer)
-        consumer.run()
-        
-        return (thumbnail_path, length, info)
+        return producer
 
     def get_file_length(self, file_path):
         # This is used for audio files which don't need a thumbnail written
@@ -0,0 +1,316 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module saves and loads incremental project snapshots used for autosave.
+
+Snapshot file is a versioned JSON manifest listing chunks in a content addressed chunk store.
+Each chunk is a JSON document for save object of project data, one media file or one sequence,
+created with the same conversions persistance.save_project() uses. Chunks are named with hash of their contents
+and only chunks not already in store are written.
+
+Save objects are converted to JSON data in GTK thread so that write thread does not share any
+mutable data with edits. Objects are written with their class name and attributes, dicts, tuples and
+sets are tagged so that loaded save objects are the same as unpickled ones.
+
+Sequences are only converted again if they have been current sequence since last snapshot,
+JSON encoding, hashing and writing is done in a worker thread.
+
+Snapshot files are loaded with persistance.load_project() like .flb files.
+"""
+
+import base64
+import copy
+import hashlib
+import importlib
+import json
+import os
+import sys
+import threading
+
+import appconsts
+import atomicfile
+import persistance
+import userfolders
+
+SNAPSHOT_FORMAT = "flowblade-project-snapshot"
+SNAPSHOT_VERSION = 2
+
+_writers = {} # snapshot path -> SnapshotWriter
+
+
+# -------------------------------------------------------- interface
+def save_snapshot(project, snapshot_path):
+    """
+    Converts changed project data and launches worker thread to write it.
+    Returns False if previous snapshot for path is still being written and this save was skipped.
+    """
+    try:
+        writer = _writers[snapshot_path]
+    except KeyError:
+        writer = SnapshotWriter(snapshot_path)
+        _writers[snapshot_path] = writer
+
+    return writer.save(project)
+
+def is_snapshot_file(path):
+    with open(path, "rb") as f:
+        first_byte = f.read(1)
+
+    return first_byte == b"{" # Pickled .flb files start with protocol opcode.
+
+def load_snapshot(snapshot_path):
+    """
+    Returns project save object like the one unpickled from .flb files.
+    """
+    with open(snapshot_path, "r") as f:
+        manifest = json.load(f)
+
+    if manifest.get("format") != SNAPSHOT_FORMAT or manifest.get("version") != SNAPSHOT_VERSION:
+        raise ValueError("Not a supported project snapshot file: " + snapshot_path)
+
+    chunks_dir = get_chunks_dir(snapshot_path)
+
+    s_proj = _load_chunk(chunks_dir, manifest["project"])
+
+    s_proj.media_files = {}
+    for media_file_id, chunk_hash in manifest["media_files"]:
+        s_proj.media_files[media_file_id] = _load_chunk(chunks_dir, chunk_hash)
+
+    s_proj.sequences = []
+    for chunk_hash in manifest["sequences"]:
+        s_proj.sequences.append(_load_chunk(chunks_dir, chunk_hash))
+
+    return s_proj
+
+def delete_snapshot(snapshot_path):
+    writer = _writers.pop(snapshot_path, None)
+    if writer != None and writer.write_thread != None:
+        writer.write_thread.join()
+
+    if os.path.isfile(snapshot_path):
+        os.remove(snapshot_path)
+
+    chunks_dir = get_chunks_dir(snapshot_path)
+    if os.path.isdir(chunks_dir):
+        for chunk_file in os.listdir(chunks_dir):
+            os.remove(chunks_dir + chunk_file)
+        os.rmdir(chunks_dir)
+
+def get_chunks_dir(snapshot_path):
+    return userfolders.get_cache_dir() + appconsts.AUTOSAVE_CHUNKS_DIR + os.path.basename(snapshot_path) + "/"
+
+def _load_chunk(chunks_dir, chunk_hash):
+    with open(chunks_dir + chunk_hash, "r") as f:
+        return _from_json_data(json.load(f), [])
+
+
+# -------------------------------------------------------- JSON data conversions
+def _to_json_data(value, memo):
+    """
+    Returns independent JSON data for save object graph.
+    memo is dict id(object) -> object number, objects referenced more than once are written once.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+
+    value_type = type(value)
+    if value_type == list:
+        return [_to_json_data(item, memo) for item in value]
+    if value_type == tuple:
+        return {"tuple":[_to_json_data(item, memo) for item in value]}
+    if value_type == dict:
+        return {"dict":[[_to_json_data(key, memo), _to_json_data(item, memo)] for key, item in value.items()]}
+    if value_type == set or value_type == frozenset:
+        return {"set":[_to_json_data(item, memo) for item in value]}
+    if value_type == bytes:
+        return {"bytes":base64.b64encode(value).decode("ascii")}
+    if not hasattr(value, "__dict__"):
+        raise TypeError("Value of type " + str(value_type) + " cannot be written in project snapshot")
+
+    try:
+        return {"ref":memo[id(value)]}
+    except KeyError:
+        pass
+
+    # Object is numbered before its attributes so that reference cycles are written as refs.
+    memo[id(value)] = len(memo)
+    attrs = {}
+    for name, item in value.__dict__.items():
+        attrs[name] = _to_json_data(item, memo)
+    return {"class":value_type.__module__ + ":" + value_type.__qualname__, "attrs":attrs}
+
+def _from_json_data(data, objects):
+    """
+    Creates save objects from JSON data, objects is list of objects created so far in numbering order.
+    """
+    if type(data) == list:
+        return [_from_json_data(item, objects) for item in data]
+    if type(data) != dict:
+        return data
+
+    if "class" in data:
+        module_name, class_name = data["class"].split(":")
+        module = sys.modules.get(module_name)
+        if module == None:
+            module = importlib.import_module(module_name)
+        obj_class = module
+        for name in class_name.split("."):
+            obj_class = getattr(obj_class, name)
+
+        # Objects are created without calling __init__() like unpickling does.
+        obj = obj_class.__new__(obj_class)
+        objects.append(obj)
+        for name, item in data["attrs"].items():
+            obj.__dict__[name] = _from_json_data(item, objects)
+        return obj
+    if "ref" in data:
+        return objects[data["ref"]]
+    if "tuple" in data:
+        return tuple([_from_json_data(item, objects) for item in data["tuple"]])
+    if "dict" in data:
+        return {_from_json_data(key, objects):_from_json_data(item, objects) for key, item in data["dict"]}
+    if "set" in data:
+        return set([_from_json_data(item, objects) for item in data["set"]])
+    if "bytes" in data:
+        return base64.b64decode(data["bytes"])
+
+    raise ValueError("Unknown value in project snapshot chunk")
+
+
+# -------------------------------------------------------- writing
+class SnapshotWriter:
+
+    def __init__(self, snapshot_path):
+        self.snapshot_path = snapshot_path
+        self.chunks_dir = get_chunks_dir(snapshot_path)
+        self.sequence_chunks = {} # id(seq) -> (seq, seq.name, chunk_hash), updated by write thread after successful write
+        self.last_c_seq = None
+        self.write_thread = None
+
+    def save(self, project):
+        if self.write_thread != None and self.write_thread.is_alive():
+            return False
+
+        persistance.init_for_save_conversions(project)
+
+        # Project data without media files and sequences.
+        s_proj = copy.copy(project)
+        s_proj.c_seq_index = project.sequences.index(project.c_seq)
+        s_proj.SAVEFILE_VERSION = appconsts.SAVEFILE_VERSION
+        s_proj.media_files = {}
+        s_proj.sequences = []
+        persistance.remove_attrs(s_proj, persistance.PROJECT_REMOVE)
+        s_proj = _to_json_data(s_proj, {})
+
+        # Media files are cheap to convert here, content hashing in write thread drops unchanged ones.
+        s_media_files = []
+        for media_file_id, media_file in project.media_files.items():
+            s_media_file = copy.copy(media_file)
+            persistance.remove_attrs(s_media_file, persistance.MEDIA_FILE_REMOVE)
+            s_media_files.append((media_file_id, _to_json_data(s_media_file, {})))
+
+        # Only sequences that could have been edited since last snapshot are converted.
+        # Sequences are only edited as current sequence, and changing current sequence restarts autosave which does a snapshot.
+        s_sequences = []
+        for seq in project.sequences:
+            try:
+                cached_seq, cached_name, chunk_hash = self.sequence_chunks[id(seq)]
+            except KeyError:
+                cached_seq = None
+
+            if cached_seq is seq and cached_name == seq.name and seq is not project.c_seq and seq is not self.last_c_seq:
+                s_sequences.append((seq, seq.name, None, chunk_hash))
+            else:
+                s_sequences.append((seq, seq.name, _to_json_data(persistance.get_p_sequence(seq), {}), None))
+
+        self.last_c_seq = project.c_seq
+
+        self.write_thread = SnapshotWriteThread(self, s_proj, s_media_files, s_sequences)
+        self.write_thread.start()
+        return True
+
+
+class SnapshotWriteThread(threading.Thread):
+
+    def __init__(self, writer, s_proj, s_media_files, s_sequences):
+        threading.Thread.__init__(self)
+        self.writer = writer
+        self.s_proj = s_proj
+        self.s_media_files = s_media_files
+        self.s_sequences = s_sequences
+
+    def run(self):
+        try:
+            self.write_snapshot()
+        except Exception as e:
+            # Next snapshot converts all sequences again.
+            print("Project snapshot save failed:", e)
+            self.writer.sequence_chunks = {}
+
+    def write_snapshot(self):
+        chunks_dir = self.writer.chunks_dir
+        if not os.path.isdir(chunks_dir):
+            os.makedirs(chunks_dir)
+
+        self.existing_chunks = set(os.listdir(chunks_dir))
+        self.used_chunks = set()
+
+        project_hash = self.write_chunk(self.s_proj)
+
+        media_files = []
+        for media_file_id, s_media_file in self.s_media_files:
+            media_files.append([media_file_id, self.write_chunk(s_media_file)])
+
+        sequences = []
+        sequence_chunks = {}
+        for seq, seq_name, s_seq, chunk_hash in self.s_sequences:
+            if s_seq != None:
+                chunk_hash = self.write_chunk(s_seq)
+            else:
+                self.used_chunks.add(chunk_hash)
+            sequences.append(chunk_hash)
+            sequence_chunks[id(seq)] = (seq, seq_name, chunk_hash)
+
+        manifest = {"format":SNAPSHOT_FORMAT,
+                    "version":SNAPSHOT_VERSION,
+                    "project":project_hash,
+                    "media_files":media_files,
+                    "sequences":sequences}
+
+        with atomicfile.AtomicFileWriter(self.writer.snapshot_path, "w") as afw:
+            json.dump(manifest, afw.get_file())
+
+        # Drop chunks not used by latest snapshot.
+        for chunk_file in self.existing_chunks - self.used_chunks:
+            os.remove(chunks_dir + chunk_file)
+
+        self.writer.sequence_chunks = sequence_chunks
+
+    def write_chunk(self, json_data):
+        data = json.dumps(json_data, separators=(",", ":")).encode("utf-8")
+        chunk_hash = hashlib.md5(data).hexdigest()
+
+        if chunk_hash not in self.existing_chunks and chunk_hash not in self.used_chunks:
+            with atomicfile.AtomicFileWriter(self.writer.chunks_dir + chunk_hash, "wb") as afw:
+                afw.get_file().write(data)
+
+        self.used_chunks.add(chunk_hash)
+        return chunk_hash
@@ -32,6 +32,7 @@ import app
 import appconsts
 import atomicfile
 import dialogutils
+import editorpersistance
 import editorstate
 import gui
 import guiutils
@@ -55,6 +56,7 @@ load_thread = None
 PROXY_SIZE_FULL = appconsts.PROXY_SIZE_FULL
 PROXY_SIZE_HALF =  appconsts.PROXY_SIZE_HALF
 PROXY_SIZE_QUARTER =  appconsts.PROXY_SIZE_QUARTER
+IMG_SEQ_PROXY_FORMATS = ["png", "jpeg", "webp"] # Image sequence proxy frame formats in Proxy Manager selector order.
 
 
 class ProxyRenderItemData:
@@ -94,12 +96,16 @@ class ProxyRenderRunnerThread(threading.Thread):
         threading.Thread.__init__(self)
         self.proxy_profile = proxy_profile
         self.files_to_render = files_to_render
+        # Sequences are edited in GTK thread, timeline paths are collected here before thread is started.
+        self.timeline_media_paths = _get_timeline_media_paths()
 
     def run(self):        
 
         proxy_w, proxy_h =  _get_proxy_dimensions(self.proxy_profile, editorstate.PROJECT().proxy_data.size)
         enc_index = editorstate.PROJECT().proxy_data.encoding
 
+        timeline_media_paths = self.timeline_media_paths
+
         proxy_render_items = []
         for media_file in self.files_to_render:
             if media_file.type != appconsts.IMAGE_SEQUENCE:
@@ -137,14 +143,15 @@ class ProxyRenderRunnerThread(threading.Thread):
                                 self.proxy_profile.description(),
                                 lookup_path)
                 
-            proxy_render_items.append(item_data)
+            on_timeline = media_file.path in timeline_media_paths
+            proxy_render_items.append((item_data, on_timeline, media_file.length))
         
         GLib.idle_add(self._create_job_queue_objects, proxy_render_items)
         
     def _create_job_queue_objects(self, proxy_render_items):
-        for proxy_render_data_item in proxy_render_items:
+        for proxy_render_data_item, on_timeline, length in proxy_render_items:
             session_id = hashlib.md5(str(os.urandom(32)).encode('utf-8')).hexdigest()
-            job_queue_object = jobs.ProxyRenderJobQueueObject(session_id, proxy_render_data_item)
+            job_queue_object = jobs.ProxyRenderJobQueueObject(session_id, proxy_render_data_item, on_timeline, length)
             job_queue_object.add_to_queue()
 
     def abort(self):
@@ -191,9 +198,27 @@ class ProxyManagerDialog:
         row_enc.pack_start(self.enc_select, False, False, 0)
         row_enc.pack_start(self.size_select, False, False, 0)
         row_enc.pack_start(Gtk.Label(), True, True, 0)
-        
+
+        spin_adj = Gtk.Adjustment(value=editorpersistance.prefs.proxy_render_max_jobs, lower=0, upper=16, step_increment=1)
+        self.max_jobs_spin = Gtk.SpinButton(adjustment=spin_adj)
+        self.max_jobs_spin.set_numeric(True)
+        self.max_jobs_spin.set_tooltip_text(_("Number of proxy files rendered at the same time, 0 decides from the number of CPU Cores and available memory"))
+        self.max_jobs_spin.connect("value-changed", lambda w: self.max_jobs_changed(w.get_value_as_int()))
+        row_max_jobs = guiutils.get_two_column_box_right_pad(Gtk.Label(label=_("Concurrent Proxy Renders:")), self.max_jobs_spin, 250, 150)
+
+        self.img_seq_format_select = Gtk.ComboBoxText()
+        for format_label in [_("PNG"), _("JPEG"), _("WebP")]:
+            self.img_seq_format_select.append_text(format_label)
+        self.img_seq_format_select.set_active(IMG_SEQ_PROXY_FORMATS.index(editorpersistance.prefs.proxy_img_seq_format))
+        self.img_seq_format_select.set_tooltip_text(_("Image format for Image Sequence proxy frames, JPEG does not keep transparency"))
+        self.img_seq_format_select.connect("changed", lambda w: self.img_seq_format_changed(w.get_active()))
+        row_img_seq_format = guiutils.get_two_column_box_right_pad(Gtk.Label(label=_("Image Sequence Proxy Frames:")), self.img_seq_format_select, 250, 150)
+
         vbox_enc = Gtk.VBox(False, 2)
         vbox_enc.pack_start(row_enc, False, False, 0)
+        vbox_enc.pack_start(guiutils.pad_label(8, 8), False, False, 0)
+        vbox_enc.pack_start(row_max_jobs, False, False, 0)
+        vbox_enc.pack_start(row_img_seq_format, False, False, 0)
         vbox_enc.pack_start(guiutils.pad_label(8, 12), False, False, 0)
         
         panel_encoding = guiutils.get_named_frame(_("Proxy Encoding"), vbox_enc)
@@ -287,6 +312,14 @@ class ProxyManagerDialog:
     def size_changed(self, size_index):
         editorstate.PROJECT().proxy_data.size = size_index
 
+    def max_jobs_changed(self, max_jobs):
+        editorpersistance.prefs.proxy_render_max_jobs = max_jobs
+        editorpersistance.save()
+
+    def img_seq_format_changed(self, format_index):
+        editorpersistance.prefs.proxy_img_seq_format = IMG_SEQ_PROXY_FORMATS[format_index]
+        editorpersistance.save()
+
     def update_proxy_mode_display(self):
         self.set_convert_buttons_state()
         self.set_mode_display_value()
@@ -510,6 +543,15 @@ def _get_proxy_dimensions(project_profile, proxy_size):
     new_height = old_height_half - old_height_half % 2
     return (new_width, new_height)
 
+def _get_timeline_media_paths():
+    paths = set()
+    for seq in editorstate.PROJECT().sequences:
+        for track in seq.tracks:
+            for clip in track.clips:
+                if clip.is_blanck_clip == False:
+                    paths.add(clip.path)
+    return paths
+
 def _get_proxy_profile(project):
     project_profile = project.profile
     new_width, new_height = _get_proxy_dimensions(project_profile, project.proxy_data.size)
@@ -38,6 +38,7 @@ import time
 
 import appconsts
 import atomicfile
+import chunkrender
 import dialogutils
 import editorstate
 from editorstate import current_sequence
@@ -102,6 +103,12 @@ def get_args_vals_list_for_current_selections():
     
     return args_vals_list
 
+def get_chunk_settings_for_current_selections():
+    encoding_option_index = widgets.encoding_panel.encoding_selector.get_selected_encoding_index()
+    encoding_option = renderconsumer.encoding_options[encoding_option_index]
+    user_args = widgets.args_panel.use_args_check.get_active()
+    return chunkrender.get_chunk_settings(encoding_option, user_args)
+
 def get_current_gui_selections():
     selections = {}
     selections["encoding_option_index"] = widgets.encoding_panel.encoding_selector.get_selected_encoding_index()
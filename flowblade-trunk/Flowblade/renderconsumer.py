@@ -61,6 +61,8 @@ BITRATE = "bitrate"
 AUDIO_DESCRIPTION = "audiodesc"
 NON_USER = "nonuser"
 PRESET_GROUP = "presetgroup"
+CHUNK_FRAMES = "chunkframes"
+CHUNK_WORKERS = "chunkworkers"
 PRESET_GROUP_H264 = "H.264, HEVC"
 PRESET_GROUP_NVENC = "NVENC"
 PRESET_GROUP_VAAPI = "VAAPI"
@@ -117,6 +119,13 @@ def _get_attribute(node, attr_name):
     
     return value
 
+def _get_int_attribute(node, attr_name):
+    value = _get_attribute(node, attr_name)
+    if value == None:
+        return None
+
+    return int(value)
+
 def get_encoding_index(encoding):
     for i in range(0, len(encoding_options)):
         if encoding == encoding_options[i]:
@@ -172,6 +181,9 @@ class EncodingOption:
             quality_default_index = None
         self.quality_default_index = quality_default_index
         self.audio_desc = _get_attribute(option_node, AUDIO_DESCRIPTION)
+        # Optional chunked rendering settings, default values from preferences are used when not defined.
+        self.chunk_frames = _get_int_attribute(option_node, CHUNK_FRAMES)
+        self.chunk_workers = _get_int_attribute(option_node, CHUNK_WORKERS)
         profile_node = option_node.getElementsByTagName(PROFILE).item(0)
         self.attr_string =  _get_attribute(profile_node, ARGS)
         self.acodec = None
@@ -238,22 +250,8 @@ def load_render_profiles():
     render_encoding_doc = xml.dom.minidom.parse(file_path)
 
     # Test GPU rendering availability
-    global H_264_NVENC_AVAILABLE, H_264_VAAPI_AVAILABLE
-    # h264_nvenc
-    ret_code = _test_command(H_264_NVENC_TEST)
-    if (ret_code == 0):
-        print("h264_nvenc available")
-        H_264_NVENC_AVAILABLE = True
-    # hevc_nvenc
-    ret_code = _test_command(HEVC_NVENC_TEST)
-    if (ret_code == 0):
-        print("hevc_nvenc available")
-        HEVC_NVENC_AVAILABLE = True # NOT USED !
-    # vaapi
-    ret_code = _test_command(H_264_VAAPI_TEST)
-    if (ret_code == 0):
-        print("h264_vaapi available")
-        H_264_VAAPI_AVAILABLE = True
+    global H_264_NVENC_AVAILABLE, HEVC_NVENC_AVAILABLE, H_264_VAAPI_AVAILABLE
+    H_264_NVENC_AVAILABLE, HEVC_NVENC_AVAILABLE, H_264_VAAPI_AVAILABLE = test_gpu_encoders() # HEVC_NVENC_AVAILABLE NOT USED !
 
     # Create quality option groups
     global quality_option_groups
@@ -348,6 +346,31 @@ def load_render_profiles():
     global proxy_encodings
     proxy_encodings = found_proxy_encodings
 
+def test_gpu_encoders():
+    """
+    Returns (h264_nvenc available, hevc_nvenc available, h264_vaapi available).
+    """
+    h264_nvenc = False
+    hevc_nvenc = False
+    h264_vaapi = False
+    # h264_nvenc
+    ret_code = _test_command(H_264_NVENC_TEST)
+    if (ret_code == 0):
+        print("h264_nvenc available")
+        h264_nvenc = True
+    # hevc_nvenc
+    ret_code = _test_command(HEVC_NVENC_TEST)
+    if (ret_code == 0):
+        print("hevc_nvenc available")
+        hevc_nvenc = True
+    # vaapi
+    ret_code = _test_command(H_264_VAAPI_TEST)
+    if (ret_code == 0):
+        print("h264_vaapi available")
+        h264_vaapi = True
+
+    return (h264_nvenc, hevc_nvenc, h264_vaapi)
+
 def _test_command(bash_args_list):
     process = subprocess.Popen(bash_args_list, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     out, err = process.communicate()
@@ -610,6 +633,10 @@ class FileRenderPlayer(threading.Thread):
             render_fraction = 1.0
         return render_fraction
 
+    def failed(self):
+        # MLT consumer does not report errors.
+        return False
+
 
 class XMLRenderPlayer(threading.Thread):
     def __init__(self, file_name, callback, data, rendered_sequence, project, player):
@@ -35,6 +35,7 @@ import mltfilters
 import mlttransitions
 import mltrefhold
 import patternproducer
+import sequenceindex
 import tlinerender
 import utils
 
@@ -128,6 +129,9 @@ class Sequence:
         self.tractor.mark_in = -1
         self.tractor.mark_out = -1
 
+        # Index for clip lookups, tracks indexes are rebuilt lazily after edits.
+        self.clip_index = sequenceindex.SequenceClipIndex(self)
+
         # Only create and add pan filter if actual pan is applied
         # This method gets called on load and we only want to add a filter then if pan is applied,
         # and not on initial creation.
@@ -205,6 +209,7 @@ class Sequence:
         # Add black clip to black bg track
         self.tracks[0].clips.append(black_track_clip) # py
         self.tracks[0].append(black_track_clip, 0, 0) # mlt
+        self.clip_index.track_changed(self.tracks[0])
 
         # Create fulltrack compositors if needed.
         if self.compositing_mode == appconsts.COMPOSITING_MODE_STANDARD_FULL_TRACK:
@@ -777,6 +782,7 @@ class Sequence:
         track = self.tracks[-1] # Always last track
         track.clear() # # TRIM INIT CRASH HACK, see clear_hidden_track there may be blank clip here
         track.clips = []
+        self.clip_index.track_changed(track)
     
         # Display trimmmed clip on hidden track by creating copy of it.
         # File producer
@@ -811,6 +817,7 @@ class Sequence:
         """
         clips = self.tracks[-1].clips
         self.tracks[-1].clips = []
+        self.clip_index.track_changed(self.tracks[-1])
         for i in range(0, len(clips)):
             clip = clips[i]
             if clip.is_blanck_clip:
@@ -837,6 +844,7 @@ class Sequence:
         
         self.tracks[-1].clips = []
         self.tracks[-1].clear()
+        self.clip_index.track_changed(self.tracks[-1])
 
         edit._insert_blank(self.tracks[-1], 0, seq_len) # TRIM INIT CRASH HACK. This being empty crashes a lot, so far unexplained.
         
@@ -854,6 +862,7 @@ class Sequence:
         # Needed for timeline render updates
         self.tracks[-1].clips = []
         self.tracks[-1].clear()
+        self.clip_index.track_changed(self.tracks[-1])
 
         seq_len = self.seq_len
         if seq_len < 1:
@@ -872,6 +881,7 @@ class Sequence:
                 continue
             track_v1.remove(i)
             track_v1.clips.pop(i)
+            self.clip_index.track_changed(track_v1)
             length = clip.clip_out - clip.clip_in + 1
             white_clip = self._create_white_clip(length)
             edit._insert_clip(track_v1, white_clip, i, white_clip.clip_in, white_clip.clip_out)
@@ -960,6 +970,7 @@ class Sequence:
 
         self.tracks[0].clips.append(black_track_clip) # py
         self.tracks[0].append(black_track_clip, 0, 0) # mlt
+        self.clip_index.track_changed(self.tracks[0])
         
         # LOOK TO GET RID OF THIS, WE ARE CREATING A NEW BLACK CLIP PER CHANGE OF SEQUENCE!
 
@@ -992,20 +1003,10 @@ class Sequence:
         """
         cut_frame = -1
         for i in range(1, len(self.tracks) - 1):
-            track = self.tracks[i]
-            
-            # Get index and clip
-            index = track.get_clip_index_at(tline_frame)
-            try:
-                clip = track.clips[index]            
-            except Exception:
+            next_cut_frame = self.clip_index.get_track_index(self.tracks[i]).get_next_cut_frame(tline_frame)
+            if next_cut_frame == -1:
                 continue # Frame after last clip in track
-            
-            # Get next cut frame
-            clip_start_in_tline = track.clip_start(index)
-            length = clip.clip_out - clip.clip_in 
-            next_cut_frame = clip_start_in_tline + length + 1 # +1 clip out inclusive
- 
+
             # Set cut frame
             if cut_frame == -1:
                 cut_frame = next_cut_frame
@@ -1023,28 +1024,10 @@ class Sequence:
         
         cut_frame = -1
         for i in range(1, len(self.tracks) - 1):
-            track = self.tracks[i]
-            
-            # Get index and clip start
-            index = track.get_clip_index_at(tline_frame)
-            clip_start_frame = track.clip_start(index)
-            
-            # If we are on cut, we want previous cut
-            if clip_start_frame == tline_frame:
-                index = index - 1
-            
-            # Get prev cut frame
-            try:
-                clip = track.clips[index]
-                prev_cut_frame = track.clip_start(index)
-            except Exception:
-                try:
-                    if index == len(track.clips):
-                        clip = track.clips[index - 1]
-                        prev_cut_frame = track.clip_start(index)
-                except Exception:
-                    continue
-            
+            prev_cut_frame = self.clip_index.get_track_index(self.tracks[i]).get_prev_cut_frame(tline_frame)
+            if prev_cut_frame == -1:
+                continue
+
             # Set cut frame
             if cut_frame == -1:
                 cut_frame = prev_cut_frame
@@ -1132,24 +1115,7 @@ class Sequence:
         return (select_clip, clip_track)
 
     def get_closest_cut_frame(self, track_id, frame):
-        track = self.tracks[track_id]
-        index = track.get_clip_index_at(frame)
-        try:
-            clip = track.clips[index]            
-        except Exception:
-            return -1
-            
-        start_frame = track.clip_start(index)
-        start_dist = frame - start_frame
-        end_frame = start_frame + (clip.clip_out - clip.clip_in + 1) # frames are inclusive
-        end_dist = end_frame - frame
-        
-        if start_dist < end_dist:
-            return start_frame
-        else:
-            return end_frame
-        
-        return start_frame # equal distance
+        return self.clip_index.get_track_index(self.tracks[track_id]).get_closest_cut_frame(frame)
 
     def get_first_active_track(self):
         """
@@ -1175,10 +1141,8 @@ class Sequence:
         """
         Returns index or -1 if frame not on a clip
         """
-        index = track.get_clip_index_at(frame)
-        try:
-            clip = track.clips[index]
-        except Exception:
+        index = self.clip_index.get_track_index(track).get_clip_index_at(frame)
+        if index < 0 or index >= len(track.clips):
             return -1
         
         return index
@@ -1187,27 +1151,17 @@ class Sequence:
         """
         Returns clip or None if not found.
         """
-        for i in range(1, len(self.tracks)):
-            track = self.tracks[i]
-            for j in range(0, len(track.clips)):
-                clip = track.clips[j]
-                if clip.id == clip_id:
-                    return clip
+        track, index = self.clip_index.get_track_and_index_for_id(clip_id)
+        if track == None:
+            return None
 
-        return None
+        return track.clips[index]
 
     def get_track_and_index_for_id(self, clip_id):
         """
         Returns clip or None if not found.
         """
-        for i in range(1, len(self.tracks)):
-            track = self.tracks[i]
-            for j in range(0, len(track.clips)):
-                clip = track.clips[j]
-                if clip.id == clip_id:
-                    return (track, j)
-
-        return (None, None)
+        return self.clip_index.get_track_and_index_for_id(clip_id)
         
     def set_track_mute_state(self, track_index, mute_state):
         track = self.tracks[track_index]
@@ -1371,6 +1325,7 @@ def _copy_track_contents(from_track, to_track, to_sequence):
     
     from_track.clear()
     from_track.clips = []
+    from_track.sequence.clip_index.track_changed(from_track)
 
     # Copy track attributes.
     to_sequence.set_track_mute_state(to_track.id, from_track.mute_state)
@@ -0,0 +1,127 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module contains index objects used to do clip lookups in sequences without scanning all clips or calling MLT.
+
+Track indexes are computed from python side clip data and dropped when track contents change,
+edit ops in edit.py and sequence.py call SequenceClipIndex.track_changed() for tracks they modify.
+"""
+
+import bisect
+
+
+class SequenceClipIndex:
+    """
+    Lazily built per track clip indexes for a sequence.
+    """
+    def __init__(self, seq):
+        self.seq = seq
+        self.track_indexes = {} # track.id -> TrackClipIndex
+
+    def track_changed(self, track):
+        self.track_indexes.pop(track.id, None)
+
+    def invalidate(self):
+        self.track_indexes = {}
+
+    def get_track_index(self, track):
+        try:
+            return self.track_indexes[track.id]
+        except KeyError:
+            track_index = TrackClipIndex(track)
+            self.track_indexes[track.id] = track_index
+            return track_index
+
+    def get_track_and_index_for_id(self, clip_id):
+        for i in range(1, len(self.seq.tracks)):
+            track = self.seq.tracks[i]
+            index = self.get_track_index(track).clip_ids.get(clip_id)
+            if index != None:
+                return (track, index)
+
+        return (None, None)
+
+
+class TrackClipIndex:
+    """
+    Clip start frames, cut frames and clip ids of a track.
+    """
+    def __init__(self, track):
+        self.starts = [] # clip start frames on timeline
+        self.ends = [] # clip end frames on timeline, exclusive
+        self.clip_ids = {} # clip.id -> clip index
+
+        frame = 0
+        for i in range(0, len(track.clips)):
+            clip = track.clips[i]
+            self.starts.append(frame)
+            frame = frame + clip.clip_out - clip.clip_in + 1 # +1 out inclusive
+            self.ends.append(frame)
+            self.clip_ids[clip.id] = i
+
+        self.length = frame
+        self.cut_points = self.starts + [self.length] # Used to find previous cuts, track end is also a cut.
+
+    def get_clip_index_at(self, frame):
+        """
+        Returns index of clip at frame, or clips count if frame is after last clip like MLT does.
+        """
+        if frame >= self.length:
+            return len(self.starts)
+        return max(bisect.bisect_right(self.starts, frame) - 1, 0)
+
+    def clip_start(self, index):
+        if index >= len(self.starts):
+            return self.length
+        return self.starts[index]
+
+    def get_next_cut_frame(self, frame):
+        """
+        Returns end frame of clip at frame or -1 if frame is after last clip.
+        """
+        if frame >= self.length:
+            return -1
+        return self.ends[bisect.bisect_right(self.ends, frame)]
+
+    def get_prev_cut_frame(self, frame):
+        """
+        Returns closest clip start or track end before frame or -1 if none exists.
+        """
+        if len(self.starts) == 0:
+            return -1
+        i = bisect.bisect_left(self.cut_points, frame) - 1
+        if i < 0:
+            return -1
+        return self.cut_points[i]
+
+    def get_closest_cut_frame(self, frame):
+        """
+        Returns closest start or end frame of clip at frame or -1 if frame is not on a clip.
+        """
+        if frame >= self.length:
+            return -1
+        index = max(bisect.bisect_right(self.starts, frame) - 1, 0)
+        start_frame = self.starts[index]
+        end_frame = self.ends[index]
+        if frame - start_frame < end_frame - frame:
+            return start_frame
+        else:
+            return end_frame
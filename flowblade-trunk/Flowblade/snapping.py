@@ -20,8 +20,13 @@
 
 """
 This module handles snapping to clip ends while mouse dragging on timeline.
+
+Snap target frames are collected into SnapTargetIndex when drag starts and mouse move events only do
+bisect lookups against it.
 """
 
+import bisect
+
 import compositormodes
 import editorstate
 from editorstate import current_sequence
@@ -39,7 +44,7 @@ _snap_threshold = 6 # in pixels
 _snap_happened = False
 _last_snap_x = -1
 
-_playhead_frame = -1
+_snap_index = None # Built on first snap after mouse press.
 
 #---------------------------------------------------- interface
 def get_snapped_x(x, track, edit_data):
@@ -48,9 +53,10 @@ def get_snapped_x(x, track, edit_data):
     
     frame = _get_frame_for_x_func(x)
     
-    global _playhead_frame
-    _playhead_frame = PLAYER().current_frame() # This is a constant overhead for every mouse move event, 
-                                               # if 'producer.frame()' is expensive or unstable (locking) for MLT this can be bad. 
+    global _snap_index
+    if _snap_index == None:
+        # Playhead is read only once per drag, 'producer.frame()' can be expensive or unstable (locking) for MLT.
+        _snap_index = SnapTargetIndex(current_sequence(), PLAYER().current_frame())
 
     # Do snaps for relevant edit modes.
     if EDIT_MODE() == editorstate.OVERWRITE_MOVE:
@@ -81,9 +87,59 @@ def snap_active():
 def get_snap_x():
     return _last_snap_x
 
+def mouse_edit_started():
+    global _snap_index
+    _snap_index = None
+
 def mouse_edit_ended():
-    global _snap_happened
+    global _snap_happened, _snap_index
     _snap_happened = False
+    _snap_index = None
+
+
+#------------------------------------------- snap targets
+class SnapTargetIndex:
+    """
+    Sorted snap target frames for all tracks, and for playhead, marks and compositor edges.
+    """
+    def __init__(self, seq, playhead_frame):
+        # Track cut frames are clip starts and track end, these are kept up to date by sequence clip index.
+        self.tracks_cut_frames = {}
+        for i in range(1, len(seq.tracks) - 1):
+            track = seq.tracks[i]
+            self.tracks_cut_frames[track.id] = seq.clip_index.get_track_index(track).cut_points
+        
+        edge_frames = set([playhead_frame])
+        if seq.tractor.mark_in != -1:
+            edge_frames.add(seq.tractor.mark_in)
+        if seq.tractor.mark_out != -1:
+            edge_frames.add(seq.tractor.mark_out + 1) # +1 out inclusive
+        for compositor in seq.compositors:
+            edge_frames.add(compositor.clip_in)
+            edge_frames.add(compositor.clip_out + 1)
+        self.edge_frames = sorted(edge_frames)
+
+    def get_track_closest_frame(self, track_id, frame):
+        try:
+            return _get_closest_frame(self.tracks_cut_frames[track_id], frame)
+        except KeyError:
+            return -1
+
+    def get_edge_closest_frame(self, frame):
+        return _get_closest_frame(self.edge_frames, frame)
+
+def _get_closest_frame(frames, frame):
+    """
+    Returns closest frame in sorted list or -1 if list is empty.
+    """
+    i = bisect.bisect_left(frames, frame)
+    if i == len(frames):
+        if i == 0:
+            return -1
+        return frames[i - 1]
+    if i == 0 or frames[i] - frame < frame - frames[i - 1]:
+        return frames[i]
+    return frames[i - 1]
 
 
 #------------------------------------------- utils funcs
@@ -109,7 +165,7 @@ def _get_track_snapped_x(track, x, frame, frame_x):
     if track == None:  # Clip is being dragged outside of tracks area
         return -1
 
-    closest_cut_frame = current_sequence().get_closest_cut_frame(track.id, frame)
+    closest_cut_frame = _snap_index.get_track_closest_frame(track.id, frame)
     if closest_cut_frame == -1:
         return -1
     
@@ -142,14 +198,17 @@ def _three_track_snap(track, x, frame, frame_x):
     
     return snapped_x
 
-def _playhead_snap(mouse_x, snapping_feature_x):
-    snapped_x = -1
+def _edges_snap(mouse_x, snapping_feature_frame, snapping_feature_x):
+    # Snaps to playhead, marks and compositor edges.
+    edge_frame = _snap_index.get_edge_closest_frame(snapping_feature_frame)
+    if edge_frame == -1:
+        return -1
     
-    playhead_frame_x = _get_x_for_frame_func(_playhead_frame)
-    if abs(playhead_frame_x - snapping_feature_x) < _snap_threshold:
+    edge_frame_x = _get_x_for_frame_func(edge_frame)
+    if abs(edge_frame_x - snapping_feature_x) < _snap_threshold:
         global _last_snap_x
-        _last_snap_x = playhead_frame_x
-        return mouse_x - (snapping_feature_x - playhead_frame_x)
+        _last_snap_x = edge_frame_x
+        return mouse_x - (snapping_feature_x - edge_frame_x)
     else:
         return -1 # no snapping happened
         
@@ -191,11 +250,11 @@ def _overwrite_move_snap(x, track, frame, edit_data):
     snapped_x = -1 # if value stays same till end, no snapping has happened
     snapped_x = _three_track_snap(track, x, first_clip_frame, first_clip_x)
     if snapped_x == -1:
-        snapped_x = _playhead_snap(x, first_clip_x)
+        snapped_x = _edges_snap(x, first_clip_frame, first_clip_x)
     if snapped_x == -1:
         snapped_x = _three_track_snap(track, x, last_clip_frame, last_clip_x)
     if snapped_x == -1:
-        snapped_x = _playhead_snap(x, last_clip_x)
+        snapped_x = _edges_snap(x, last_clip_frame, last_clip_x)
         
     # Return either original x or snapped x
     return return_snapped_x_or_x(snapped_x, x)
@@ -219,11 +278,11 @@ def _overwrite_box_snap(x, track, frame, edit_data):
     snapped_x = -1 # if value stays same till end, no snapping has happened.
     snapped_x = _three_track_snap(track, x, frame_1, frame_1_x)
     if snapped_x == -1:
-        snapped_x = _playhead_snap(x, frame_1_x)
+        snapped_x = _edges_snap(x, frame_1, frame_1_x)
     if snapped_x == -1:
         snapped_x = _three_track_snap(track, x, frame_2, frame_2_x)
     if snapped_x == -1:
-        snapped_x = _playhead_snap(x, frame_2_x)
+        snapped_x = _edges_snap(x, frame_2, frame_2_x)
 
     return_x = return_snapped_x_or_x(snapped_x, x)
     edit_data["snapped_frame"] = _get_frame_for_x_func(return_x) # We need to calculate move delta with snapped value.
@@ -239,7 +298,7 @@ def _object_end_drag_snap(x, track, frame, edit_data):
     snapped_x = -1  # if value stays same till end, no snapping happened.
     snapped_x = _three_track_snap(track, x, frame, frame_x)
     if snapped_x == -1:
-        snapped_x = _playhead_snap(x, frame_x)
+        snapped_x = _edges_snap(x, frame, frame_x)
     
     # Return either original or snapped x
     return return_snapped_x_or_x(snapped_x, x)
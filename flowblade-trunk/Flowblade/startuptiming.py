@@ -0,0 +1,58 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module records durations of application start-up phases and prints them as a report.
+"""
+
+import time
+
+_start_time = None
+_last_time = None
+_phases = [] # (phase name, duration in seconds)
+
+
+def start():
+    global _start_time, _last_time, _phases
+    _start_time = time.monotonic()
+    _last_time = _start_time
+    _phases = []
+
+def mark(phase_name):
+    """
+    Records time since previous mark as duration of phase that ended now.
+    """
+    global _last_time
+    if _start_time == None:
+        return
+
+    now = time.monotonic()
+    _phases.append((phase_name, now - _last_time))
+    _last_time = now
+
+def print_report():
+    if _start_time == None:
+        return
+
+    total = _last_time - _start_time
+    print("Start-up timing:")
+    for phase_name, duration in _phases:
+        print("  " + phase_name.ljust(32) + ("%.3f" % duration).rjust(8) + " s")
+    print("  " + "Total".ljust(32) + ("%.3f" % total).rjust(8) + " s")
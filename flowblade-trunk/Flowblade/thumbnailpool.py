@@ -0,0 +1,133 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module writes media thumbnail images, either directly or in background worker threads.
+
+Thumbnail files are named with hash of file path, size and modification time so they are reused
+across projects and written again when file changes.
+"""
+
+import hashlib
+try:
+    import mlt7 as mlt
+except:
+    import mlt
+import multiprocessing
+import os
+from PIL import Image
+import queue
+import threading
+
+from gi.repository import GLib
+
+import appconsts
+import atomicfile
+import editorpersistance
+import userfolders
+
+MAX_WORKERS = 4
+
+_FORMATS = {"jpeg":("JPEG", ".jpg"), "webp":("WEBP", ".webp"), "png":("PNG", ".png")}
+
+_pool = None
+
+
+# ------------------------------------------------------- interface
+def get_thumbnail_path(file_path):
+    try:
+        st = os.stat(file_path)
+        key = file_path + str(st.st_size) + str(st.st_mtime_ns)
+    except OSError:
+        key = file_path # Image sequence resource names are not files.
+    md_str = hashlib.md5(key.encode('utf-8')).hexdigest()
+    img_format, extension = _get_format()
+    return userfolders.get_cache_dir() + appconsts.THUMBNAILS_DIR + "/" + md_str + "_" + str(appconsts.THUMB_WIDTH) + extension
+
+def write_thumbnails(producer, file_path, frame):
+    """
+    Writes thumbnail for frame of producer, returns path to it.
+    """
+    producer = producer.cut(frame, frame)
+    producer.set_speed(0)
+    producer.seek(0)
+
+    mlt_frame = producer.get_frame()
+    mlt_frame.set("consumer_deinterlace", 1)
+    w, h = appconsts.THUMB_WIDTH, appconsts.THUMB_HEIGHT
+    rgba = mlt_frame.get_image(mlt.mlt_image_rgba, w, h)
+    image = Image.frombuffer("RGBA", (w, h), rgba, "raw", "RGBA", 0, 1).convert("RGB")
+
+    img_format, extension = _get_format()
+    thumbnail_path = get_thumbnail_path(file_path)
+    with atomicfile.AtomicFileWriter(thumbnail_path, "wb") as afw:
+        image.save(afw.get_file(), img_format)
+
+    return thumbnail_path
+
+def add_job(profile, file_path, frame, done_callback):
+    """
+    Writes thumbnails in a worker thread, done_callback(file_path, thumbnail_path) is called in Gtk thread.
+    thumbnail_path is None if writing failed.
+    """
+    global _pool
+    if _pool == None:
+        _pool = ThumbnailPool()
+
+    _pool.add_job(profile, file_path, frame, done_callback)
+
+def _get_format():
+    try:
+        return _FORMATS[editorpersistance.prefs.thumbnail_format]
+    except (KeyError, AttributeError):
+        return _FORMATS["png"]
+
+
+# ------------------------------------------------------- worker pool
+class ThumbnailPool:
+
+    def __init__(self):
+        self.jobs = queue.Queue()
+        self.workers = []
+
+        workers_count = min(max(multiprocessing.cpu_count() - 2, 1), MAX_WORKERS)
+        for i in range(0, workers_count):
+            worker = threading.Thread(target=self._run_worker)
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+
+    def add_job(self, profile, file_path, frame, done_callback):
+        self.jobs.put((profile, file_path, frame, done_callback))
+
+    def _run_worker(self):
+        while True:
+            profile, file_path, frame, done_callback = self.jobs.get()
+            try:
+                producer = mlt.Producer(profile, str(file_path))
+                if producer.is_valid() == False:
+                    thumbnail_path = None
+                else:
+                    thumbnail_path = write_thumbnails(producer, file_path, frame)
+            except Exception as e:
+                print("Thumbnail write failed for", file_path, e)
+                thumbnail_path = None
+
+            GLib.idle_add(done_callback, file_path, thumbnail_path)
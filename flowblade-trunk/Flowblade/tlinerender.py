@@ -19,11 +19,13 @@
 """
 import hashlib
 from gi.repository import Gdk, Gtk, GLib
+import multiprocessing
 import os
 from os import listdir
 from os.path import isfile, join
 import time
 import threading
+import weakref
 
 import appconsts
 import dialogutils
@@ -40,6 +42,7 @@ import gui
 import guiutils
 #import mltfilters # can used for testing
 import renderconsumer
+import sequenceindex
 import userfolders
 import tlinerenderserver
 
@@ -257,6 +260,8 @@ class TimeLineRenderer:
         self.release_frame = -1
 
         self.drag_on = False
+
+        self.content_tracker = TimeLineContentTracker()
             
     # --------------------------------------------- DRAW
     def draw(self, event, cr, allocation, pos, pix_per_frame):
@@ -477,6 +482,13 @@ class TimeLineRenderer:
 
         self.launch_update_thread()
 
+    def clip_changed(self, clip):
+        # Called when clip filter properties are edited, edit actions are detected when segments are updated.
+        self.content_tracker.clip_changed(clip)
+
+    def compositor_changed(self, compositor):
+        self.content_tracker.compositor_changed(compositor)
+
     def launch_update_thread(self):
         global _update_thread
         if _update_thread != None:
@@ -492,8 +504,11 @@ class TimeLineRenderer:
         return (len(self.get_dirty_segments()) == 0)
 
     def update_segments(self):
+        # Only segments overlapping timeline range changed since last update and segments without hash are rehashed.
+        changed_range = self.content_tracker.get_changed_range()
         for seg in self.segments:
-            seg.update_segment()
+            if seg.content_hash == "-1" or seg.overlaps(changed_range) == True:
+                seg.update_segment()
 
     def get_dirty_segments(self):
         dirty = []
@@ -556,11 +571,12 @@ class TimeLineRenderer:
         self.segments = list(remaining_set)
 
     # ------------------------------------------------ RENDERING
-    def update_timeline_rendering_status(self, rendering_file, fract, render_completed, completed_segments):
+    def update_timeline_rendering_status(self, rendering_files, fractions, render_completed, completed_segments):
         dirty = self.get_dirty_segments()
         for segment in dirty:
-            if segment.get_clip_path() == rendering_file:
-                segment.rendered_fract = fract
+            clip_path = segment.get_clip_path()
+            if clip_path in rendering_files:
+                segment.rendered_fract = fractions[rendering_files.index(clip_path)]
             else:
                 segment.maybe_set_completed(completed_segments)
                 
@@ -595,6 +611,12 @@ class NoOpRenderer():
 
     def timeline_changed(self):
         pass
+
+    def clip_changed(self, clip):
+        pass
+
+    def compositor_changed(self, compositor):
+        pass
  
     def press_event(self, event):
         pass
@@ -702,6 +724,16 @@ class TimeLineSegment:
             return True
         
         return False
+
+    def overlaps(self, changed_range):
+        if changed_range == None:
+            return True # None means that whole timeline has changed.
+
+        range_start, range_end = changed_range
+        if range_start < self.end_frame and range_end > self.start_frame:
+            return True
+        
+        return False
         
     # ----------------------------------------- CONTENT HASH
     def update_segment(self):
@@ -723,49 +755,57 @@ class TimeLineSegment:
         self.content_hash = new_hash
     
     def get_content_hash(self):
+        content_tracker = _timeline_renderer.content_tracker
         content_strings = []
         for i in range(1, len(current_sequence().tracks) - 1):
             track = current_sequence().tracks[i]
-            self._get_track_segment_content_strings(track, content_strings)
-        
+            self._get_track_segment_content_strings(track, content_tracker, content_strings)
+
+        self._get_compositors_content_strings(content_tracker, content_strings)
+
         content_desc = "".join(content_strings)
         
         return hashlib.md5(content_desc.encode('utf-8')).hexdigest()
         
-    def _get_track_segment_content_strings(self, track, content_strings):
-        start_clip_index, clips = self._get_track_segment_clips(track, self.start_frame, self.end_frame)
+    def _get_track_segment_content_strings(self, track, content_tracker, content_strings):
+        content_strings.append(str(track.mute_state))
+        content_strings.append(str(track.audio_gain))
+        content_strings.append(str(track.audio_pan))
+
+        track_index = content_tracker.get_track_index(track)
+        start_clip_index, clips = self._get_track_segment_clips(track, track_index, self.start_frame, self.end_frame)
         if len(clips) == 0:
             content_strings.append("-1")
             return
             
         for i in range(0, len(clips)):
             clip = clips[i]
-            self._get_clip_content_strings(track, clip, start_clip_index + i, content_strings)
+            self._get_clip_content_strings(track_index, clip, start_clip_index + i, content_tracker, content_strings)
                 
-    def _get_track_segment_clips(self, track, start_frame, end_frame):
+    def _get_track_segment_clips(self, track, track_index, start_frame, end_frame):
         clips = []
         
         # Get start range index, outer selection required
-        start_clip_index = current_sequence().get_clip_index(track, start_frame)
-        if start_clip_index == -1:
+        start_clip_index = track_index.get_clip_index_at(start_frame)
+        if start_clip_index >= len(track_index.starts):
             # Segment start aftr track end no clips in segments on this track
             return (-1, clips)
         
         # Get end range index, outer selection required
-        end_clip_index = current_sequence().get_clip_index(track, end_frame)
-        if end_clip_index == -1:
+        end_clip_index = track_index.get_clip_index_at(end_frame)
+        if end_clip_index >= len(track_index.starts):
             # Segment contains last clip on track
-            end_clip_index = len(track.clips) - 1
+            end_clip_index = len(track_index.starts) - 1
 
-        for i in range(start_clip_index, end_clip_index + 1):
-            clips.append(track.clips[i])
+        # Slicing, track may have been edited after index was built and next update rehashes it.
+        clips = track.clips[start_clip_index:end_clip_index + 1]
         
         return (start_clip_index, clips)
         
-    def _get_clip_content_strings(self, track, clip, clip_index, content_strings):
+    def _get_clip_content_strings(self, track_index, clip, clip_index, content_tracker, content_strings):
         # Position and range data
         # offset from segment start + in, out
-        clip_start_in_tline = track.clip_start(clip_index)
+        clip_start_in_tline = track_index.clip_start(clip_index)
         content_strings.append(str(clip_start_in_tline - self.start_frame))
         content_strings.append(str(clip.clip_in))
         content_strings.append(str(clip.clip_out))
@@ -775,25 +815,222 @@ class TimeLineSegment:
             content_strings.append("##blank")
             return
 
+        content_strings.append(content_tracker.get_clip_hash(clip))
+
+    def _get_compositors_content_strings(self, content_tracker, content_strings):
+        for compositor in current_sequence().compositors:
+            if compositor.clip_in >= self.end_frame or compositor.clip_out < self.start_frame:
+                continue
+
+            content_strings.append("##compositor")
+            content_strings.append(str(compositor.transition.info.mlt_service_id))
+            content_strings.append(str(compositor.clip_in - self.start_frame))
+            content_strings.append(str(compositor.clip_out - self.start_frame))
+            content_strings.append(str(compositor.transition.a_track))
+            content_strings.append(str(compositor.transition.b_track))
+            content_strings.append(content_tracker.get_properties_hash(compositor.transition))
+
+
+# ------------------------------------------------ content hashing
+class TimeLineContentTracker:
+    """
+    Finds timeline ranges changed since last segments update and memoizes clip and filter content hashes.
+
+    Edit actions and filter and compositor property edits are detected by comparing cheap per clip snapshots
+    of tracks and compositors, snapshots hold property tuples so property values are compared without hashing.
+    Editors also report property edits with clip_changed() and compositor_changed().
+    """
+    def __init__(self):
+        self.seq = None
+        self.tracks_state = None
+        self.tracks_clips = None
+        self.compositors = None
+
+        self.changed_ranges = []
+        self.changed_ranges_lock = threading.Lock()
+
+        self.clip_hashes = {} # clip.id -> (clip content key, hash)
+        self.properties_hashes = weakref.WeakKeyDictionary() # filter or compositor transition object -> (properties key, hash)
+
+        # Segments are hashed in update threads while edits in GTK thread drop indexes in seq.clip_index,
+        # so hashing uses its own track indexes built from track clips.
+        self.track_indexes = {} # track.id -> sequenceindex.TrackClipIndex
+
+    # ------------------------------------------- change reporting
+    def clip_changed(self, clip):
+        # Editors call this from their property polling threads, seq.clip_index is read in GTK thread.
+        GLib.idle_add(self._add_clip_changed_range, clip)
+
+    def _add_clip_changed_range(self, clip):
+        seq = current_sequence()
+        track, index = seq.get_track_and_index_for_id(clip.id)
+        if track == None:
+            return # Clip not on timeline, e.g. from media bin.
+
+        track_index = seq.clip_index.get_track_index(track)
+        self._add_changed_range((track_index.starts[index], track_index.ends[index]))
+
+    def compositor_changed(self, compositor):
+        self._add_changed_range((compositor.clip_in, compositor.clip_out + 1))
+
+    def _add_changed_range(self, changed_range):
+        with self.changed_ranges_lock:
+            self.changed_ranges.append(changed_range)
+
+    def get_changed_range(self):
+        """
+        Returns (start, end) range of frames that have changed since last call, or None if the whole timeline needs to be rehashed.
+        Returned range is empty, start >= end, if nothing has changed.
+        """
+        with self.changed_ranges_lock:
+            changed_ranges = self.changed_ranges
+            self.changed_ranges = []
+
+        self.update_track_indexes()
+
+        seq = current_sequence()
+        tracks_state = [seq.compositing_mode, len(seq.tracks)]
+        tracks_clips = []
+        for i in range(1, len(seq.tracks) - 1):
+            track = seq.tracks[i]
+            tracks_state.append((track.mute_state, track.audio_gain, track.audio_pan))
+            tracks_clips.append(self._get_track_clips_snapshot(track))
+        compositors = set(self._get_compositors_snapshot(seq))
+
+        full_update = (seq is not self.seq or tracks_state != self.tracks_state)
+        if full_update == False:
+            for old_clips, new_clips in zip(self.tracks_clips, tracks_clips):
+                changed_ranges.append(self._get_snapshots_diff_range(old_clips, new_clips))
+            for comp_in, comp_out, destroy_id, a_track, b_track, properties_key in compositors.symmetric_difference(self.compositors):
+                changed_ranges.append((comp_in, comp_out + 1))
+
+        if len(self.clip_hashes) > 2 * sum(len(clips) for clips in tracks_clips):
+            live_ids = set(clip_data[0].id for clips in tracks_clips for clip_data in clips)
+            self.clip_hashes = {clip_id:clip_hash for clip_id, clip_hash in self.clip_hashes.items() if clip_id in live_ids}
+
+        self.seq = seq
+        self.tracks_state = tracks_state
+        self.tracks_clips = tracks_clips
+        self.compositors = compositors
+
+        if full_update == True:
+            return None
+
+        changed_ranges = [(start, end) for start, end in changed_ranges if start < end]
+        if len(changed_ranges) == 0:
+            return (0, 0)
+
+        return (min(start for start, end in changed_ranges), max(end for start, end in changed_ranges))
+
+    def update_track_indexes(self):
+        """
+        Builds track indexes used when hashing segments, called before segments are rehashed.
+        """
+        track_indexes = {}
+        for track in current_sequence().tracks:
+            track_indexes[track.id] = sequenceindex.TrackClipIndex(track)
+        self.track_indexes = track_indexes
+
+    def get_track_index(self, track):
+        try:
+            return self.track_indexes[track.id]
+        except KeyError:
+            return sequenceindex.TrackClipIndex(track)
+
+    def _get_track_clips_snapshot(self, track):
+        track_index = self.get_track_index(track)
+        snapshot = []
+        for i in range(0, len(track.clips)):
+            clip = track.clips[i]
+            snapshot.append((clip, track_index.starts[i], track_index.ends[i], clip.clip_in, self._get_clip_key(clip)))
+        return snapshot
+
+    def _get_compositors_snapshot(self, seq):
+        # Compositors are recreated in Sequence.restack_compositors(), destroy_id stays the same for clones.
+        snapshot = []
+        for compositor in seq.compositors:
+            snapshot.append((compositor.clip_in, compositor.clip_out, compositor.destroy_id, compositor.transition.a_track, 
+                             compositor.transition.b_track, _get_properties_key(compositor.transition)))
+        return snapshot
+
+    def _get_snapshots_diff_range(self, old_clips, new_clips):
+        # Skip unchanged clips from start and end of track, changed clips are between those.
+        first = 0
+        max_same = min(len(old_clips), len(new_clips))
+        while first < max_same and old_clips[first] == new_clips[first]:
+            first += 1
+        
+        last = 0
+        while last < max_same - first and old_clips[-1 - last] == new_clips[-1 - last]:
+            last += 1
+
+        changed = old_clips[first:len(old_clips) - last] + new_clips[first:len(new_clips) - last]
+        if len(changed) == 0:
+            return (0, 0)
+
+        range_start = min(clip_data[1] for clip_data in changed)
+        range_end = max(clip_data[2] for clip_data in changed)
+        return (range_start, range_end)
+
+    # ------------------------------------------- memoized hashes
+    def _get_clip_key(self, clip):
+        # Filter properties are in key so property edits from all edit paths invalidate memoized hash.
+        filters_key = tuple((filter_object, _get_properties_key(filter_object)) for filter_object in clip.filters)
+        if clip.mute_filter == None:
+            mute_key = None
+        else:
+            mute_key = (clip.mute_filter, _get_properties_key(clip.mute_filter))
+        return (clip.path, filters_key, mute_key)
+
+    def get_clip_hash(self, clip):
+        clip_key = self._get_clip_key(clip)
+        try:
+            memo_key, clip_hash = self.clip_hashes[clip.id]
+            if memo_key == clip_key:
+                return clip_hash
+        except KeyError:
+            pass
+
+        content_strings = [str(clip.path)]
         if len(clip.filters) == 0:
             content_strings.append("##no_filters")
         else:
             for filter_object in clip.filters:
-                self._get_filter_content_strings(filter_object, content_strings)
+                content_strings.append(self.get_properties_hash(filter_object))
         
         if clip.mute_filter == None:
             content_strings.append("##no_mute")
         else:
-            self._get_filter_content_strings(clip.mute_filter, content_strings)
+            content_strings.append(self.get_properties_hash(clip.mute_filter))
+
+        clip_hash = hashlib.md5("".join(content_strings).encode('utf-8')).hexdigest()
+        self.clip_hashes[clip.id] = (clip_key, clip_hash)
+        return clip_hash
+
+    def get_properties_hash(self, properties_object):
+        # Filters and compositor transitions both have editable properties as (name, value, type) tuples.
+        properties_key = _get_properties_key(properties_object)
+        try:
+            memo_key, properties_hash = self.properties_hashes[properties_object]
+            if memo_key == properties_key:
+                return properties_hash
+        except KeyError:
+            pass
 
-    def _get_filter_content_strings(self, filter_object, content_strings):
-        for i in range(0, len(filter_object.properties)):
-            p_name, p_value, p_type = filter_object.properties[i]
+        content_strings = []
+        for i in range(0, len(properties_object.properties)):
+            p_name, p_value, p_type = properties_object.properties[i]
             content_strings.append(p_name)
             content_strings.append(str(p_type))
             content_strings.append(str(p_value))
 
-        
+        properties_hash = hashlib.md5("".join(content_strings).encode('utf-8')).hexdigest()
+        self.properties_hashes[properties_object] = (properties_key, properties_hash)
+        return properties_hash
+
+def _get_properties_key(properties_object):
+    # Property tuples are replaced when values are written, comparing these is much cheaper than hashing.
+    return tuple(properties_object.properties)
 
 
 #--------------------------------------- worker threads
@@ -855,6 +1092,7 @@ class TimeLineUpdateThread(threading.Thread):
         current_sequence().update_edit_tracks_length()
         
         destroy_segments = []
+        _timeline_renderer.content_tracker.update_track_indexes()
         for segment in self.dirty_segments:
             if segment.start_frame >= current_sequence().seq_len:
                 segment.segment_state = SEGMENT_RENDERED
@@ -916,9 +1154,9 @@ class TimeLineStatusPollingThread(threading.Thread):
         
         while running:
 
-            rendering_file, fract, render_completed, completed_segments = tlinerenderserver.get_render_status()
+            rendering_files, fractions, render_completed, completed_segments = tlinerenderserver.get_render_status()
 
-            get_renderer().update_timeline_rendering_status(rendering_file, fract, render_completed, completed_segments)
+            get_renderer().update_timeline_rendering_status(rendering_files, fractions, render_completed, completed_segments)
 
             GLib.idle_add(_update_tline)
 
@@ -991,9 +1229,26 @@ class TLineSettingsRenderDialog:
         
         panel_encoding = guiutils.get_named_frame(_("Render Encoding"), vbox_enc)
 
+        # Workers
+        spin_adj = Gtk.Adjustment(value=editorpersistance.prefs.tline_render_max_workers, lower=1, 
+                                  upper=multiprocessing.cpu_count(), step_increment=1)
+        self.workers_spin = Gtk.SpinButton(adjustment=spin_adj)
+        self.workers_spin.set_numeric(True)
+        self.workers_spin.set_tooltip_text(_("Number of segments rendered concurrently, each in its own process"))
+        self.workers_spin.connect("value-changed", lambda w: self.workers_changed(w.get_value_as_int()))
+
+        row_workers = guiutils.get_two_column_box(Gtk.Label(label=_("Concurrent Renders:")), self.workers_spin, 250)
+        
+        vbox_workers = Gtk.VBox(False, 2)
+        vbox_workers.pack_start(row_workers, False, False, 0)
+        vbox_workers.pack_start(guiutils.pad_label(8, 12), False, False, 0)
+        
+        panel_workers = guiutils.get_named_frame(_("Render Processes"), vbox_workers)
+        
         # Pane
         vbox = Gtk.VBox(False, 2)
         vbox.pack_start(panel_encoding, False, False, 0)
+        vbox.pack_start(panel_workers, False, False, 0)
         guiutils.set_margins(vbox, 8, 12, 12, 12)
 
         self.dialog.vbox.pack_start(vbox, True, True, 0)
@@ -1010,4 +1265,8 @@ class TLineSettingsRenderDialog:
     def size_changed(self, size_index):
         editorpersistance.prefs.tline_render_size = size_index
         editorpersistance.save()
+
+    def workers_changed(self, max_workers):
+        editorpersistance.prefs.tline_render_max_workers = max_workers
+        editorpersistance.save()
     
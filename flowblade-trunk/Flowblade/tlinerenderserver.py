@@ -58,6 +58,10 @@ import userfolders
 TLINE_RENDER_ENCODING_INDEX = 0
 RENDERING_PAD_FRAMES = 3
 
+# Segment render worker processes report progress by writing these prefixed lines into their stdout.
+WORKER_PROGRESS_MSG = "TLINE_WORKER_PROGRESS:"
+WORKER_DONE_MSG = "TLINE_WORKER_DONE"
+
 _dbus_service = None
 
 
@@ -153,23 +157,30 @@ class TLineRenderDBUSService(dbus.service.Object):
             clip_range_out = segments_outs[i]
             segments.append((clip_path, clip_range_in, clip_range_out))
 
-        self.render_runner_thread = TLineRenderRunnerThread(self, sequence_xml_path, segments, profile_name)
+        editorpersistance.load() # to apply possible changes on timeline rendering
+        max_workers = editorpersistance.prefs.tline_render_max_workers
+        if max_workers > 1 and len(segments) > 1:
+            self.render_runner_thread = TLineRenderWorkerPoolThread(self, sequence_xml_path, segments, profile_name, max_workers)
+        else:
+            self.render_runner_thread = TLineRenderRunnerThread(self, sequence_xml_path, segments, profile_name)
         self.render_runner_thread.start()
 
     @dbus.service.method('io.github.jliljebl.Flowblade')
     def get_render_status(self):
+        # Returned lists can never be empty because DBus cannot infer types for empty lists.
         dummy_list = ["nothing"]
+        dummy_fractions = [0.0]
         if self.render_runner_thread == None:
-            return ("none", 0.0,  False, dummy_list)
+            return (dummy_list, dummy_fractions,  False, dummy_list)
         
         if self.render_runner_thread.render_complete:
-            return ("none", 1.0, self.render_runner_thread.render_complete, self.render_runner_thread.completed_segments)
-        
-        if self.render_runner_thread.current_render_file_path == None:
-            return ("none", 0.0,  False, dummy_list)
+            return (dummy_list, [1.0], self.render_runner_thread.render_complete, self.render_runner_thread.completed_segments)
+
+        rendering_files, fractions = self.render_runner_thread.get_rendering_files_and_fractions()
+        if len(rendering_files) == 0:
+            return (dummy_list, dummy_fractions,  False, self.render_runner_thread.completed_segments)
                   
-        return ( self.render_runner_thread.current_render_file_path, self.render_runner_thread.get_fraction(), 
-                  self.render_runner_thread.render_complete, self.render_runner_thread.completed_segments)
+        return (rendering_files, fractions, self.render_runner_thread.render_complete, self.render_runner_thread.completed_segments)
 
     @dbus.service.method('io.github.jliljebl.Flowblade')
     def abort_renders(self):
@@ -193,7 +204,10 @@ class TLineRenderDBUSService(dbus.service.Object):
 # --------------------------------------------------------------------- rendering
 class TLineRenderRunnerThread(threading.Thread):
     """
-    SINGLE THREADED RENDERING, SHOULD WE GET MULTIPLE PROCESSES GOING FOR MULTIPLE CLIPS AT THE SAME TIME IN MODERN MULTICORE MACHINES?
+    Renders segments one after another in server process.
+    
+    Used when editorpersistance.prefs.tline_render_max_workers is 1, 
+    see TLineRenderWorkerPoolThread for multi process rendering.
     """
     def __init__(self, dbus_service, sequence_xml_path, segments, profile_name):
         threading.Thread.__init__(self)
@@ -211,12 +225,8 @@ class TLineRenderRunnerThread(threading.Thread):
         self.aborted = False
 
     def run(self):
-        editorpersistance.load() # to apply possible chnages on timeline rendering
-        
         start_time = time.monotonic()
  
-        width, height = _get_render_dimensions(self.profile, editorpersistance.prefs.tline_render_size)
-        encoding = _get_render_encoding()
         self.render_profile = _get_render_profile(self.profile, editorpersistance.prefs.tline_render_size, self.render_folder)
         
         self.current_render_file_path = None
@@ -229,38 +239,10 @@ class TLineRenderRunnerThread(threading.Thread):
                 
             clip_file_path, clip_range_in, clip_range_out = segment
 
-            # Create render objects
-            self.current_render_file_path = clip_file_path
-            renderconsumer.performance_settings_enabled = False
-            
-            consumer = renderconsumer.get_render_consumer_for_encoding( clip_file_path,
-                                                                        self.render_profile, 
-                                                                        encoding)
-            renderconsumer.performance_settings_enabled = True
-            
-            # We are using proxy file rendering code here mostly, didn't change all names.
-            # Bit rates for proxy files are counted using 2500kbs for 
-            # PAL size image as starting point.
-            pal_pix_count = 720.0 * 576.0
-            pal_proxy_rate = 2500.0
-            proxy_pix_count = float(width * height)
-            proxy_rate = pal_proxy_rate * (proxy_pix_count / pal_pix_count)
-            proxy_rate = int(proxy_rate / 100) * 100 # Make proxy rate even hundred
-            # There are no practical reasons to have bitrates lower than 500kbs.
-            if proxy_rate < 500:
-                proxy_rate = 500
-            consumer.set("vb", str(int(proxy_rate)) + "k")
-
-            consumer.set("rescale", "nearest")
-
-            start_frame = clip_range_in 
-            
-            stop_frame = clip_range_out + RENDERING_PAD_FRAMES
-            if stop_frame > sequence_xml_producer.get_length() - 1:
-                stop_frame = sequence_xml_producer.get_length() - 1
-
             # Create and launch render thread
-            self.render_thread = renderconsumer.FileRenderPlayer(None, sequence_xml_producer, consumer, start_frame, stop_frame)
+            self.current_render_file_path = clip_file_path
+            self.render_thread = _get_segment_render_player(self.profile, self.render_profile, sequence_xml_producer, 
+                                                            clip_file_path, clip_range_in, clip_range_out)
             self.render_thread.wait_for_producer_end_stop = False
             self.render_thread.start()
 
@@ -295,12 +277,226 @@ class TLineRenderRunnerThread(threading.Thread):
     
         return self.render_thread.get_render_fraction()
 
+    def get_rendering_files_and_fractions(self):
+        if self.current_render_file_path == None:
+            return ([], [])
+        
+        return ([self.current_render_file_path], [self.get_fraction()])
+        
     def abort(self):
-        self.render_thread.shutdown()
+        if self.render_thread != None:
+            self.render_thread.shutdown()
         self.aborted = True
         self.thread_running = False
 
 
+class TLineRenderWorkerPoolThread(threading.Thread):
+    """
+    Renders segments concurrently, each segment in its own MLT process.
+    At most max_workers worker processes are running at any given time.
+    """
+    def __init__(self, dbus_service, sequence_xml_path, segments, profile_name, max_workers):
+        threading.Thread.__init__(self)
+        
+        self.dbus_service = dbus_service
+        self.sequence_xml_path = sequence_xml_path
+        self.profile_name = profile_name
+        self.segments = segments
+        self.max_workers = max_workers
+        self.completed_segments =  ["nothing"]
+        self.render_complete = False
+        self.workers = []
+        self.workers_lock = threading.Lock()
+
+        self.aborted = False
+
+    def run(self):
+        start_time = time.monotonic()
+        
+        waiting_segments = list(self.segments)
+        while (len(waiting_segments) > 0 or len(self.workers) > 0) and self.aborted == False:
+            with self.workers_lock:
+                # abort() may have stopped workers after loop condition was checked.
+                if self.aborted == True:
+                    break
+
+                # Collect completed workers.
+                for worker in list(self.workers):
+                    if worker.is_running() == False:
+                        self.workers.remove(worker)
+                        if worker.succeeded():
+                            self.completed_segments.append(worker.clip_file_path)
+                        else:
+                            print("tline render worker failed for segment", worker.clip_file_path)
+
+                # Fill free worker slots.
+                while len(self.workers) < self.max_workers and len(waiting_segments) > 0:
+                    clip_file_path, clip_range_in, clip_range_out = waiting_segments.pop(0)
+                    worker = SegmentRenderWorker(self.sequence_xml_path, clip_file_path, clip_range_in, 
+                                                 clip_range_out, self.profile_name)
+                    worker.start()
+                    self.workers.append(worker)
+
+            time.sleep(0.1)
+        
+        self.render_complete = True
+        print("tline render done, workers:", self.max_workers, "time:", time.monotonic() - start_time)
+
+    def get_rendering_files_and_fractions(self):
+        rendering_files = []
+        fractions = []
+        with self.workers_lock:
+            for worker in self.workers:
+                rendering_files.append(worker.clip_file_path)
+                fractions.append(worker.fraction)
+        
+        return (rendering_files, fractions)
+
+    def abort(self):
+        self.aborted = True
+        with self.workers_lock:
+            for worker in self.workers:
+                worker.abort()
+            self.workers = []
+
+
+class SegmentRenderWorker:
+    """
+    Launches a worker process that renders single segment and reads its progress from process stdout.
+    """
+    def __init__(self, sequence_xml_path, clip_file_path, clip_range_in, clip_range_out, profile_name):
+        self.sequence_xml_path = sequence_xml_path
+        self.clip_file_path = clip_file_path
+        self.clip_range_in = clip_range_in
+        self.clip_range_out = clip_range_out
+        self.profile_name = profile_name
+        self.fraction = 0.0
+        self.done = False
+        self.process = None
+        self.reader_thread = None
+        
+    def start(self):
+        args = [sys.executable, respaths.LAUNCH_DIR + "flowbladetlinesegmentrender",
+                "sequence_xml_path:" + str(self.sequence_xml_path),
+                "clip_file_path:" + str(self.clip_file_path),
+                "range_in:" + str(self.clip_range_in),
+                "range_out:" + str(self.clip_range_out),
+                # We need to put underscores in profile names to get them here in one piece.
+                "profile_desc:" + str(self.profile_name).replace(" ", "_")]
+
+        FLOG = open(userfolders.get_cache_dir() + "log_tline_render_worker", 'a')
+        self.process = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, 
+                                        stderr=FLOG, universal_newlines=True)
+
+        self.reader_thread = threading.Thread(target=self._read_worker_output)
+        self.reader_thread.daemon = True
+        self.reader_thread.start()
+
+    def _read_worker_output(self):
+        for line in self.process.stdout:
+            line = line.strip()
+            if line.startswith(WORKER_PROGRESS_MSG):
+                try:
+                    self.fraction = float(line[len(WORKER_PROGRESS_MSG):])
+                except ValueError:
+                    pass
+            elif line == WORKER_DONE_MSG:
+                self.done = True
+                self.fraction = 1.0
+
+    def is_running(self):
+        return self.process.poll() == None
+
+    def succeeded(self):
+        return self.done == True and self.process.returncode == 0
+
+    def abort(self):
+        if self.process.poll() == None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+
+# --------------------------------------------------------------------- segment worker process
+def segment_render_main(root_path, sequence_xml_path, clip_file_path, clip_range_in, clip_range_out, profile_desc):
+    """
+    Entry point for worker processes launched by TLineRenderWorkerPoolThread.
+    """
+    try:
+        editorstate.mlt_version = mlt.LIBMLT_VERSION
+    except:
+        editorstate.mlt_version = "0.0.99" # magic string for "not found"
+
+    userfolders.init()
+    respaths.set_paths(root_path)
+    editorpersistance.load()
+    mltinit.init_with_translations()
+
+    profile = mltprofiles.get_profile(profile_desc)
+    # Every worker writes its own render profile file to not race with other workers.
+    render_folder = os.path.dirname(clip_file_path)
+    render_profile = _get_render_profile(profile, editorpersistance.prefs.tline_render_size, render_folder, 
+                                         "temp_render_profile_" + str(os.getpid()))
+
+    sequence_xml_producer = mlt.Producer(profile, str(sequence_xml_path))
+    render_thread = _get_segment_render_player(profile, render_profile, sequence_xml_producer, 
+                                               clip_file_path, clip_range_in, clip_range_out)
+    render_thread.wait_for_producer_end_stop = False
+    render_thread.start()
+
+    while render_thread.stopped == False:
+        print(WORKER_PROGRESS_MSG + str(render_thread.get_render_fraction()), flush=True)
+        time.sleep(0.2)
+
+    render_thread.shutdown()
+
+    try:
+        os.remove(render_folder + "/temp_render_profile_" + str(os.getpid()))
+    except OSError:
+        pass
+
+    print(WORKER_DONE_MSG, flush=True)
+
+
+# --------------------------------------------------------------------- utils
+def _get_segment_render_player(profile, render_profile, sequence_xml_producer, clip_file_path, clip_range_in, clip_range_out):
+    width, height = _get_render_dimensions(profile, editorpersistance.prefs.tline_render_size)
+    encoding = _get_render_encoding()
+
+    # Create render objects
+    renderconsumer.performance_settings_enabled = False
+    
+    consumer = renderconsumer.get_render_consumer_for_encoding( clip_file_path,
+                                                                render_profile, 
+                                                                encoding)
+    renderconsumer.performance_settings_enabled = True
+    
+    # We are using proxy file rendering code here mostly, didn't change all names.
+    # Bit rates for proxy files are counted using 2500kbs for 
+    # PAL size image as starting point.
+    pal_pix_count = 720.0 * 576.0
+    pal_proxy_rate = 2500.0
+    proxy_pix_count = float(width * height)
+    proxy_rate = pal_proxy_rate * (proxy_pix_count / pal_pix_count)
+    proxy_rate = int(proxy_rate / 100) * 100 # Make proxy rate even hundred
+    # There are no practical reasons to have bitrates lower than 500kbs.
+    if proxy_rate < 500:
+        proxy_rate = 500
+    consumer.set("vb", str(int(proxy_rate)) + "k")
+
+    consumer.set("rescale", "nearest")
+
+    start_frame = clip_range_in 
+    
+    stop_frame = clip_range_out + RENDERING_PAD_FRAMES
+    if stop_frame > sequence_xml_producer.get_length() - 1:
+        stop_frame = sequence_xml_producer.get_length() - 1
+
+    return renderconsumer.FileRenderPlayer(None, sequence_xml_producer, consumer, start_frame, stop_frame)
+
 def _get_render_encoding():
     return renderconsumer.proxy_encodings[editorpersistance.prefs.tline_render_encoding]
 
@@ -319,7 +515,7 @@ def _get_render_dimensions(project_profile, proxy_size):
     new_height = old_height_half - old_height_half % 2
     return (new_width, new_height)
 
-def _get_render_profile(project_profile, render_size, render_folder):
+def _get_render_profile(project_profile, render_size, render_folder, profile_file_name="temp_render_profile"):
     new_width, new_height = _get_render_dimensions(project_profile, render_size)
     
     file_contents = "description=" + "proxy render profile" + "\n"
@@ -333,7 +529,7 @@ def _get_render_profile(project_profile, render_size, render_folder):
     file_contents += "display_aspect_num=" + str(project_profile.display_aspect_num()) + "\n"
     file_contents += "display_aspect_den=" + str(project_profile.display_aspect_den()) + "\n"
 
-    render_profile_path = render_folder + "/temp_render_profile"
+    render_profile_path = render_folder + "/" + profile_file_name
         
     with atomicfile.AtomicFileWriter(render_profile_path, "w") as afw:
         profile_file = afw.get_file()
@@ -38,6 +38,7 @@ import cairoarea
 import clipeffectseditor
 import compositormodes
 import editorpersistance
+import filmstriprenderer
 from editorstate import current_sequence
 from editorstate import timeline_visible
 from editorstate import PLAYER
@@ -238,6 +239,7 @@ DARK_FRAME_SCALE_SELECTED_COLOR_GRAD = get_multiplied_grad(0, 1, FRAME_SCALE_COL
 DARK_FRAME_SCALE_SELECTED_COLOR_GRAD_L = get_multiplied_grad(1, 1, FRAME_SCALE_SELECTED_COLOR_GRAD, GRAD_MULTIPLIER * 0.75) 
 
 ICON_SELECTED_OVERLAY_COLOR = (0.8, 0.8, 1.0, 0.3)
+FILMSTRIP_PLACEHOLDER_COLOR = (0.15, 0.15, 0.15)
 
 # Dash pattern used by Box tool
 BOX_DASH_INK = 12.0
@@ -1513,6 +1515,7 @@ class TimeLineCanvas:
             return
          
         self.drag_on = True
+        snapping.mouse_edit_started()
         self.press_listener(event, get_frame(event.x))
 
     def _motion_notify_event(self, x, y, state):
@@ -1684,6 +1687,8 @@ class TimeLineCanvas:
             cr.line_to(w, y + 0.5)
             cr.stroke()
         
+        filmstriprenderer.new_repaint()
+
         # Draw tracks
         for i in range(1, len(current_sequence().tracks) - 1): # black and hidden tracks are ignored
             self.draw_track(cr,
@@ -1746,8 +1751,6 @@ class TimeLineCanvas:
         start = track.get_clip_index_at(int(pos))
         end = track.get_clip_index_at(int(pos + width / pix_per_frame))
 
-        width_frames = float(width) / pix_per_frame
-
         # Add 1 to end because range() last index exclusive 
         # MLT returns clips structure size + 1 if frame after last clip,
         # so in that case don't add anything.
@@ -1936,34 +1939,41 @@ class TimeLineCanvas:
                         
                     text_x_add = 115
                     cr.save()
-                    try: # paint thumbnail
-                        thumb_img = clip_thumbnails[clip.path]
+                    draw_filmstrip = (editorstate.display_clip_filmstrips == True and clip.container_data == None)
+                    if draw_filmstrip == True:
                         self.create_round_rect_path(cr, scale_in + 5, y + 4.5, scale_length - 10, track_height - 8, 3.0)
                         cr.clip()
-                        cr.set_source_surface(thumb_img,scale_in, y - 20)
-                        cr.paint()
-                    except: # thumbnail not found  in dict, get it and  paint it.
-                        try:
-                            if clip.container_data == None:
-                                media_file = PROJECT().get_media_file_for_path(clip.path)
-                                thumb_img = media_file.icon
-                            else:
-                                media_file = PROJECT().get_media_file_for_path(clip.path)
-                                if media_file != None:
-                                    thumb_img = media_file.icon
-                                else:
-                                    thumb_img = clip.container_data.get_rendered_thumbnail()
-
-                            cr.rectangle(scale_in + 4, y + 3.5, scale_length - 8, track_height - 6)
+                        self.draw_clip_filmstrip(cr, clip, scale_in, scale_length, y, track_height, width)
+                        text_x_add = 0
+                    else:
+                        try: # paint thumbnail
+                            thumb_img = clip_thumbnails[clip.path]
+                            self.create_round_rect_path(cr, scale_in + 5, y + 4.5, scale_length - 10, track_height - 8, 3.0)
                             cr.clip()
-                            cr.set_source_surface(thumb_img, scale_in, y - 20)
+                            cr.set_source_surface(thumb_img,scale_in, y - 20)
                             cr.paint()
-                            clip_thumbnails[clip.path] = thumb_img
-                        except:
-                            pass # This fails for rendered fades and transitions.
+                        except: # thumbnail not found  in dict, get it and  paint it.
+                            try:
+                                if clip.container_data == None:
+                                    media_file = PROJECT().get_media_file_for_path(clip.path)
+                                    thumb_img = media_file.icon
+                                else:
+                                    media_file = PROJECT().get_media_file_for_path(clip.path)
+                                    if media_file != None:
+                                        thumb_img = media_file.icon
+                                    else:
+                                        thumb_img = clip.container_data.get_rendered_thumbnail()
+
+                                cr.rectangle(scale_in + 4, y + 3.5, scale_length - 8, track_height - 6)
+                                cr.clip()
+                                cr.set_source_surface(thumb_img, scale_in, y - 20)
+                                cr.paint()
+                                clip_thumbnails[clip.path] = thumb_img
+                            except:
+                                pass # This fails for rendered fades and transitions.
                     
                     if clip.selected:
-                        if scale_length - 8 < appconsts.THUMB_WIDTH:
+                        if scale_length - 8 < appconsts.THUMB_WIDTH or draw_filmstrip == True:
                             ow = scale_length - 8 
                         else:
                             ow = appconsts.THUMB_WIDTH
@@ -1999,41 +2009,20 @@ class TimeLineCanvas:
                     y_pad = WAVEFORM_PAD_SMALL
                     bar_height = WAVEFORM_HEIGHT_SMALL
                 
-                # Draw all frames only if pixels per frame > 2, otherwise.
-                # draw only every other or fewer frames.
-                draw_pix_per_frame = pix_per_frame
-                if draw_pix_per_frame < 2:
-                    draw_pix_per_frame = 2
-                    step = int(2 // pix_per_frame)
-                    if step < 1:
-                        step = 1
-                else:
-                    step = 1
-
-                # Draw only frames in display.
-                draw_first = clip_in
-                draw_last = clip_out + 1
-                if clip_start_frame < 0:
-                    draw_first = int(draw_first - clip_start_frame)
-                if draw_first + width_frames < draw_last:
-                    draw_last = int(draw_first + width_frames) + 1
-
                 # Get media frame 0 position in screen pixels.
-                media_start_pos_pix = scale_in - clip_in * pix_per_frame
-                
-                # Draw level bar for each frame in draw range.
-                for f in range(draw_first, draw_last, step):
-                    try:
-                        x = media_start_pos_pix + f * pix_per_frame
-                        h = bar_height * clip.waveform_data[f]
-                        if h < 1:
-                            h = 1
-                        cr.rectangle(x, y + y_pad + (bar_height - h), draw_pix_per_frame, h)
-                    except:
-                        # This is just dirty fix a when 23.98 fps does not work.
-                        break
+                media_start_pos_pix = int(round(scale_in - clip_in * pix_per_frame))
+
+                # Draw cached waveform image tiles covering visible part of clip.
+                draw_start_pix = max(scale_in, 0) - media_start_pos_pix
+                draw_end_pix = min(scale_in + scale_length, width) - media_start_pos_pix
+                first_tile = int(draw_start_pix // audiowaveformrenderer.WAVEFORM_TILE_WIDTH)
+                last_tile = int(draw_end_pix // audiowaveformrenderer.WAVEFORM_TILE_WIDTH)
+                for tile_index in range(max(first_tile, 0), last_tile + 1):
+                    tile = audiowaveformrenderer.get_waveform_tile(clip.path, clip.waveform_data, pix_per_frame, 
+                                                                   bar_height, tile_index)
+                    tile_x = media_start_pos_pix + tile_index * audiowaveformrenderer.WAVEFORM_TILE_WIDTH
+                    cr.mask_surface(tile, tile_x, y + y_pad)
 
-                cr.fill()
                 cr.restore()
 
             # Draw proxy indicator.
@@ -2363,6 +2352,38 @@ class TimeLineCanvas:
         cr.set_line_width(4.0)
         cr.stroke()
 
+    def draw_clip_filmstrip(self, cr, clip, scale_in, scale_length, y, track_height, width):
+        """
+        Draws frames spaced along clip at current zoom level from cached tiles,
+        placeholders are drawn for tiles that are still being decoded.
+        """
+        profile = PROJECT().profile
+        tile_height = int(track_height - 8)
+        tile_width = filmstriprenderer.get_tile_width(profile, tile_height)
+
+        # Tile slots are in media pixels space so they stay in place when timeline is scrolled or clip is trimmed.
+        media_start_pos_pix = int(round(scale_in - clip.clip_in * pix_per_frame))
+        draw_start_pix = max(scale_in, 0) - media_start_pos_pix
+        draw_end_pix = min(scale_in + scale_length, width) - media_start_pos_pix
+        first_slot = max(int(draw_start_pix // tile_width), 0)
+        last_slot = int(draw_end_pix // tile_width)
+
+        for slot in range(first_slot, last_slot + 1):
+            x = media_start_pos_pix + slot * tile_width
+            if clip.media_type == sequence.IMAGE:
+                frame = 0
+            else:
+                frame = min(int(slot * tile_width / pix_per_frame), clip.get_length() - 1)
+
+            tile = filmstriprenderer.get_tile(profile, clip.path, frame, tile_height)
+            if tile != None:
+                cr.set_source_surface(tile, x, y + 4)
+                cr.paint()
+            else:
+                cr.set_source_rgb(*FILMSTRIP_PLACEHOLDER_COLOR)
+                cr.rectangle(x + 1, y + 4, tile_width - 2, tile_height)
+                cr.fill()
+
     def create_round_rect_path(self, cr, x, y, width, height, radius=4.0):
         degrees = M_PI / 180.0
         cr.new_sub_path()
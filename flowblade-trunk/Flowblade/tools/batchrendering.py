@@ -35,6 +35,7 @@ except:
     import mlt
 import hashlib
 import locale
+import multiprocessing
 import os
 from os import listdir
 from os.path import isfile, join
@@ -50,6 +51,7 @@ import unicodedata
 
 import atomicfile
 import appconsts
+import chunkrender
 import dialogutils
 import editorstate
 import editorpersistance
@@ -86,10 +88,12 @@ RENDERED = 2
 UNQUEUED = 3
 ABORTED = 4
 
+MAX_CPU_WEIGHT = 8
+MAX_PASSING_STARTS = 3 # Number of items that can be started before a waiting item that does not fit in free render slots.
+
 render_queue = []
 _batch_render_app = None
 batch_window = None
-render_thread = None
 queue_runner_thread = None
 
 timeout_id = None
@@ -105,100 +109,154 @@ single_render_thread = None
 
 # -------------------------------------------------------- render thread
 class QueueRunnerThread(threading.Thread):
+    """
+    Renders queued items concurrently, an item is started when CPU weights of running items
+    and its own CPU weight fit in render slots. Item that does not fit in slots is rendered alone.
+    When lighter items have been started MAX_PASSING_STARTS times before a waiting item, no more
+    items are started until it fits.
+    """
     def __init__(self):
         threading.Thread.__init__(self)
-    
+        self.running_renders = []
+        self.running_lock = threading.Lock()
+        self.aborted = False
+
     def run(self):        
         self.running = True
         items = 0
         global render_queue, batch_window
+        slots = get_render_slots()
+        queue_start_time = time.time()
+
+        waiting_items = []
         for render_item in render_queue.queue:
-            if self.running == False:
-                break
-            if render_item.render_this_item == False:
-                continue
-            
-            current_render_time = 0
+            if render_item.render_this_item == True:
+                waiting_items.append(render_item)
+
+        project_pool = RenderProjectPool(waiting_items)
+        render_frames = 0
+        for render_item in waiting_items:
+            start_frame, end_frame, wait_for_stop_render = get_render_range(render_item)
+            render_frames += end_frame - start_frame + 1
+        rendered_frames = 0
+        passing_starts = {} # id(render item) -> number of items started before it while it was waiting
+
+        while (len(waiting_items) > 0 or len(self.running_renders) > 0) and self.running == True:
+            # Collect completed renders.
+            for item_render in list(self.running_renders):
+                if self.aborted == True:
+                    break
+                if item_render.render_thread.running == True:
+                    continue
+                with self.running_lock:
+                    self.running_renders.remove(item_render)
+                item_render.render_thread.shutdown()
+                if item_render.render_thread.failed() == True:
+                    print("Render failed for " + item_render.render_item.render_path + ", " + str(item_render.render_thread.error))
+                    item_render.render_item.render_failed()
+                else:
+                    item_render.render_item.render_completed()
+                project_pool.release(item_render.render_item, item_render.project)
+                rendered_frames += item_render.length
+                items = items + 1
+                GLib.idle_add(self._render_start_update, item_render.render_item)
 
-            # Create render objects
-            identifier = render_item.generate_identifier()
-            project_file_path = get_projects_dir() + identifier + ".flb"
-            persistance.show_messages = False
+            # Start items that fit in free slots.
+            passed_items = []
+            for render_item in list(waiting_items):
+                if self.running == False:
+                    break
+                used_slots = sum([item_render.render_item.get_cpu_weight() for item_render in self.running_renders])
+                if len(self.running_renders) > 0 and used_slots + render_item.get_cpu_weight() > slots:
+                    if passing_starts.get(id(render_item), 0) >= MAX_PASSING_STARTS:
+                        break # Slots are left to free for this item.
+                    passed_items.append(render_item)
+                    continue
+                for passed_item in passed_items:
+                    passing_starts[id(passed_item)] = passing_starts.get(id(passed_item), 0) + 1
+                waiting_items.remove(render_item)
+                item_render = self._start_render(render_item, project_pool)
+                with self.running_lock:
+                    self.running_renders.append(item_render)
+                GLib.idle_add(self._render_start_update, render_item)
+
+            # Update view
+            done_frames = rendered_frames
+            for item_render in self.running_renders:
+                done_frames += item_render.render_thread.get_render_fraction() * item_render.length
+            if render_frames > 0:
+                render_fraction = min(done_frames / float(render_frames), 1.0)
+            else:
+                render_fraction = 1.0
+            current_render_time = time.time() - queue_start_time
+            GLib.idle_add(self._render_progress_update, render_fraction, items, current_render_time)
 
-            project = persistance.load_project(project_file_path, False)
+            time.sleep(0.33)
 
-            project.c_seq.fix_v1_for_render()
+        if self.aborted == True:
+            # Renders started while abort was being done were not stopped by abort().
+            for item_render in self.running_renders:
+                item_render.render_thread.shutdown()
+                item_render.render_item.render_aborted()
+            self.running_renders = []
 
-            maybe_create_render_folder(render_item.render_path)
-        
+        project_pool.clear()
+
+        # Update view for render end
+        GLib.idle_add(self._queue_done_update)
+
+    def _start_render(self, render_item, project_pool):
+        maybe_create_render_folder(render_item.render_path)
+
+        # Get render range
+        start_frame, end_frame, wait_for_stop_render = get_render_range(render_item)
+
+        # Chunked renders load project in worker processes.
+        if chunkrender.use_chunked_render(render_item, start_frame, end_frame):
+            project = None
+            render_thread = chunkrender.ChunkedRenderPlayer(render_item.get_project_filepath(), render_item, start_frame, end_frame)
+        else:
+            project = project_pool.acquire(render_item)
             producer = project.c_seq.tractor
             profile = mltprofiles.get_profile(render_item.render_data.profile_name)
             consumer = renderconsumer.get_mlt_render_consumer(render_item.render_path, 
                                                               profile,
                                                               render_item.args_vals_list)
-
-            # Get render range
-            start_frame, end_frame, wait_for_stop_render = get_render_range(render_item)
-            
-            # Create and launch render thread
-            global render_thread 
             render_thread = renderconsumer.FileRenderPlayer(None, producer, consumer, start_frame, end_frame) # None == file name not needed this time when using FileRenderPlayer because callsite keeps track of things
-            render_thread.wait_for_producer_end_stop = wait_for_stop_render
-            render_thread.start()
+        render_thread.wait_for_producer_end_stop = wait_for_stop_render
+        render_thread.start()
 
-            # Set render start time and item state
-            render_item.render_started()
+        # Set render start time and item state
+        render_item.render_started()
 
-            GLib.idle_add(self._render_start_update, render_item)
+        # Make sure that render thread is actually running before
+        # testing render_thread.running value later
+        while render_thread.has_started_running == False:
+            time.sleep(0.05)
 
-            # Make sure that render thread is actually running before
-            # testing render_thread.running value later
-            while render_thread.has_started_running == False:
-                time.sleep(0.05)
+        return ItemRender(render_item, render_thread, project, end_frame - start_frame + 1)
 
-            # View update loop
-            self.thread_running = True
-            self.aborted = False
-            while self.thread_running:
-                if self.aborted == True:
-                    break        
-                render_fraction = render_thread.get_render_fraction()
-                now = time.time()
-                current_render_time = now - render_item.start_time
-    
-                GLib.idle_add(self._render_progress_update, render_fraction, items, render_item.get_display_name(), current_render_time)
-                
-                if render_thread.running == False: # Rendering has reached end
-                    self.thread_running = False
-                    
-                    GLib.idle_add(self._progress_bar_update, 1.0)
-                                    
-                    render_item.render_completed()
-                else:
-                    time.sleep(0.33)
-                    
-            if not self.aborted:
-                items = items + 1
-                GLib.idle_add(self._render_progress_update, 0, items, render_item.get_display_name(), 0)
-            else:
-                if render_item != None:
-                    render_item.render_aborted()
-                    break
-            render_thread.shutdown()
-        
-        # Update view for render end
-        GLib.idle_add(self._queue_done_update)
+    def get_item_progress_str(self, render_item):
+        # Queue may have been reloaded while rendering, so items are matched with identifiers.
+        identifier = render_item.generate_identifier()
+        with self.running_lock:
+            for item_render in self.running_renders:
+                if item_render.render_item.matches_identifier(identifier):
+                    return item_render.get_progress_str()
+        return None
+
+    def get_rendering_items(self):
+        with self.running_lock:
+            return [item_render.render_item for item_render in self.running_renders]
 
     def _render_start_update(self, render_item):
         batch_window.update_queue_view()
-        batch_window.current_render.set_text("  " + render_item.get_display_name())
-        batch_window.current_file.set_text("  " +  os.path.basename(render_item.render_path))
+        rendering_items = self.get_rendering_items()
+        batch_window.current_render.set_text("  " + ", ".join([item.get_display_name() for item in rendering_items]))
+        batch_window.current_file.set_text("  " + ", ".join([os.path.basename(item.render_path) for item in rendering_items]))
 
-    def _render_progress_update(self, render_fraction, items, display_time, current_render_time):
-        batch_window.update_render_progress(render_fraction, items, display_time, current_render_time)
-
-    def _progress_bar_update(self, fraction):
-        batch_window.render_progress_bar.set_fraction(fraction)
+    def _render_progress_update(self, render_fraction, items, current_render_time):
+        batch_window.update_render_progress(render_fraction, items, current_render_time)
 
     def _queue_done_update(self):
         # Update view for render end
@@ -206,15 +264,93 @@ class QueueRunnerThread(threading.Thread):
         batch_window.render_queue_stopped()
         
     def abort(self):
-        render_thread.shutdown()
-        # It may be that 'aborted' and 'running' could combined into single flag, but whatevaar
+        # Flags are set first so that runner does not take stopped renders as completed.
         self.aborted = True
         self.running = False
-        self.thread_running = False
+        with self.running_lock:
+            for item_render in self.running_renders:
+                item_render.render_thread.shutdown()
         
         batch_window.reload_queue() # item may havee added to queue while rendering
 
 
+class ItemRender:
+    """
+    Render thread and loaded project for rendering queue item.
+    """
+    def __init__(self, render_item, render_thread, project, length):
+        self.render_item = render_item
+        self.render_thread = render_thread
+        self.project = project
+        self.length = length
+
+    def get_progress_str(self):
+        fraction = self.render_thread.get_render_fraction()
+        render_time = time.time() - self.render_item.start_time
+        if fraction <= 0.0 or render_time <= 0.0:
+            return "-"
+
+        fps = (fraction * self.length) / render_time
+        left = (render_time / fraction) - render_time
+        return "%.1f fps, %s" % (fps, utils.get_time_str_for_sec_float(left))
+
+
+class RenderProjectPool:
+    """
+    Loads projects for queue items, items with same saved project data and sequence share loaded project
+    when it is not being rendered by other item.
+    """
+    def __init__(self, render_items):
+        self.free_projects = {} # project key -> list of loaded projects not being rendered
+        self.item_keys = {} # render item identifier -> project key
+        self.pending_keys = {} # project key -> number of items not yet released
+        for render_item in render_items:
+            try:
+                key = (_get_file_digest(render_item.get_project_filepath()), render_item.sequence_index)
+            except OSError:
+                key = render_item.generate_identifier() # Project file load will fail and report.
+            self.item_keys[render_item.generate_identifier()] = key
+            self.pending_keys[key] = self.pending_keys.get(key, 0) + 1
+
+    def acquire(self, render_item):
+        key = self.item_keys[render_item.generate_identifier()]
+        free_projects = self.free_projects.get(key, [])
+        if len(free_projects) > 0:
+            return free_projects.pop()
+
+        persistance.show_messages = False
+        project = persistance.load_project(render_item.get_project_filepath(), False)
+        project.c_seq.fix_v1_for_render()
+        return project
+
+    def release(self, render_item, project):
+        key = self.item_keys[render_item.generate_identifier()]
+        self.pending_keys[key] -= 1
+        # Loaded projects are only kept while there are items that could use them.
+        if project != None and self.pending_keys[key] > 0:
+            self.free_projects.setdefault(key, []).append(project)
+        elif self.pending_keys[key] == 0:
+            self.free_projects.pop(key, None)
+
+    def clear(self):
+        self.free_projects = {}
+
+
+def get_render_slots():
+    slots = editorpersistance.prefs.batch_render_slots
+    if slots <= 0:
+        # Each render uses several threads for decoding, compositing and encoding, so one slot for every four cores.
+        slots = min(max(multiprocessing.cpu_count() // 4, 1), 8)
+    return slots
+
+def _get_file_digest(file_path):
+    md5 = hashlib.md5()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            md5.update(block)
+    return md5.hexdigest()
+
+
 class BatchRenderDBUSService(dbus.service.Object):
     def __init__(self):
         print("dbus service init")
@@ -520,6 +656,7 @@ class BatchRenderItemData:
         self.mark_out = mark_out
         self.render_data = render_data
         self.render_this_item = True
+        self.cpu_weight = 1
         self.status = IN_QUEUE
         self.start_time = -1
         self.render_time = -1
@@ -569,14 +706,16 @@ class BatchRenderItemData:
         self.render_time = time.time() - self.start_time
         self.save()
     
-    def render_aborted(self):
+    def render_failed(self):
         self.status = ABORTED
         self.render_this_item = False
         self.render_time = -1
         self.save()
 
-        global queue_runner_thread, render_thread
-        render_thread = None
+    def render_aborted(self):
+        self.render_failed()
+
+        global queue_runner_thread
         queue_runner_thread = None      
 
     def get_status_string(self):
@@ -603,6 +742,12 @@ class BatchRenderItemData:
     def get_project_filepath(self):
         return get_projects_dir() + self.generate_identifier() + ".flb"
 
+    def get_cpu_weight(self):
+        # Items queued before CPU weights were added don't have them.
+        if hasattr(self, "cpu_weight"):
+            return self.cpu_weight
+        return 1
+
 
 class RenderData:
 
@@ -613,6 +758,8 @@ class RenderData:
         self.profile_desc = profile_desc
         self.profile_name = profile_name
         self.fps = fps
+        self.chunk_frames = 0 # 0 for rendering in single process, see chunkrender.py.
+        self.chunk_workers = 0
 
 def get_render_range(render_item):
     if render_item.mark_in < 0: # no range defined
@@ -815,7 +962,7 @@ class BatchRenderWindow:
         queue_runner_thread = QueueRunnerThread()
         queue_runner_thread.start()
 
-    def update_render_progress(self, fraction, items, current_name, current_render_time_passed):
+    def update_render_progress(self, fraction, items, current_render_time_passed):
         self.render_progress_bar.set_fraction(fraction)
 
         progress_str = str(int(fraction * 100)) + " %"
@@ -837,6 +984,8 @@ class BatchRenderWindow:
         
         self.items_rendered.set_text("  " + str(items))
 
+        self.queue_view.update_progress_column(render_queue)
+
     def abort_render(self):
         global queue_runner_thread
         queue_runner_thread.abort()
@@ -852,8 +1001,7 @@ class BatchRenderWindow:
         self.remove_selected.set_sensitive(True)
         self.remove_finished.set_sensitive(True)
 
-        global queue_runner_thread, render_thread
-        render_thread = None
+        global queue_runner_thread
         queue_runner_thread = None        
 
 
@@ -862,7 +1010,7 @@ class RenderQueueView(Gtk.VBox):
     def __init__(self):
         GObject.GObject.__init__(self)
         
-        self.storemodel = Gtk.ListStore(bool, str, str, str, str)
+        self.storemodel = Gtk.ListStore(bool, str, str, str, str, str)
         
         # Scroll container
         self.scroll = Gtk.ScrolledWindow()
@@ -893,12 +1041,16 @@ class RenderQueueView(Gtk.VBox):
         self.text_rend_4 = Gtk.CellRendererText()
         self.text_rend_4.set_property("yalign", 0.0)
 
+        self.text_rend_5 = Gtk.CellRendererText()
+        self.text_rend_5.set_property("yalign", 0.0)
+
         # Column views
         self.toggle_col = Gtk.TreeViewColumn(_("Render"), self.toggle_rend)
         self.text_col_1 = Gtk.TreeViewColumn(_("Project/Sequence"))
         self.text_col_2 = Gtk.TreeViewColumn(_("Status"))
         self.text_col_3 = Gtk.TreeViewColumn(_("Render File"))
         self.text_col_4 = Gtk.TreeViewColumn(_("Render Time"))
+        self.text_col_5 = Gtk.TreeViewColumn(_("Speed / Time Left"))
 
         # Build column views
         self.toggle_col.set_expand(False)
@@ -924,12 +1076,17 @@ class RenderQueueView(Gtk.VBox):
         self.text_col_4.pack_start(self.text_rend_4, True)
         self.text_col_4.add_attribute(self.text_rend_4, "text", 4)
 
+        self.text_col_5.set_expand(False)
+        self.text_col_5.pack_start(self.text_rend_5, True)
+        self.text_col_5.add_attribute(self.text_rend_5, "text", 5)
+
         # Add column views to view
         self.treeview.append_column(self.toggle_col)
         self.treeview.append_column(self.text_col_1)
         self.treeview.append_column(self.text_col_2)
         self.treeview.append_column(self.text_col_3)
         self.treeview.append_column(self.text_col_4)
+        self.treeview.append_column(self.text_col_5)
 
         # popup menu
         self.treeview.connect("button-press-event", self.on_treeview_button_press_event)
@@ -959,7 +1116,7 @@ class RenderQueueView(Gtk.VBox):
                 path, col, cellx, celly = pthinfo
                 treeview.grab_focus()
                 treeview.set_cursor(path, col, 0)
-                display_render_item_popup_menu(self.item_menu_item_selected, event)
+                display_render_item_popup_menu(self.item_menu_item_selected, event, render_queue.queue[max(path)])
             return True
         else:
             return False
@@ -977,6 +1134,9 @@ class RenderQueueView(Gtk.VBox):
                 copy_project(render_item, file_name)
         elif msg == "changepath":
             show_change_render_item_path_dialog(_change_render_item_path_callback, render_item)
+        elif msg.startswith("cpuweight"):
+            render_item.cpu_weight = int(msg[len("cpuweight"):])
+            render_item.save()
 
     def fill_data_model(self, render_queue):
         self.storemodel.clear()        
@@ -986,10 +1146,23 @@ class RenderQueueView(Gtk.VBox):
                         render_item.get_display_name(),
                         render_item.get_status_string(),
                         render_item.render_path, 
-                        render_item.get_render_time()]
+                        render_item.get_render_time(),
+                        self.get_progress_str(render_item)]
             self.storemodel.append(row_data)
             self.scroll.queue_draw()
 
+    def update_progress_column(self, render_queue):
+        for i in range(0, min(len(render_queue.queue), len(self.storemodel))):
+            self.storemodel[i][5] = self.get_progress_str(render_queue.queue[i])
+
+    def get_progress_str(self, render_item):
+        if queue_runner_thread == None or render_item.status != RENDERING:
+            return "-"
+        progress_str = queue_runner_thread.get_item_progress_str(render_item)
+        if progress_str == None:
+            return "-"
+        return progress_str
+
 
 def run_save_project_as_dialog(project_name):
     dialog = Gtk.FileChooserDialog(_("Save Render Item Project As"), None, 
@@ -1120,7 +1293,7 @@ def _change_render_item_path_callback(dialog, response_id, data):
     else:
         dialog.destroy()
         
-def display_render_item_popup_menu(callback, event):
+def display_render_item_popup_menu(callback, event, render_item):
     menu = render_item_menu
     guiutils.remove_children(menu)
     
@@ -1128,6 +1301,16 @@ def display_render_item_popup_menu(callback, event):
     menu.add(_get_menu_item(_("Save Item Project As..."), callback,"saveas"))
     menu.add(_get_menu_item(_("Render Properties"), callback,"renderinfo")) 
     _add_separetor(menu)
+
+    # Items are rendered concurrently while their CPU weights fit in render slots.
+    weight_menu_item = Gtk.MenuItem(_("CPU Weight"))
+    weight_menu = Gtk.Menu()
+    for weight in range(1, MAX_CPU_WEIGHT + 1):
+        weight_menu.add(_get_menu_item(str(weight), callback, "cpuweight" + str(weight), weight != render_item.get_cpu_weight()))
+    weight_menu_item.set_submenu(weight_menu)
+    weight_menu_item.show()
+    menu.add(weight_menu_item)
+    _add_separetor(menu)
     menu.add(_get_menu_item(_("Delete"), callback,"delete"))
     menu.popup(None, None, None, None, event.button, event.time)
     
@@ -1285,7 +1468,10 @@ class SingleRenderThread(threading.Thread):
         start_frame, end_frame, wait_for_stop_render = get_render_range(render_item)
         
         # Create and launch render thread
-        render_thread = renderconsumer.FileRenderPlayer(None, producer, consumer, start_frame, end_frame) # None == file name not needed this time when using FileRenderPlayer because callsite keeps track of things
+        if chunkrender.use_chunked_render(render_item, start_frame, end_frame):
+            render_thread = chunkrender.ChunkedRenderPlayer(project_file_path, render_item, start_frame, end_frame)
+        else:
+            render_thread = renderconsumer.FileRenderPlayer(None, producer, consumer, start_frame, end_frame) # None == file name not needed this time when using FileRenderPlayer because callsite keeps track of things
         render_thread.wait_for_producer_end_stop = wait_for_stop_render
         render_thread.start()
 
@@ -1321,7 +1507,16 @@ class SingleRenderThread(threading.Thread):
         single_render_thread = None
 
         # Update view for render end
-        GLib.idle_add(_single_render_shutdown)
+        if render_thread.failed() == True:
+            GLib.idle_add(self._show_render_failed, render_thread.error)
+        else:
+            GLib.idle_add(_single_render_shutdown)
+
+    def _show_render_failed(self, error):
+        primary_txt = _("Render failed!")
+        secondary_txt = _("Rendering did not create output file:") + "\n\n" + str(error)
+        dialogutils.warning_message_with_callback(primary_txt, secondary_txt, single_render_window.window, False, 
+                                                  _single_render_failed_dialog_callback)
 
     def _show_current_render(self, render_item):
         single_render_window.current_render.set_text("  " + os.path.basename(render_item.render_path))
@@ -1437,4 +1632,8 @@ def _start_single_render_shutdown():
 
 def _single_render_shutdown():
     _single_render_app.quit()
+
+def _single_render_failed_dialog_callback(dialog, response_id):
+    dialog.destroy()
+    _single_render_shutdown()
     
@@ -125,6 +125,7 @@ def main(root_path, session_id, project_path, range_in, range_out, profile_desc)
     mltprofiles.load_profile_list()
     
     ccrutils.init_session_folders(session_id)
+    ccrutils.connect_status_channel(session_id)
     ccrutils.load_render_data()
     
     global _start_time
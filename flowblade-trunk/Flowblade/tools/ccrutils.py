@@ -21,11 +21,17 @@
 """
 Module provides utility methods for modules creating headless render procesesses.
 Used mostly for container clips rendering, hence ContainerClipsRenderingUTILS.
+
+Status, completed and abort messages are sent through a local socket status channel when main app
+has one running and render process was launched by it. Message files in session folder are used as fallback.
 """
 
 import os
 import pickle
+import selectors
+import socket
 import sys
+import threading
 
 import appconsts
 import atomicfile
@@ -42,12 +48,25 @@ ABORT_MSG_FILE = "abort"
 RENDER_DATA_FILE = "render_data"
 RANGE_RENDER_DATA_DICT = "proc_fctx_dict"
 
+STATUS_CHANNEL_ENV_VAR = "FLOWBLADE_STATUS_CHANNEL"
+LAUNCHER_PID_ENV_VAR = "FLOWBLADE_LAUNCHER_PID" # Set for render processes not launched directly by app, see workerserver.py.
+_MAX_SOCKET_PATH_LENGTH = 100 # sockaddr_un path limit is 108 bytes on Linux.
+
+# Status channel messages, one per line.
+_SESSION_MSG = "session"
+_STATUS_MSG = "status"
+_COMPLETED_MSG = "completed"
+_ABORT_MSG = "abort"
+
 _session_folder = None
 _clip_frames_folder_internal = None
 _rendered_frames_folder_internal = None
 
 _render_data = None
 
+_channel_server = None # Used in main app.
+_channel_client = None # Used in render processes.
+
 
 # ----------------------------------------------------- interface with message files, used by main app
 # We are using message files to communicate with application.
@@ -66,6 +85,9 @@ def clear_flag_files(session_id):
     if os.path.exists(abort_msg_file):
         os.remove(abort_msg_file)
 
+    if _channel_server != None:
+        _channel_server.remove_session(session_id)
+
 def set_render_data(session_id, video_render_data):
     folder = _get_session_folder(session_id)
     render_data_path = folder + "/" + RENDER_DATA_FILE
@@ -97,6 +119,11 @@ def read_misc_session_data(session_id, file_name):
     return misc_data
         
 def session_render_complete(session_id):
+    if _channel_server != None:
+        completed, connected = _channel_server.get_session_completed(session_id)
+        if completed == True or connected == True:
+            return completed
+
     folder = _get_session_folder(session_id)
     completed_msg_path = folder + "/" + COMPLETED_MSG_FILE
 
@@ -114,6 +141,11 @@ def get_session_status(session_id):
     return (step, frame, length, elapsed)
 
 def get_session_status_message(session_id):
+    if _channel_server != None:
+        msg, connected = _channel_server.get_session_status_message(session_id)
+        if connected == True:
+            return msg
+
     try:
         status_msg_file = _get_session_folder(session_id) + "/" + STATUS_MSG_FILE
         with open(status_msg_file) as f:
@@ -133,6 +165,9 @@ def read_range_render_data(session_id):
         return None
         
 def abort_render(session_id):
+    if _channel_server != None:
+        _channel_server.abort_session(session_id)
+
     folder = _get_session_folder(session_id)
     abort_msg_file = folder + "/" +  ABORT_MSG_FILE
 
@@ -188,6 +223,9 @@ def delete_internal_folders(session_id):
             os.remove(file_path)
         os.rmdir(_session_folder)
 
+    if _channel_server != None:
+        _channel_server.remove_session(session_id)
+
 def maybe_init_external_session_folders():
     if _render_data == None:
         return
@@ -220,6 +258,9 @@ def preview_frames_folder():
         return _render_data.render_dir + appconsts.CC_PREVIEW_RENDER_DIR
         
 def write_status_message(msg):
+    if _channel_client != None and _channel_client.send(_STATUS_MSG + " " + msg) == True:
+        return
+
     try:
         status_msg_file = session_folder() + "/" + STATUS_MSG_FILE
         with atomicfile.AtomicFileWriter(status_msg_file, "w") as afw:
@@ -229,6 +270,9 @@ def write_status_message(msg):
         pass # this failing because we can't get file access will show as progress hickup to user, we don't care
 
 def write_completed_message():
+    if _channel_client != None and _channel_client.send(_COMPLETED_MSG) == True:
+        return
+
     completed_msg_file = session_folder() + "/" + COMPLETED_MSG_FILE
     script_text = "##completed##" # let's put something in here
     with atomicfile.AtomicFileWriter(completed_msg_file, "w") as afw:
@@ -267,12 +311,281 @@ def delete_rendered_frames():
         os.remove(file_path)
 
 def abort_requested():
+    if _channel_client != None and _channel_client.connected == True:
+        return _channel_client.abort
+
     abort_file = session_folder() + "/" + ABORT_MSG_FILE
     if os.path.exists(abort_file):
         return True
     else:
         return False
 
+# ------------------------------------------------------ status channel
+def start_status_channel(message_listener=None):
+    """
+    Called in main app before launching render processes. message_listener(session_id, msg_type) is called
+    from channel thread on every message received.
+    """
+    global _channel_server
+    if _channel_server != None:
+        return
+
+    socket_path = userfolders.get_cache_dir() + "status_channel_" + str(os.getpid())
+    if len(socket_path) > _MAX_SOCKET_PATH_LENGTH:
+        print("Status channel socket path too long, using message files.")
+        return
+
+    try:
+        server = StatusChannelServer(socket_path, message_listener)
+    except OSError as e:
+        print("Status channel could not be started, using message files:", e)
+        return
+
+    server.start()
+    _channel_server = server
+
+    # Render processes inherit environment, pid is used to detect processes launched by some other process.
+    os.environ[STATUS_CHANNEL_ENV_VAR] = str(os.getpid()) + ":" + socket_path
+
+def stop_status_channel():
+    global _channel_server
+    if _channel_server == None:
+        return
+
+    _channel_server.shutdown()
+    _channel_server = None
+    os.environ.pop(STATUS_CHANNEL_ENV_VAR, None)
+
+def connect_status_channel(session_id):
+    """
+    Called in render processes after session folders are initialized.
+    """
+    global _channel_client
+    try:
+        owner_pid, socket_path = os.environ[STATUS_CHANNEL_ENV_VAR].split(":", 1)
+    except (KeyError, ValueError):
+        return
+
+    # Only the process running channel server receives our messages, e.g. Script Tool launched renders use message files.
+    launcher_pid = int(os.environ.get(LAUNCHER_PID_ENV_VAR, os.getppid()))
+    if int(owner_pid) != launcher_pid:
+        return
+
+    try:
+        _channel_client = StatusChannelClient(socket_path, session_id)
+    except OSError as e:
+        print("Status channel connect failed, using message files:", e)
+        _channel_client = None
+
+
+class ChannelSession:
+
+    def __init__(self):
+        self.status_msg = None
+        self.completed = False
+        self.conn = None
+        self.abort_pending = False
+
+
+class StatusChannelServer(threading.Thread):
+    """
+    Receives messages from all render processes in a single thread.
+    """
+    def __init__(self, socket_path, message_listener):
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+        self.socket_path = socket_path
+        self.message_listener = message_listener
+        self.sessions = {} # session_id -> ChannelSession
+        self.lock = threading.Lock()
+        self.running = True
+
+        if os.path.exists(socket_path):
+            os.remove(socket_path) # Left over from crashed app with same pid.
+        self.listen_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listen_socket.bind(socket_path)
+        self.listen_socket.listen(16)
+        self.listen_socket.setblocking(False)
+
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.listen_socket, selectors.EVENT_READ, None)
+
+    def run(self):
+        buffers = {} # conn -> received bytes not yet ending with newline
+        conn_sessions = {} # conn -> session_id
+
+        while self.running == True:
+            for key, events in self.selector.select(timeout=0.5):
+                if key.fileobj is self.listen_socket:
+                    try:
+                        conn, addr = self.listen_socket.accept()
+                    except OSError:
+                        continue
+                    conn.setblocking(False)
+                    self.selector.register(conn, selectors.EVENT_READ, None)
+                    buffers[conn] = b""
+                    continue
+
+                conn = key.fileobj
+                try:
+                    data = conn.recv(4096)
+                except OSError:
+                    data = b""
+
+                if len(data) == 0:
+                    self._connection_closed(conn, conn_sessions.pop(conn, None))
+                    buffers.pop(conn, None)
+                    continue
+
+                lines = (buffers[conn] + data).split(b"\n")
+                buffers[conn] = lines.pop()
+                for line in lines:
+                    self._handle_message(conn, conn_sessions, line.decode("utf-8"))
+
+        self.selector.close()
+        self.listen_socket.close()
+        for conn in buffers:
+            conn.close()
+        try:
+            os.remove(self.socket_path)
+        except OSError:
+            pass
+
+    def _handle_message(self, conn, conn_sessions, line):
+        msg_type, sep, msg = line.partition(" ")
+
+        if msg_type == _SESSION_MSG:
+            conn_sessions[conn] = msg
+            with self.lock:
+                session = self._get_session(msg)
+                session.conn = conn
+                if session.abort_pending == True:
+                    self._send(session, _ABORT_MSG)
+            return
+
+        session_id = conn_sessions.get(conn)
+        if session_id == None:
+            return
+
+        with self.lock:
+            session = self._get_session(session_id)
+            if msg_type == _STATUS_MSG:
+                session.status_msg = msg
+            elif msg_type == _COMPLETED_MSG:
+                session.completed = True
+
+        if self.message_listener != None:
+            self.message_listener(session_id, msg_type)
+
+    def _connection_closed(self, conn, session_id):
+        try:
+            self.selector.unregister(conn)
+        except (KeyError, ValueError):
+            pass
+        conn.close()
+
+        if session_id == None:
+            return
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session != None and session.conn is conn:
+                session.conn = None
+
+    def _get_session(self, session_id):
+        try:
+            return self.sessions[session_id]
+        except KeyError:
+            session = ChannelSession()
+            self.sessions[session_id] = session
+            return session
+
+    def _send(self, session, msg):
+        try:
+            session.conn.sendall((msg + "\n").encode("utf-8"))
+        except OSError:
+            pass # Render process sees closed connection and falls back to message files.
+
+    def get_session_completed(self, session_id):
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session == None:
+                return (False, False)
+            return (session.completed, session.conn != None)
+
+    def get_session_status_message(self, session_id):
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session == None:
+                return (None, False)
+            return (session.status_msg, session.conn != None)
+
+    def abort_session(self, session_id):
+        with self.lock:
+            session = self._get_session(session_id)
+            if session.conn != None:
+                self._send(session, _ABORT_MSG)
+            else:
+                session.abort_pending = True # Render process may not have connected yet.
+
+    def remove_session(self, session_id):
+        with self.lock:
+            self.sessions.pop(session_id, None)
+
+    def shutdown(self):
+        self.running = False
+
+
+class StatusChannelClient:
+
+    def __init__(self, socket_path, session_id):
+        self.connected = False
+        self.abort = False
+        self.lock = threading.Lock()
+
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(socket_path)
+        self.connected = True
+
+        if self.send(_SESSION_MSG + " " + session_id) == False:
+            raise OSError("session message send failed")
+
+        self.reader_thread = threading.Thread(target=self._read_messages)
+        self.reader_thread.daemon = True
+        self.reader_thread.start()
+
+    def send(self, msg):
+        """
+        Returns False if connection is lost and message files should be used.
+        """
+        with self.lock:
+            if self.connected == False:
+                return False
+            try:
+                self.sock.sendall((msg + "\n").encode("utf-8"))
+                return True
+            except OSError:
+                self.connected = False
+                return False
+
+    def _read_messages(self):
+        buffer = b""
+        while True:
+            try:
+                data = self.sock.recv(1024)
+            except OSError:
+                data = b""
+            if len(data) == 0:
+                self.connected = False
+                return
+
+            lines = (buffer + data).split(b"\n")
+            buffer = lines.pop()
+            for line in lines:
+                if line.decode("utf-8") == _ABORT_MSG:
+                    self.abort = True
+
+
 # ---- Debug helper
 def prints_to_log_file(log_file):
     so = se = open(log_file, 'w', buffering=1)
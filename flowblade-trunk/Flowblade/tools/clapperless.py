@@ -25,6 +25,7 @@
 
 import logging, time, struct, subprocess, sys, os, array, argparse
 import tempfile, hashlib, re
+import multiprocessing.pool
 import numpy
 
 import userfolders
@@ -34,6 +35,14 @@ OFFSETS_DATA_FILE_ID_DEFAULT = "idstr_default"
 
 MAGIC_SEPARATOR = "##¤¤%%¤¤##¤¤%%¤¤##"
 
+ENVELOPES_CACHE_DIR = "audio_envelopes/"
+
+# Coarse-to-fine search is only used for envelopes longer than this.
+COARSE_TO_FINE_MIN_SECONDS = 20 * 60
+
+# Approximate bytes used per FFT length unit by rigidalign() and blockwise_align() spectra and correlations.
+FFT_BYTES_PER_SAMPLE = 48
+
 __version__ = "0.99.8"
 
 """
@@ -143,6 +152,127 @@ def rigidalign(reference, targets):
         # Sign reversed to move the target instead of the reference
     return shifts
 
+def decimate(envelope, factor):
+    """
+    Downsample envelope by averaging blocks of factor samples.
+    """
+    n = len(envelope) // factor
+    return numpy.mean(numpy.asarray(envelope[:n * factor]).reshape((n, factor)), 1)
+
+
+def coarse_to_fine_align(reference, targets, factor):
+    """
+    Estimate the relative shift between reference and targets like rigidalign()
+    by first aligning envelopes decimated by factor and then searching
+    the full rate cross-correlation only in a window around the coarse shift.
+
+    @returns: Same shifts as rigidalign().
+    @rtype: Sequence(Number)
+    """
+    coarse_shifts = rigidalign(decimate(reference, factor),
+                               [decimate(t, factor) for t in targets])
+
+    reference = numpy.asarray(reference) - numpy.mean(reference)
+    window = 2 * factor
+    shifts = []
+    for t, coarse_shift in zip(targets, coarse_shifts):
+        t = numpy.asarray(t) - numpy.mean(t)
+        # rigidalign() returns -k where k maximizes sum(reference[n] * t[n + k])
+        center = int(round(-coarse_shift * factor))
+        lags = range(center - window - 1, center + window + 2)
+        xcorr = numpy.array([_lag_dot(reference, t, k) for k in lags])
+        i = int(numpy.argmax(xcorr[1:-1])) + 1
+        subsample_shift = submax(xcorr[i - 1], xcorr[i], xcorr[i + 1])
+        shifts.append(-(lags[i] + subsample_shift))
+    return shifts
+
+
+def blockwise_align(reference, targets, max_lag, max_memory):
+    """
+    Estimate the relative shift between reference and targets like rigidalign()
+    for shifts in range [-max_lag, max_lag] using block-wise overlap-save cross-correlation.
+
+    Reference is correlated in blocks against the target segments they can overlap
+    with the allowed shifts, so FFT size depends on max_lag and max_memory and not on input lengths.
+
+    @returns: Same shifts as rigidalign().
+    @rtype: Sequence(Number)
+    """
+    lags_count = 2 * max_lag + 1
+    L = nextpow2(max(4 * max_lag, 1024))
+    while L * 2 * FFT_BYTES_PER_SAMPLE <= max_memory:
+        L *= 2
+    block_size = L - 2 * max_lag
+
+    reference = numpy.asarray(reference) - numpy.mean(reference)
+    shifts = []
+    for t in targets:
+        t = numpy.asarray(t) - numpy.mean(t)
+        xcorr = numpy.zeros(lags_count)
+        for start in range(0, len(reference), block_size):
+            r_block = reference[start:start + block_size]
+            # Target samples start - max_lag ... start + len(r_block) + max_lag, zeros outside target.
+            seg = numpy.zeros(len(r_block) + 2 * max_lag)
+            seg_start = start - max_lag
+            t_in = max(seg_start, 0)
+            t_out = min(seg_start + len(seg), len(t))
+            if t_out <= t_in:
+                continue
+            seg[t_in - seg_start:t_out - seg_start] = t[t_in:t_out]
+            # c[m] = sum(r_block[n] * seg[n + m]), m = k + max_lag, no wrap around because L >= len(seg).
+            c = numpy.fft.irfft(numpy.fft.rfft(r_block, L).conj() * numpy.fft.rfft(seg, L), L)
+            xcorr += c[:lags_count]
+
+        i = int(numpy.argmax(xcorr))
+        if 0 < i < lags_count - 1:
+            subsample_shift = submax(xcorr[i - 1], xcorr[i], xcorr[i + 1])
+        else:
+            subsample_shift = 0.0 # Max at search range edge.
+        shifts.append(-(i - max_lag + subsample_shift))
+    return shifts
+
+
+def align(reference, targets, args):
+    """
+    Selects alignment method for args and estimated memory use.
+
+    @returns: Same shifts as rigidalign().
+    @rtype: Sequence(Number)
+    """
+    max_memory = args.max_memory * 1024 * 1024
+
+    if args.max_lag > 0:
+        logging.info("blockwise alignment with max lag %d seconds" % args.max_lag)
+        return blockwise_align(reference, targets, int(args.max_lag * args.rate), max_memory)
+
+    L = nextpow2(len(reference) + max(len(t) for t in targets) - 1)
+    if L * FFT_BYTES_PER_SAMPLE > max_memory:
+        # Full length FFT would exceed memory ceiling, coarse pass is done at rate that fits.
+        factor = nextpow2(int(L * FFT_BYTES_PER_SAMPLE / max_memory) + 1)
+        factor = max(factor, args.coarse_factor)
+        logging.info("coarse-to-fine alignment with factor %d for memory ceiling" % factor)
+        return coarse_to_fine_align(reference, targets, factor)
+
+    if args.coarse_factor > 1 and len(reference) > COARSE_TO_FINE_MIN_SECONDS * args.rate:
+        return coarse_to_fine_align(reference, targets, args.coarse_factor)
+
+    return rigidalign(reference, targets)
+
+
+def _lag_dot(reference, t, k):
+    # sum(reference[n] * t[n + k]) over samples where both exist.
+    if k >= 0:
+        n = min(len(reference), len(t) - k)
+        if n <= 0:
+            return 0.0
+        return float(numpy.dot(reference[:n], t[k:k + n]))
+    else:
+        n = min(len(reference) + k, len(t))
+        if n <= 0:
+            return 0.0
+        return float(numpy.dot(reference[-k:-k + n], t[:n]))
+
+
 class Envelope:
     
     def __init__(self, filename, args):
@@ -252,11 +382,11 @@ class Envelope:
                 data = data[:(fframes * blocksize * framesize)]
             sec +=1
             sys.stderr.write(time.strftime('\r%H:%M:%S', time.gmtime(sec)))
-            a = array.array('h', data)
-            a_abs =  numpy.abs(a)
+            # Only one second of samples is held at a time, envelope grows as packed floats.
+            a_abs = numpy.abs(numpy.frombuffer(data, dtype=numpy.int16).astype(numpy.float32))
             a_abs.shape = (fframes, blocksize)
-            a_mean = numpy.mean(a_abs, 1)
-            self.envelope.extend(a_mean)
+            a_mean = numpy.mean(a_abs, 1, dtype=numpy.float32)
+            self.envelope.frombytes(a_mean.tobytes())
         sys.stderr.write('\n')
 
         fframes = len(self.envelope)
@@ -269,8 +399,15 @@ class Envelope:
             self.write_cache()
             
     def read_cache(self, name):
-        hash = "%s-%s" % (os.path.basename(sys.argv[0]),
-                          hashlib.md5(name.encode('utf-8')).hexdigest())
+        # Cache files are keyed by file name, size, mtime and rate so changed files are decoded again.
+        try:
+            st = os.stat(self.filename)
+            file_key = "%d-%d-%d" % (st.st_size, st.st_mtime_ns, self.args.rate)
+        except OSError:
+            file_key = str(self.args.rate)
+        self.cache_prefix = "%s-%s-" % (os.path.basename(sys.argv[0]),
+                                        hashlib.md5(name.encode('utf-8')).hexdigest())
+        hash = self.cache_prefix + hashlib.md5(file_key.encode('utf-8')).hexdigest()
         self.cachename = os.path.join(self.args.cache_dir[0], hash)
         if os.access(self.cachename, os.R_OK):
             #size = os.stat(self.cachename)[stat.ST_SIZE] / 4
@@ -289,6 +426,10 @@ class Envelope:
         # cachename is still calculated by search... 
         logging.debug("write to cachefile: %s" % self.cachename)
         if os.path.isdir(self.args.cache_dir[0]):
+            # Drop envelopes cached for earlier versions of the file.
+            for cache_file in os.listdir(self.args.cache_dir[0]):
+                if cache_file.startswith(self.cache_prefix):
+                    os.remove(os.path.join(self.args.cache_dir[0], cache_file))
             f = open(self.cachename, 'wb')
             f.write(struct.pack('L', len(self.envelope)))
             self.envelope.tofile(f)
@@ -320,6 +461,14 @@ def cl_parser():
     parser.add_argument('-c', '--use-cache', action='store_true')
     parser.add_argument('--cache-dir', nargs=1,default=[tempfile.gettempdir()],
                         help="default: %s" % tempfile.gettempdir())
+    parser.add_argument('-b', '--batch', action='store_true',
+        help="decode all files in parallel and use persistent envelope cache")
+    parser.add_argument('--coarse-factor', default=0, type=int,
+        help="decimation factor for coarse-to-fine search of long files, 0 disables [default: 0]")
+    parser.add_argument('--max-lag', default=0, type=float,
+        help="limit offset search to +-seconds using block-wise correlation, 0 searches all offsets [default: 0]")
+    parser.add_argument('--max-memory', default=256, type=int,
+        help="memory ceiling in MB for correlation spectra [default: 256]")
     parser.add_argument('-d', '--debug', action='store_true')
     parser.add_argument('-V','--version',version=__version__, action='version') 
     args = parser.parse_args()
@@ -327,12 +476,20 @@ def cl_parser():
     return args
 
 def process_files(args):
-    envelopes = [Envelope(n, args) for n in args.files]
+    if args.batch:
+        # Files are decoded by ffmpeg processes, threads only wait for and reduce their output.
+        workers = min(len(args.files), max(multiprocessing.cpu_count() - 2, 1), 8)
+        pool = multiprocessing.pool.ThreadPool(workers)
+        envelopes = pool.map(lambda n: Envelope(n, args), args.files)
+        pool.close()
+        pool.join()
+    else:
+        envelopes = [Envelope(n, args) for n in args.files]
     reference = envelopes[0].envelope
 
     envelopes_envelope = list([x.envelope for x in envelopes])
     logging.info("calculate offsets...")
-    offsets = rigidalign(reference, envelopes_envelope)
+    offsets = align(reference, envelopes_envelope, args)
     logging.debug("got offsets: %s" % offsets) 
 
     for n in range(len(offsets)):
@@ -348,7 +505,15 @@ def process_files(args):
 def main():
     args = cl_parser()
     print(args.idstr)
-    
+
+    userfolders.init()
+
+    if args.batch:
+        args.use_cache = True
+        args.cache_dir = [userfolders.get_cache_dir() + ENVELOPES_CACHE_DIR]
+        if not os.path.isdir(args.cache_dir[0]):
+            os.makedirs(args.cache_dir[0])
+
     offsets_output = process_files(args)
 
     # Write out offsets data
@@ -356,8 +521,7 @@ def main():
     for file_offset in offsets_output:
         f, offset = file_offset
         out_str = out_str + f + MAGIC_SEPARATOR + str(offset) + "\n"
-    
-    userfolders.init()
+
     output_file = userfolders.get_cache_dir() + OFFSETS_DATA_FILE + "_"+ args.idstr
 
     f = open(output_file, 'w')
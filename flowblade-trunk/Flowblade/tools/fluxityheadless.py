@@ -39,17 +39,13 @@ import time
 
 import appconsts
 import ccrutils
-import editorstate
-import editorpersistance
 import fluxity
-import mltinit
+import mltheadlessutils
 import mltprofiles
 import processutils
 import renderconsumer
-import respaths
 import toolsencoding
 import translations
-import userfolders
 import utils
 
 
@@ -90,20 +86,10 @@ def abort_render(session_id):
 # --------------------------------------------------- render process
 def main(root_path, session_id, script, range_in, range_out, profile_desc):
 
-    try:
-        editorstate.mlt_version = mlt.LIBMLT_VERSION
-    except:
-        editorstate.mlt_version = "0.0.99" # magic string for "not found"
-
-    # Set paths.
-    respaths.set_paths(root_path)
-
-    userfolders.init()
-    editorpersistance.load()
-
-    repo = mltinit.init_with_translations()
+    mltheadlessutils.init_env(root_path)
     
     ccrutils.init_session_folders(session_id)
+    ccrutils.connect_status_channel(session_id)
     
     ccrutils.load_render_data()
     render_data = ccrutils.get_render_data()
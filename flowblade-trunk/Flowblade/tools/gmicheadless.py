@@ -42,14 +42,13 @@ import ccrutils
 import editorstate
 import editorpersistance
 import gmicplayer
-import mltinit
+import gmicstreamrenderer
+import mltheadlessutils
 import mltprofiles
 import processutils
 import renderconsumer
-import respaths
 import toolsencoding
 import translations
-import userfolders
 import utils
 
 
@@ -91,13 +90,7 @@ def main(root_path, session_id, script, clip_path, range_in, range_out, profile_
     
     os.nice(10) # make user configurable
 
-    try:
-        editorstate.mlt_version = mlt.LIBMLT_VERSION
-    except:
-        editorstate.mlt_version = "0.0.99" # magic string for "not found"
-
-    # Set paths.
-    respaths.set_paths(root_path)
+    mltheadlessutils.init_env(root_path)
 
     if os.path.exists("/usr/bin/gmic") == True: # distro install an dev.
         editorstate.gmic_path = "/usr/bin/gmic"
@@ -105,13 +98,9 @@ def main(root_path, session_id, script, clip_path, range_in, range_out, profile_
         editorstate.gmic_path = "/app/bin/gmic"
     else:
         print("No G'Mic in gmicheadless main(), something is wrong.") # Should not be possible
-
-    userfolders.init()
-    editorpersistance.load()
-
-    repo = mltinit.init_with_translations()
     
     ccrutils.init_session_folders(session_id)
+    ccrutils.connect_status_channel(session_id)
     
     ccrutils.load_render_data()
     render_data = ccrutils.get_render_data()
@@ -167,7 +156,15 @@ class GMicHeadlessRunnerThread(threading.Thread):
         for frame_file in os.listdir(rendered_frames_folder):
             file_path = os.path.join(rendered_frames_folder, frame_file)
             os.remove(file_path)
-            
+
+        # Try to render video by streaming frames through pipes, frame files are only written if that is not possible or fails.
+        if self.render_data.do_video_render == True and editorpersistance.prefs.gmic_stream_render == True:
+            if self.stream_render(profile) == True:
+                ccrutils.write_completed_message()
+                return
+            if self.abort == True:
+                return
+
         self.frames_range_writer = gmicplayer.FramesRangeWriter(self.clip_path, self.frames_update, profile)
         self.frames_range_writer.write_frames(clip_frames_folder + "/", frame_name, self.range_in, self.range_out)
 
@@ -202,12 +199,8 @@ class GMicHeadlessRunnerThread(threading.Thread):
             # Render consumer
             args_vals_list = toolsencoding.get_args_vals_list_for_render_data(self.render_data)
             profile = mltprofiles.get_profile_for_index(self.render_data.profile_index) 
-            
-            if self.render_data.save_internally == True:
-                file_path = ccrutils.session_folder() +  "/" + appconsts.CONTAINER_CLIP_VIDEO_CLIP_NAME + self.render_data.file_extension
-            else:
-                file_path = self.render_data.render_dir +  "/" + self.render_data.file_name + self.render_data.file_extension
-        
+
+            file_path = self.get_video_file_path()
             consumer = renderconsumer.get_mlt_render_consumer(file_path, profile, args_vals_list)
             
             # Render producer
@@ -241,6 +234,38 @@ class GMicHeadlessRunnerThread(threading.Thread):
         # Write out completed flag file.
         ccrutils.write_completed_message()
 
+    def stream_render(self, profile):
+        """
+        Returns True if video was rendered.
+        """
+        args_vals_list = toolsencoding.get_args_vals_list_for_render_data(self.render_data)
+        render_profile = mltprofiles.get_profile_for_index(self.render_data.profile_index)
+        # Frames are not rescaled or rate converted when streaming.
+        if render_profile.description() != profile.description():
+            return False
+        if gmicstreamrenderer.can_stream_render(args_vals_list) == False:
+            return False
+
+        script_file = open(self.script_path)
+        user_script = script_file.read()
+        script_file.close()
+
+        self.script_renderer = gmicstreamrenderer.StreamingScriptRenderer(  self.clip_path,
+                                                                            profile,
+                                                                            user_script,
+                                                                            self.range_in,
+                                                                            self.range_out,
+                                                                            self.get_video_file_path(),
+                                                                            args_vals_list,
+                                                                            self.script_render_update_callback)
+        return self.script_renderer.render()
+
+    def get_video_file_path(self):
+        if self.render_data.save_internally == True:
+            return ccrutils.session_folder() +  "/" + appconsts.CONTAINER_CLIP_VIDEO_CLIP_NAME + self.render_data.file_extension
+        else:
+            return self.render_data.render_dir +  "/" + self.render_data.file_name + self.render_data.file_extension
+
     def abort_requested(self):
         self.abort = ccrutils.abort_requested()
         return self.abort
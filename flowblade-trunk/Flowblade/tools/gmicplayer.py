@@ -27,14 +27,18 @@ try:
     import mlt7 as mlt
 except:
     import mlt
+import multiprocessing
 import os
 from os import listdir
 from os.path import isfile, join
+import queue
 import re
 import sys
 import subprocess
+import threading
 import time
 
+import editorpersistance
 import editorstate
 import mltprofiles
 import userfolders
@@ -43,6 +47,8 @@ import utils
 TICKER_DELAY = 0.25
 RENDER_TICKER_DELAY = 0.05
 
+SCRIPT_RENDER_MAX_BATCH_FRAMES = 8 # Frames rendered with one gmic process.
+
 _current_profile = None
 
 def set_current_profile(clip_path):
@@ -348,9 +354,14 @@ class FolderFramesInfo:
 
 
 class FolderFramesScriptRenderer:
+    """
+    Renders all frames in folder with G'MIC script.
 
+    First frame is rendered alone to get shell output for error checking, rest of the frames are rendered
+    in batches of frames with one gmic process per batch by a pool of worker threads running gmic processes in parallel.
+    """
     def __init__(   self, user_script, folder, out_folder, frame_name, update_callback, 
-                    render_output_callback, nice=0, re_render_existing=True, out_frame_offset=0):
+                    render_output_callback, nice=0, re_render_existing=True, out_frame_offset=0, workers=0):
         self.user_script = user_script
         self.folder = folder
         self.out_folder = out_folder
@@ -360,57 +371,156 @@ class FolderFramesScriptRenderer:
         self.nice = nice # Not used currently, but if we find a way to set this it is good to have it here available, so keeping this for now.
         self.re_render_existing = re_render_existing
         self.out_frame_offset = out_frame_offset
+        self.workers = workers # 0 means that workers count is decided from prefs and available cores.
 
         self.abort = False
+        
+        self.processes = []
+        self.processes_lock = threading.Lock()
 
     def write_frames(self):
-        clip_frames = os.listdir(self.folder)
+        clip_frames = sorted(os.listdir(self.folder))
 
-        frame_count = 1
+        # Collect frames to render, frames with existing rendered files are counted as done.
+        render_frames = []
+        frame_count = 0
         for clip_frame in clip_frames:
-
-            if self.abort == True:
-                return
-            
-            self.do_update_callback(frame_count)
-
             file_numbers_list = re.findall(r'\d+', clip_frame)
             filled_number_str = str(int(file_numbers_list[0]) + self.out_frame_offset).zfill(4)
 
             clip_frame_path = str(os.path.join(self.folder, clip_frame))
             rendered_file_path = str(self.out_folder + self.frame_name + "_" + filled_number_str + ".png")
-            
-            # Create command list and launch process.
-            command_list = [editorstate.gmic_path, clip_frame_path]
-            user_script_commands = self.user_script.split(" ")
+
+            if self.re_render_existing == False and os.path.exists(rendered_file_path) == True:
+                frame_count = frame_count + 1
+                continue
+
+            render_frames.append((clip_frame_path, rendered_file_path))
+
+        if len(render_frames) == 0:
+            return
+
+        # First frame displays shell output and does error checking.
+        if self.abort == True:
+            return
+        self.do_update_callback(frame_count + 1)
+
+        FLOG = open(userfolders.get_cache_dir() + "log_gmic_preview", 'w')
+        p = subprocess.Popen(self.get_command_list(render_frames[0:1]), stdin=FLOG, stdout=FLOG, stderr=FLOG)
+        p.wait()
+        FLOG.close()
+
+        # read log
+        f = open(userfolders.get_cache_dir() + "log_gmic_preview", 'r')
+        out = f.read()
+        f.close()
+
+        self.do_render_output_callback(p, out)
+        frame_count = frame_count + 1
+
+        # Render rest of the frames in parallel batches.
+        render_frames = render_frames[1:]
+        if len(render_frames) == 0:
+            return
+
+        workers = self.get_workers_count()
+        batch_size = max(1, min(SCRIPT_RENDER_MAX_BATCH_FRAMES, len(render_frames) // (workers * 2)))
+        batches_queue = queue.Queue()
+        batches_count = 0
+        for i in range(0, len(render_frames), batch_size):
+            batches_queue.put(render_frames[i:i + batch_size])
+            batches_count += 1
+
+        results_queue = queue.Queue()
+        worker_threads = []
+        for i in range(0, min(workers, batches_count)):
+            worker_thread = threading.Thread(target=self._render_batches, args=(batches_queue, results_queue))
+            worker_thread.start()
+            worker_threads.append(worker_thread)
+
+        # Progress updates are done from this thread like when rendering sequentially.
+        for i in range(0, batches_count):
+            frame_count = frame_count + results_queue.get()
+            if self.abort == True:
+                break
+            self.do_update_callback(frame_count)
+
+        if self.abort == True:
+            self._kill_processes()
+
+        for worker_thread in worker_threads:
+            worker_thread.join()
+
+    def _render_batches(self, batches_queue, results_queue):
+        while True:
+            try:
+                batch = batches_queue.get_nowait()
+            except queue.Empty:
+                return
+
+            if self.abort == False:
+                self._render_batch(batch)
+            results_queue.put(len(batch))
+
+    def _render_batch(self, batch):
+        return_code = self._run_gmic(self.get_command_list(batch))
+        if return_code == 0 or len(batch) == 1:
+            return
+
+        # Script fails with chained frames, render batch frames one at a time.
+        for frame_data in batch:
+            if self.abort == True:
+                return
+            self._run_gmic(self.get_command_list([frame_data]))
+
+    def _run_gmic(self, command_list):
+        with self.processes_lock:
+            if self.abort == True:
+                return -1
+            p = subprocess.Popen(command_list, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            self.processes.append(p)
+
+        p.wait()
+
+        with self.processes_lock:
+            self.processes.remove(p)
+
+        return p.returncode
+
+    def _kill_processes(self):
+        with self.processes_lock:
+            for p in self.processes:
+                p.kill()
+
+    def get_command_list(self, frames):
+        """
+        Returns command list that renders frames with one gmic process.
+        Image list is cleared between frames, so script is applied to each frame like in a separate gmic process.
+        """
+        command_list = [editorstate.gmic_path]
+        user_script_commands = self.user_script.split(" ")
+        for i in range(0, len(frames)):
+            clip_frame_path, rendered_file_path = frames[i]
+            if i > 0:
+                command_list.append("-remove")
+            command_list.append(clip_frame_path)
             command_list.extend(user_script_commands)
             command_list.append("-output")
             command_list.append(rendered_file_path)
 
-            if self.re_render_existing == False:
-                if os.path.exists(rendered_file_path) == True:
-                    frame_count = frame_count + 1
-                    continue
-
-            if frame_count == 1: # first frame displays shell output and does error checking
-                FLOG = open(userfolders.get_cache_dir() + "log_gmic_preview", 'w')
-                p = subprocess.Popen(command_list, stdin=FLOG, stdout=FLOG, stderr=FLOG)
-                p.wait()
-                FLOG.close()
- 
-                # read log
-                f = open(userfolders.get_cache_dir() + "log_gmic_preview", 'r')
-                out = f.read()
-                f.close()
-
-                self.do_render_output_callback(p, out)
-            else:
-                FLOG = open(userfolders.get_cache_dir() + "log_gmic_preview", 'w')
-                p = subprocess.Popen(command_list, stdin=FLOG, stdout=FLOG, stderr=FLOG)
-                p.wait()
-                FLOG.close()
+        return command_list
 
-            frame_count = frame_count + 1
+    def get_workers_count(self):
+        workers = self.workers
+        if workers <= 0:
+            try:
+                workers = editorpersistance.prefs.gmic_render_workers
+            except AttributeError:
+                workers = 0 # Prefs not loaded.
+        if workers <= 0:
+            # Same heuristics as used for Fluxity rendering, leave some cores free and cap at 8.
+            workers = min(max(multiprocessing.cpu_count() - 2, 1), 8)
+        return workers
 
     def do_update_callback(self, frame_count):
         self.update_callback(frame_count)
@@ -420,6 +530,7 @@ class FolderFramesScriptRenderer:
 
     def abort_rendering(self):
         self.abort = True
+        self._kill_processes()
 
 
 # ---- Debug helper
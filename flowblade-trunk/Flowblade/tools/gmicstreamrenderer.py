@@ -0,0 +1,384 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Renders video clip frames range with G'MIC script by streaming frames through pipes.
+
+MLT decoded frames are put into bounded queue, worker threads pipe batches of frames through gmic processes
+as CImg lists and encoder writes processed frames in order as raw video into ffmpeg process.
+Only the final encoded clip is written to disk.
+"""
+
+try:
+    import mlt7 as mlt
+except:
+    import mlt
+import multiprocessing
+import queue
+import subprocess
+import threading
+
+import numpy as np
+
+import editorpersistance
+import editorstate
+
+BATCH_FRAMES = 4
+QUEUED_BATCHES_PER_WORKER = 2
+
+# MLT avformat consumer properties that are passed to ffmpeg encoder, MLT name -> ffmpeg command line option.
+# Other properties are MLT only, audio or frame size options or options that current ffmpeg versions reject.
+_FFMPEG_ARGS = {"f":"f", "vcodec":"c:v", "b":"b:v", "vb":"b:v", "minrate":"minrate", "maxrate":"maxrate", "bufsize":"bufsize",
+                "crf":"crf", "cq":"cq", "qmin":"qmin", "qmax":"qmax", "qdiff":"qdiff", "qcomp":"qcomp", "qscale":"q:v",
+                "g":"g", "bf":"bf", "refs":"refs", "preset":"preset", "tune":"tune", "vprofile":"profile:v", "level":"level",
+                "pix_fmt":"pix_fmt", "movflags":"movflags", "threads":"threads", "slices":"slices", "trellis":"trellis",
+                "coder":"coder", "x264opts":"x264opts", "x264-params":"x264-params", "x265-params":"x265-params",
+                "quality":"quality", "speed":"speed", "row-mt":"row-mt", "tile-columns":"tile-columns",
+                "auto-alt-ref":"auto-alt-ref", "lag-in-frames":"lag-in-frames", "rc":"rc", "b_ref_mode":"b_ref_mode",
+                "temporal-aq":"temporal-aq", "vendor":"vendor", "slicecrc":"slicecrc"}
+
+# Pixel format name prefixes of formats with alpha channel.
+_ALPHA_PIX_FMT_PREFIXES = ("yuva", "rgba", "bgra", "argb", "abgr", "gbrap", "ya8", "ya16")
+
+
+class StreamRenderError(Exception):
+
+    def __init__(self, value):
+        self.value = value
+    def __str__(self):
+        return repr(self.value)
+
+
+def can_stream_render(args_vals_list):
+    """
+    Encodings that turn video off cannot be rendered from raw video input and
+    G'MIC output is piped to encoder as rgb24 so alpha channel would be lost.
+    Encoders needing hardware upload filters cannot be used either.
+    """
+    for arg, val in args_vals_list:
+        if arg == "video_off" or arg == "vn":
+            return False
+        if arg == "mlt_image_format" and str(val) == "rgb24a":
+            return False
+        if arg == "pix_fmt" and str(val).startswith(_ALPHA_PIX_FMT_PREFIXES):
+            return False
+        if arg == "vcodec" and str(val).endswith("_vaapi"):
+            return False
+        if arg == "vf":
+            return False
+    return True
+
+
+class StreamingScriptRenderer:
+
+    def __init__(self, clip_path, profile, user_script, mark_in, mark_out, file_path, args_vals_list, update_callback, workers=0):
+        self.clip_path = clip_path
+        self.profile = profile
+        self.user_script = user_script
+        self.mark_in = mark_in
+        self.mark_out = mark_out
+        self.length = mark_out - mark_in + 1
+        self.file_path = file_path
+        self.args_vals_list = args_vals_list
+        self.update_callback = update_callback
+        self.workers = workers
+
+        self.width = profile.width()
+        self.height = profile.height()
+
+        self.abort = False
+        self.error = None
+
+        self.processes = []
+        self.processes_lock = threading.Lock()
+
+    def render(self):
+        """
+        Returns True if clip was rendered, False if rendering failed or was aborted.
+        """
+        workers = self.get_workers_count()
+
+        self.frames_queue = queue.Queue(maxsize=workers * BATCH_FRAMES * QUEUED_BATCHES_PER_WORKER)
+        self.done_frames = {} # frame index -> processed frame bytes, filled out of order by workers.
+        self.done_frames_max = workers * BATCH_FRAMES * QUEUED_BATCHES_PER_WORKER
+        self.next_frame_index = 0
+        self.done_condition = threading.Condition()
+
+        encoder = self._launch_process(self.get_encoder_command_list(), subprocess.PIPE, subprocess.DEVNULL)
+        if encoder == None:
+            return False
+
+        decode_thread = threading.Thread(target=self._decode_frames, args=(workers,))
+        decode_thread.start()
+
+        worker_threads = []
+        for i in range(0, workers):
+            worker_thread = threading.Thread(target=self._process_frames)
+            worker_thread.start()
+            worker_threads.append(worker_thread)
+
+        # Write processed frames in order into encoder.
+        try:
+            for frame_index in range(0, self.length):
+                with self.done_condition:
+                    while frame_index not in self.done_frames and self.abort == False and self.error == None:
+                        self.done_condition.wait(0.5)
+                    if self.abort == True or self.error != None:
+                        break
+                    frame_data = self.done_frames.pop(frame_index)
+                    self.next_frame_index = frame_index + 1
+                    self.done_condition.notify_all()
+
+                encoder.stdin.write(frame_data)
+                self.update_callback(frame_index + 1)
+        except OSError as e:
+            self._set_error("encoder write failed: " + str(e))
+
+        if self.abort == True or self.error != None:
+            self._kill_processes()
+
+        try:
+            encoder.stdin.close()
+        except OSError:
+            pass
+        encoder.wait()
+
+        # Unblock decode thread if it is waiting on full queue, this may also take end markers so they are added again.
+        while decode_thread.is_alive():
+            try:
+                self.frames_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        decode_thread.join()
+        for i in range(0, workers):
+            try:
+                self.frames_queue.put_nowait(None)
+            except queue.Full:
+                break
+        for worker_thread in worker_threads:
+            worker_thread.join()
+
+        if self.error == None and self.abort == False and encoder.returncode != 0:
+            self._set_error("encoder return code " + str(encoder.returncode))
+
+        if self.error != None:
+            print("G'MIC stream render failed:", self.error)
+
+        return (self.error == None and self.abort == False)
+
+    def abort_rendering(self):
+        self.abort = True
+        self._kill_processes()
+
+    # --------------------------------------------------- decode
+    def _decode_frames(self, workers):
+        try:
+            producer = mlt.Producer(self.profile, str(self.clip_path))
+            frame_producer = producer.cut(self.mark_in, self.mark_out)
+            frame_producer.set_speed(0)
+            for frame_index in range(0, self.length):
+                if self.abort == True or self.error != None:
+                    break
+                frame_producer.seek(frame_index)
+                frame = frame_producer.get_frame()
+                frame.set("consumer_deinterlace", 1)
+                rgba = frame.get_image(int(mlt.mlt_image_rgba), int(self.width), int(self.height))
+                image = np.frombuffer(rgba, dtype=np.uint8).reshape((self.height, self.width, 4))[:, :, 0:3]
+                self.frames_queue.put((frame_index, image))
+        except Exception as e:
+            self._set_error("decode failed: " + str(e))
+
+        # End markers for workers.
+        for i in range(0, workers):
+            self.frames_queue.put(None)
+
+    # --------------------------------------------------- gmic processing
+    def _process_frames(self):
+        end_reached = False
+        while end_reached == False:
+            batch = []
+            while len(batch) < BATCH_FRAMES:
+                item = self.frames_queue.get()
+                if item == None:
+                    end_reached = True
+                    break
+                batch.append(item)
+                if self.frames_queue.empty():
+                    break # Don't wait for full batch if decoding is slower than processing.
+
+            if len(batch) == 0 or self.abort == True or self.error != None:
+                continue
+
+            try:
+                processed_frames = self._process_batch(batch)
+            except StreamRenderError as e:
+                self._set_error(str(e))
+                continue
+
+            with self.done_condition:
+                # Keep processed frames waiting for encoder bounded, batch with next frame for encoder is never held back.
+                while (len(self.done_frames) >= self.done_frames_max and batch[0][0] > self.next_frame_index
+                        and self.abort == False and self.error == None):
+                    self.done_condition.wait(0.5)
+                for i in range(0, len(batch)):
+                    frame_index, image = batch[i]
+                    self.done_frames[frame_index] = processed_frames[i]
+                self.done_condition.notify_all()
+
+    def _process_batch(self, batch):
+        """
+        Returns list of processed frames as rgb24 bytes.
+        """
+        p = self._launch_process(self.get_gmic_command_list(), subprocess.PIPE, subprocess.PIPE)
+        if p == None:
+            raise StreamRenderError("gmic launch failed or aborted")
+
+        # Writing is done in separate thread, gmic may start writing output before reading all input.
+        input_thread = threading.Thread(target=self._write_cimg_list, args=(p, [image for frame_index, image in batch]))
+        input_thread.start()
+        out_data = p.stdout.read()
+        p.wait()
+        input_thread.join()
+        self._remove_process(p)
+
+        if p.returncode != 0:
+            raise StreamRenderError("gmic return code " + str(p.returncode))
+
+        images = _parse_cimg_list(out_data)
+        if len(images) != len(batch):
+            raise StreamRenderError("gmic script changed images count")
+
+        processed_frames = []
+        for image in images:
+            processed_frames.append(self._get_rgb24_bytes(image))
+        return processed_frames
+
+    def _write_cimg_list(self, p, images):
+        try:
+            p.stdin.write((str(len(images)) + " uint8 little_endian\n").encode("ascii"))
+            for image in images:
+                h, w, s = image.shape
+                p.stdin.write((str(w) + " " + str(h) + " 1 " + str(s) + "\n").encode("ascii"))
+                p.stdin.write(np.ascontiguousarray(image.transpose(2, 0, 1)).tobytes()) # CImg data is planar.
+            p.stdin.close()
+        except OSError:
+            pass # gmic exited, error is detected from return code.
+
+    def _get_rgb24_bytes(self, image):
+        s, h, w = image.shape
+        if w != self.width or h != self.height:
+            raise StreamRenderError("gmic script changed frame size")
+        if s == 1:
+            image = np.repeat(image, 3, axis=0)
+        elif s == 2:
+            image = np.repeat(image[0:1], 3, axis=0)
+        elif s > 3:
+            image = image[0:3]
+        return np.ascontiguousarray(image.transpose(1, 2, 0)).tobytes()
+
+    # --------------------------------------------------- processes
+    def get_gmic_command_list(self):
+        # Script is applied to each image in its own local environment like it would be in a separate gmic process.
+        command_list = [editorstate.gmic_path, "-input", "-.cimg", "-repeat", "$!", "-local[$>]"]
+        command_list.extend(self.user_script.split(" "))
+        command_list.extend(["-endlocal", "-done", "-output", "-.cimg,uchar"])
+        return command_list
+
+    def get_encoder_command_list(self):
+        fps = str(self.profile.frame_rate_num()) + "/" + str(self.profile.frame_rate_den())
+        command_list = ["ffmpeg", "-y", "-loglevel", "error",
+                        "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", str(self.width) + "x" + str(self.height), "-r", fps,
+                        "-i", "-", "-an"]
+        for arg, val in self.args_vals_list:
+            if arg not in _FFMPEG_ARGS:
+                continue
+            command_list.append("-" + _FFMPEG_ARGS[arg])
+            command_list.append(str(val))
+        command_list.append(self.file_path)
+        return command_list
+
+    def _launch_process(self, command_list, stdin, stdout):
+        with self.processes_lock:
+            if self.abort == True:
+                return None
+            try:
+                p = subprocess.Popen(command_list, stdin=stdin, stdout=stdout, stderr=subprocess.DEVNULL)
+            except OSError as e:
+                self.error = "launching " + command_list[0] + " failed: " + str(e)
+                return None
+            self.processes.append(p)
+            return p
+
+    def _remove_process(self, p):
+        with self.processes_lock:
+            self.processes.remove(p)
+
+    def _kill_processes(self):
+        with self.processes_lock:
+            for p in self.processes:
+                p.kill()
+
+    def _set_error(self, error):
+        if self.error == None:
+            self.error = error
+        with self.done_condition:
+            self.done_condition.notify_all()
+
+    def get_workers_count(self):
+        workers = self.workers
+        if workers <= 0:
+            try:
+                workers = editorpersistance.prefs.gmic_render_workers
+            except AttributeError:
+                workers = 0 # Prefs not loaded.
+        if workers <= 0:
+            # Same heuristics as used for Fluxity rendering, leave some cores free and cap at 8.
+            workers = min(max(multiprocessing.cpu_count() - 2, 1), 8)
+        return workers
+
+
+def _parse_cimg_list(data):
+    """
+    Returns list of uint8 arrays with shape (channels, height, width) from .cimg file data.
+    """
+    pos = data.find(b"\n")
+    if pos == -1:
+        raise StreamRenderError("gmic output is not a CImg list")
+    header = data[0:pos].split()
+    if len(header) < 2 or header[1] not in (b"uint8", b"unsigned_char", b"uchar"):
+        raise StreamRenderError("unexpected gmic output header: " + str(header))
+    images_count = int(header[0])
+    pos += 1
+
+    images = []
+    for i in range(0, images_count):
+        line_end = data.find(b"\n", pos)
+        if line_end == -1:
+            raise StreamRenderError("gmic output truncated")
+        dims = data[pos:line_end].split()
+        w, h, d, s = [int(v) for v in dims[0:4]]
+        pos = line_end + 1
+        size = w * h * d * s
+        if d != 1 or len(data) < pos + size:
+            raise StreamRenderError("unsupported or truncated gmic output image")
+        images.append(np.frombuffer(data, dtype=np.uint8, count=size, offset=pos).reshape((s, h, w)))
+        pos += size
+
+    return images
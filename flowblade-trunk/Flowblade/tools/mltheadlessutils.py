@@ -40,10 +40,35 @@ import respaths
 import translations
 import userfolders
 
+_repo = None # Held for the duration of process runtime.
+
 
 def mlt_env_init(root_path, session_id):
     os.nice(10) # make user configurable
 
+    init_env(root_path)
+    
+    ccrutils.init_session_folders(session_id)
+    ccrutils.connect_status_channel(session_id)
+    
+    ccrutils.load_render_data()
+    render_data = ccrutils.get_render_data()
+    
+    # This needs to have render data loaded to know if we are using external folders.
+    ccrutils.maybe_init_external_session_folders()
+    
+    return render_data
+
+def init_env(root_path):
+    """
+    Inits paths, prefs and MLT. Render processes forked by worker server already have
+    these done and only load prefs again because they may have been changed since.
+    """
+    global _repo
+    if _repo != None:
+        editorpersistance.load()
+        return
+
     try:
         editorstate.mlt_version = mlt.LIBMLT_VERSION
     except:
@@ -55,16 +80,6 @@ def mlt_env_init(root_path, session_id):
     userfolders.init()
     editorpersistance.load()
 
-    mltinit.init_with_translations()
-    
-    ccrutils.init_session_folders(session_id)
-    
-    ccrutils.load_render_data()
-    render_data = ccrutils.get_render_data()
-    
-    # This needs to have render data loaded to know if we are using external folders.
-    ccrutils.maybe_init_external_session_folders()
-    
-    return render_data
+    _repo = mltinit.init_with_translations()
 
 
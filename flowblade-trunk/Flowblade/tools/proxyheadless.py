@@ -23,17 +23,23 @@ try:
     import mlt7 as mlt
 except:
     import mlt
+import multiprocessing
 import os
 from PIL import Image
 import threading
 import time
 
+import appconsts
+import atomicfile
 import ccrutils
 import mltheadlessutils
 import mltprofiles
 import renderconsumer
 import userfolders
 
+IMG_SEQ_CHUNK_FRAMES = 16
+IMG_SEQ_FORMAT_FILE = "proxy_format" # Written in proxy frames folder, frames are reused only if format is same.
+
 _render_thread = None
 
 
@@ -143,22 +149,50 @@ class ProxyClipRenderThread(threading.Thread):
             
             listing = glob.glob(self.lookup_path)
             size = self.proxy_w, self.proxy_h
-            done = 0
-            for orig_path in listing:
-                orig_folder, orig_file_name = os.path.split(orig_path)
 
-                try:
-                    im = Image.open(orig_path)
-                    im.thumbnail(size, Image.ANTIALIAS)
-                    im.save(copyfolder + "/" + orig_file_name, "PNG")
-                except IOError:
-                    print("proxy img seq frame failed for '%s'" % orig_path)
-
-                done = done + 1
-            
-                if done % 5 == 0:
+            # Proxy frames format is decided by extension in proxy resource name created by app.
+            name, extension = os.path.splitext(copyfilename.split("?")[0])
+            img_format = "png"
+            for format_name, format_extension in appconsts.IMG_SEQ_PROXY_EXTENSIONS.items():
+                if extension == "." + format_extension:
+                    img_format = format_name
+
+            # Proxy frames from earlier renders can only be kept if they were written in the same format,
+            # frames of other formats are deleted.
+            format_file_path = copyfolder + "/" + IMG_SEQ_FORMAT_FILE
+            keep_existing = (_read_img_seq_format(format_file_path) == img_format)
+            if keep_existing == False:
+                for old_file in os.listdir(copyfolder):
+                    try:
+                        os.remove(copyfolder + "/" + old_file)
+                    except OSError:
+                        pass
+
+            # Frames are distributed to worker processes in chunks, proxy frames have source frame names
+            # with extension of proxy format.
+            chunks = []
+            for i in range(0, len(listing), IMG_SEQ_CHUNK_FRAMES):
+                chunks.append((listing[i:i + IMG_SEQ_CHUNK_FRAMES], copyfolder, size, img_format, extension, keep_existing))
+
+            # Fork context, spawned processes would run the launch script again.
+            pool = multiprocessing.get_context("fork").Pool(_get_img_seq_workers_count())
+            done = 0
+            try:
+                for chunk_frames in pool.imap_unordered(_write_img_seq_proxy_frames, chunks):
+                    self.check_abort_requested()
+                    if self.abort == True:
+                        pool.terminate()
+                        return
+
+                    done = done + chunk_frames
                     fraction = float(done) / float(len(listing))
                     self.render_update(fraction)
+            finally:
+                pool.terminate()
+                pool.join()
+
+            with atomicfile.AtomicFileWriter(format_file_path, "w") as afw:
+                afw.get_file().write(img_format)
 
         # Write out completed flag file.
         ccrutils.write_completed_message()
@@ -172,4 +206,50 @@ class ProxyClipRenderThread(threading.Thread):
         ccrutils.write_status_message(msg)
 
 
+# --------------------------------------------------- img seq proxy workers
+def _get_img_seq_workers_count():
+    # Leave some cores free and cap at 8.
+    return min(max(multiprocessing.cpu_count() - 2, 1), 8)
+
+def _read_img_seq_format(format_file_path):
+    try:
+        with open(format_file_path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
 
+def _write_img_seq_proxy_frames(chunk):
+    """
+    Runs in worker process, returns number of frames handled.
+    """
+    listing, copyfolder, size, img_format, extension, keep_existing = chunk
+    for orig_path in listing:
+        orig_folder, orig_file_name = os.path.split(orig_path)
+        proxy_path = copyfolder + "/" + os.path.splitext(orig_file_name)[0] + extension
+
+        # Proxy frames from earlier renders are kept if source has not changed since.
+        # Frames are written atomically so aborted renders do not leave partial frames to be kept.
+        if keep_existing == True:
+            try:
+                if os.path.getmtime(proxy_path) >= os.path.getmtime(orig_path):
+                    continue
+            except OSError:
+                pass
+
+        try:
+            im = Image.open(orig_path)
+            im.draft("RGB", size) # Lets JPEG decoder downscale while decoding.
+            im.thumbnail(size, Image.LANCZOS)
+            with atomicfile.AtomicFileWriter(proxy_path, "wb") as afw:
+                if img_format == "jpeg":
+                    if im.mode != "RGB":
+                        im = im.convert("RGB")
+                    im.save(afw.get_file(), "JPEG", quality=90)
+                elif img_format == "webp":
+                    im.save(afw.get_file(), "WEBP", quality=90, method=0)
+                else:
+                    im.save(afw.get_file(), "PNG", compress_level=1)
+        except (IOError, ValueError, atomicfile.AtomicFileWriteError) as e:
+            print("proxy img seq frame failed for '%s'" % orig_path, e)
+
+    return len(listing)
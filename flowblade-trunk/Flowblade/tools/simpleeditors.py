@@ -182,10 +182,7 @@ class BlenderProgramEditorWindow(Gtk.Window):
         self.container_action.render_blender_preview(self, self.editors, self.preview_frame)
 
     def get_preview_file(self):
-        filled_number_str = str(self.preview_frame).zfill(4)
-        preview_file = self.container_action.get_preview_media_dir() + "/frame" + filled_number_str + ".png"
-
-        return preview_file
+        return self.container_action.get_preview_frame_path(self.preview_frame)
 
     def preview_render_complete(self):
         self.preview_panel.preview_surface = cairo.ImageSurface.create_from_png(self.get_preview_file())
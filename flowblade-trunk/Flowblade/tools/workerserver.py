@@ -0,0 +1,494 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module runs headless render processes from a pool of pre-forked worker processes with
+Flowblade/MLT environment already initialized.
+
+Worker server process inits paths, prefs and MLT and imports headless render modules once, and then
+forks worker processes that wait for jobs on a local socket. A job is run by executing the same launch
+script that would be run in a new process, with stdin, stdout, stderr, environment and working directory
+of the launching process. Worker exits when job is done like a launched process would, and server forks
+a new worker to replace it.
+
+Main app uses launch_process() in place of subprocess.Popen(), jobs for launch scripts not served
+by worker server, or launched when all workers are busy, are run in new processes as before.
+"""
+
+import io
+import importlib
+import multiprocessing
+import os
+import pickle
+import runpy
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+import ccrutils
+import editorpersistance
+import mltheadlessutils
+import respaths
+import userfolders
+
+# Launch scripts that can be run in worker processes.
+WORKER_LAUNCH_SCRIPTS = ["flowbladegmicheadless", "flowbladefluxityheadless", "flowblademotionheadless",
+                         "flowbladeproxyheadless", "flowblademltxmlheadless", "flowbladeaudiorender"]
+
+# Modules imported by launch scripts, these are imported in server process before forking workers.
+_WORKER_MODULES = ["gmicheadless", "fluxityheadless", "motionheadless", "proxyheadless", "mltxmlheadless",
+                   "audiowaveformrenderer"]
+
+IDLE_WORKER_WAIT = 0.5 # Seconds launching process waits for a worker to take a job before launching a new process.
+JOB_RECEIVE_TIMEOUT = 5.0
+MAX_POOL_SIZE = 8
+
+_MAX_SOCKET_PATH_LENGTH = 100 # sockaddr_un path limit is 108 bytes on Linux.
+
+_READY_MSG = "ready"
+_JOB_MSG = b"j"
+_STARTED_MSG = "started"
+_EXIT_MSG = "exit"
+
+_server_process = None # Used in main app.
+_socket_path = None
+
+
+class WorkerUnavailableError(Exception):
+
+    def __init__(self, value):
+        self.value = value
+    def __str__(self):
+        return repr(self.value)
+
+
+# ------------------------------------------------------ main app interface
+def start_server():
+    global _server_process, _socket_path
+    if _server_process != None or editorpersistance.prefs.headless_worker_server == False:
+        return
+
+    socket_path = userfolders.get_cache_dir() + "worker_server_" + str(os.getpid())
+    if len(socket_path) > _MAX_SOCKET_PATH_LENGTH:
+        print("Worker server socket path too long, headless renders are launched in new processes.")
+        return
+
+    command_list = [sys.executable, respaths.LAUNCH_DIR + "flowbladeworkerserver",
+                    "socket_path:" + socket_path,
+                    "pool_size:" + str(get_pool_size()),
+                    "app_pid:" + str(os.getpid())]
+
+    log_file = open(userfolders.get_cache_dir() + "log_worker_server", "w")
+    try:
+        _server_process = subprocess.Popen(command_list, stdin=subprocess.DEVNULL, stdout=log_file, stderr=log_file)
+    except OSError as e:
+        print("Worker server launch failed:", e)
+        return
+    finally:
+        log_file.close()
+
+    _socket_path = socket_path
+
+def stop_server():
+    """
+    Idle workers exit with server, jobs already running in workers continue until done.
+    """
+    global _server_process, _socket_path
+    if _server_process == None:
+        return
+
+    _server_process.terminate()
+    try:
+        _server_process.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        _server_process.kill()
+        _server_process.wait()
+
+    _server_process = None
+    _socket_path = None
+
+def get_pool_size():
+    pool_size = editorpersistance.prefs.headless_worker_pool_size
+    if pool_size <= 0:
+        # Idle workers hold initialized MLT in memory, so we are using fewer than with render processes.
+        pool_size = min(max(multiprocessing.cpu_count() - 2, 1), MAX_POOL_SIZE // 2)
+    return pool_size
+
+def launch_process(command_list, stdin=None, stdout=None, stderr=None, universal_newlines=False, niceness=0):
+    """
+    Returns WorkerProcess if launch script in command_list [sys.executable, launch script, args...] was
+    run in worker process, or subprocess.Popen if it was launched in a new process.
+    """
+    if _socket_path != None and len(command_list) > 1 and os.path.basename(command_list[1]) in WORKER_LAUNCH_SCRIPTS:
+        try:
+            return WorkerProcess(command_list, stdin, stdout, stderr, universal_newlines, niceness)
+        except (OSError, WorkerUnavailableError):
+            pass # Server not running yet or all workers busy.
+
+    # preexec_fn is not safe to use in threaded app process, niceness is set with 'nice' command.
+    if niceness != 0:
+        command_list = ["nice", "-n", str(niceness)] + list(command_list)
+    return subprocess.Popen(command_list, stdin=stdin, stdout=stdout, stderr=stderr,
+                            universal_newlines=universal_newlines)
+
+
+class WorkerProcess:
+    """
+    Job running in worker process, provides the parts of subprocess.Popen interface used by app.
+    """
+    def __init__(self, command_list, stdin, stdout, stderr, universal_newlines, niceness):
+        self.args = command_list
+        self.pid = None
+        self.returncode = None
+        self.stdout = None
+        self.sent_signal = None
+        self.exited = threading.Event()
+
+        self.conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.conn.settimeout(IDLE_WORKER_WAIT)
+            self.conn.connect(_socket_path)
+            try:
+                reader = self.conn.makefile("r", encoding="utf-8")
+                if reader.readline().strip() != _READY_MSG:
+                    raise WorkerUnavailableError("worker server closed connection")
+            except socket.timeout:
+                raise WorkerUnavailableError("no idle workers")
+            self.conn.settimeout(None)
+
+            std_fds, close_fds = self._get_std_fds(stdin, stdout, stderr, universal_newlines)
+            try:
+                job = {"args":command_list[1:],
+                       "env":dict(os.environ),
+                       "cwd":os.getcwd(),
+                       "niceness":niceness,
+                       "launcher_pid":os.getpid()}
+                job_data = pickle.dumps(job)
+                socket.send_fds(self.conn, [_JOB_MSG], std_fds)
+                self.conn.sendall(struct.pack("!I", len(job_data)) + job_data)
+            finally:
+                for fd in close_fds:
+                    os.close(fd)
+
+            msg_type, sep, msg = reader.readline().strip().partition(" ")
+            if msg_type != _STARTED_MSG:
+                raise OSError("worker did not start job")
+            self.pid = int(msg)
+        except:
+            self.conn.close()
+            if self.stdout != None:
+                self.stdout.close()
+            raise
+
+        self.reader = reader
+        wait_thread = threading.Thread(target=self._wait_exit)
+        wait_thread.daemon = True
+        wait_thread.start()
+
+    def _get_std_fds(self, stdin, stdout, stderr, universal_newlines):
+        """
+        Returns (fds sent to worker, fds to close after sending).
+        """
+        std_fds = []
+        close_fds = []
+        for std_fd, std_arg in [(0, stdin), (1, stdout), (2, stderr)]:
+            if std_arg == None:
+                std_fds.append(std_fd)
+            elif std_arg == subprocess.PIPE:
+                if std_fd != 1:
+                    raise WorkerUnavailableError("only stdout pipe is supported")
+                read_fd, write_fd = os.pipe()
+                if universal_newlines == True:
+                    self.stdout = io.open(read_fd, "r")
+                else:
+                    self.stdout = io.open(read_fd, "rb")
+                std_fds.append(write_fd)
+                close_fds.append(write_fd)
+            elif std_arg == subprocess.DEVNULL:
+                null_fd = os.open(os.devnull, os.O_RDWR)
+                std_fds.append(null_fd)
+                close_fds.append(null_fd)
+            elif isinstance(std_arg, int):
+                std_fds.append(std_arg)
+            else:
+                std_fds.append(std_arg.fileno())
+        return (std_fds, close_fds)
+
+    def _wait_exit(self):
+        returncode = None
+        try:
+            for line in self.reader:
+                msg_type, sep, msg = line.strip().partition(" ")
+                if msg_type == _EXIT_MSG:
+                    returncode = int(msg)
+        except (OSError, ValueError):
+            pass
+
+        if returncode == None:
+            # Worker died without reporting exit code.
+            if self.sent_signal != None:
+                returncode = -self.sent_signal
+            else:
+                returncode = -1
+
+        self.conn.close()
+        self.returncode = returncode
+        self.exited.set()
+
+    def poll(self):
+        if self.exited.is_set():
+            return self.returncode
+        return None
+
+    def wait(self, timeout=None):
+        if self.exited.wait(timeout) == False:
+            raise subprocess.TimeoutExpired(self.args, timeout)
+        return self.returncode
+
+    def send_signal(self, sig):
+        if self.exited.is_set():
+            return
+        self.sent_signal = sig
+        try:
+            os.kill(self.pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+
+# ------------------------------------------------------ worker server process
+def main(root_path, socket_path, pool_size, app_pid):
+    mltheadlessutils.init_env(root_path)
+
+    for module_name in _WORKER_MODULES:
+        try:
+            importlib.import_module(module_name)
+        except Exception as e:
+            print("Worker server could not import", module_name, e)
+
+    server = WorkerServer(socket_path, int(pool_size), int(app_pid))
+    server.run()
+
+
+class WorkerServer:
+
+    def __init__(self, socket_path, pool_size, app_pid):
+        self.socket_path = socket_path
+        self.pool_size = min(max(pool_size, 1), MAX_POOL_SIZE)
+        self.app_pid = app_pid
+        self.running = True
+        self.idle_workers = set()
+
+        if os.path.exists(socket_path):
+            os.remove(socket_path) # Left over from crashed app with same pid.
+        self.listen_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listen_socket.bind(socket_path)
+        os.chmod(socket_path, 0o600)
+        self.listen_socket.listen(self.pool_size * 2)
+
+        # Workers write their pid here when they take a job.
+        self.busy_read_fd, self.busy_write_fd = os.pipe()
+        os.set_blocking(self.busy_read_fd, False)
+
+        signal.signal(signal.SIGTERM, self._terminate)
+
+    def run(self):
+        print("Worker server running with " + str(self.pool_size) + " workers.")
+        while self.running == True:
+            while len(self.idle_workers) < self.pool_size:
+                self._fork_worker()
+
+            self._read_busy_workers()
+
+            # Reap exited workers, busy workers exit when job is done and idle ones only if crashed.
+            while True:
+                try:
+                    pid, status = os.waitpid(-1, os.WNOHANG)
+                except ChildProcessError:
+                    break
+                if pid == 0:
+                    break
+                self.idle_workers.discard(pid)
+
+            # Workers are not needed after app has exited.
+            if os.getppid() != self.app_pid:
+                break
+
+            time.sleep(0.2)
+
+        self.listen_socket.close()
+        try:
+            os.remove(self.socket_path)
+        except OSError:
+            pass
+
+        self._read_busy_workers()
+        for pid in self.idle_workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        print("Worker server exited.")
+
+    def _terminate(self, signum, frame):
+        self.running = False
+
+    def _read_busy_workers(self):
+        try:
+            data = os.read(self.busy_read_fd, 4096)
+        except BlockingIOError:
+            return
+        for i in range(0, len(data) - len(data) % 4, 4):
+            pid, = struct.unpack("i", data[i:i + 4])
+            self.idle_workers.discard(pid)
+
+    def _fork_worker(self):
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid != 0:
+            self.idle_workers.add(pid)
+            return
+
+        # Worker process.
+        exit_code = 1
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            os.close(self.busy_read_fd)
+            conn, std_fds, job = self._wait_job()
+            os.write(self.busy_write_fd, struct.pack("i", os.getpid()))
+            os.close(self.busy_write_fd)
+            self.listen_socket.close()
+            exit_code = _run_job(conn, std_fds, job)
+        except:
+            traceback.print_exc()
+        finally:
+            os._exit(exit_code)
+
+    def _wait_job(self):
+        while True:
+            conn, addr = self.listen_socket.accept()
+            try:
+                return _receive_job(conn)
+            except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+                conn.close() # Launching process stopped waiting or failed, wait for next job.
+
+
+def _receive_job(conn):
+    conn.sendall((_READY_MSG + "\n").encode("utf-8"))
+    conn.settimeout(JOB_RECEIVE_TIMEOUT)
+
+    msg, std_fds, flags, addr = socket.recv_fds(conn, 1, 3)
+    if msg != _JOB_MSG or len(std_fds) != 3:
+        for fd in std_fds:
+            os.close(fd)
+        raise ValueError("no job received")
+
+    try:
+        job_length, = struct.unpack("!I", _receive_bytes(conn, 4))
+        job = pickle.loads(_receive_bytes(conn, job_length))
+    except:
+        for fd in std_fds:
+            os.close(fd)
+        raise
+
+    conn.settimeout(None)
+    return (conn, std_fds, job)
+
+def _receive_bytes(conn, length):
+    data = b""
+    while len(data) < length:
+        chunk = conn.recv(length - len(data))
+        if len(chunk) == 0:
+            raise EOFError("connection closed")
+        data += chunk
+    return data
+
+def _run_job(conn, std_fds, job):
+    """
+    Runs launch script like it would be run in a new process and returns exit code.
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    for std_fd, fd in zip([0, 1, 2], std_fds):
+        os.dup2(fd, std_fd)
+        os.close(fd)
+    # Buffering is decided again like it is at process start for new stdout and stderr.
+    sys.stdout = open(1, "w", closefd=False)
+    sys.stderr = open(2, "w", buffering=1, closefd=False)
+
+    os.environ.clear()
+    os.environ.update(job["env"])
+    os.environ[ccrutils.LAUNCHER_PID_ENV_VAR] = str(job["launcher_pid"])
+    try:
+        os.chdir(job["cwd"])
+    except OSError:
+        pass
+    if job["niceness"] != 0:
+        os.nice(job["niceness"])
+
+    conn.sendall((_STARTED_MSG + " " + str(os.getpid()) + "\n").encode("utf-8"))
+
+    sys.argv = job["args"]
+    exit_code = 0
+    try:
+        runpy.run_path(sys.argv[0], run_name="__main__")
+    except SystemExit as e:
+        exit_code = _get_exit_code(e.code)
+    except:
+        traceback.print_exc()
+        exit_code = 1
+
+    # Launch scripts start render threads and return, process exits when they are done.
+    _join_threads()
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    try:
+        conn.sendall((_EXIT_MSG + " " + str(exit_code) + "\n").encode("utf-8"))
+    except OSError:
+        pass
+    return exit_code
+
+def _join_threads():
+    while True:
+        threads = [t for t in threading.enumerate() if t is not threading.current_thread() and t.daemon == False]
+        if len(threads) == 0:
+            return
+        for t in threads:
+            t.join()
+
+def _get_exit_code(code):
+    if code == None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
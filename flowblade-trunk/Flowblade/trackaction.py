@@ -222,6 +222,9 @@ def _audio_levels_item_activated(widget, msg):
         updater.repaint_tline()
     elif msg == "snapping":
         snapping.snapping_on = widget.get_active()
+    elif msg == "filmstrip":
+        editorstate.display_clip_filmstrips = widget.get_active()
+        updater.repaint_tline()
     elif msg == "scrubbing":
         editorpersistance.prefs.audio_scrubbing = widget.get_active()
         editorpersistance.save()
@@ -23,33 +23,47 @@ Module manages undo and redo stacks and executes edit actions from them
 on user requests.
 """
 import time
+
+import editorpersistance
 import editorstate
 
 set_post_undo_redo_edit_mode = None # This is set at startup to avoid circular imports.
 repaint_tline = None
 
-# Max stack size.
-MAX_UNDOS = 35
+# Approximate memory sizes used to keep undo stack within memory budget.
+EDIT_MEMORY_SIZE = 2 * 1024 # Python side edit data.
+PRODUCER_MEMORY_SIZE = 4 * 1024 * 1024 # mlt.Producer no longer on timeline and only kept alive by edit.
+FILTER_MEMORY_SIZE = 64 * 1024 # mlt.Filter or mlt.Transition kept alive by edit.
+
+# Edits that can be merged are collapsed into previous edit if done within this time.
+COLLAPSE_INTERVAL_SECONDS = 2.0
 
 # EditActions are placed in this stack after their do_edit()
 # method has been called.
 undo_stack = []
 
+# Approximate memory held by each edit in undo stack, in bytes.
+undo_sizes = []
+
 # Index is the stack pointer that tracks done undos and redos.
 # The value of index is index of next undo + 1
 # The value of index is index of next redo or == stack size if
 # no redos.
 index = 0
 
+_last_register_time = 0.0
+
 # Some menu items are set active/deactive based on undo stack state.
 save_item = None
 undo_item = None 
 redo_item = None
 
 def clear_undos():
-    global undo_stack, index
+    global undo_stack, undo_sizes, index
     undo_stack = []
+    undo_sizes = []
     index = 0
+    _update_memory_info()
 
 def set_post_undo_redo_callback(undo_redo_callback):
     global set_post_undo_redo_edit_mode
@@ -65,26 +79,91 @@ def register_edit(undo_edit):
     """
     Adds a performed EditAction into undo stack
     """
-    global index
+    global index, _last_register_time
     
     # New edit action clears all redos(== undos after index)
     if index != len(undo_stack) and (len(undo_stack) != 0):
         del undo_stack[index:]
- 
-    # Keep stack in size, if too big remove undo at 0
-    if len(undo_stack) > MAX_UNDOS:
+        del undo_sizes[index:]
+
+    # Runs of small edits on same target are collapsed into a single edit.
+    register_time = time.monotonic()
+    collapsed = False
+    if len(undo_stack) > 0 and register_time - _last_register_time < COLLAPSE_INTERVAL_SECONDS:
+        collapsed = undo_stack[-1].merge(undo_edit)
+    _last_register_time = register_time
+
+    if collapsed == True:
+        undo_sizes[-1] = get_edit_memory_size(undo_stack[-1])
+    else:
+        # Add to stack and grow index
+        undo_stack.append(undo_edit)
+        undo_sizes.append(get_edit_memory_size(undo_edit))
+        index = index + 1
+
+    # Keep stack within memory budget, if too big remove undos from bottom.
+    budget = editorpersistance.prefs.undo_memory_budget_mb * 1024 * 1024
+    while sum(undo_sizes) > budget and len(undo_stack) > 1:
         del undo_stack[0]
+        del undo_sizes[0]
         index = index - 1
-        
-    # Add to stack and grow index
-    undo_stack.append(undo_edit)
-    index = index + 1
-    
+
+    _update_memory_info()
+
     if editorstate.PROJECT().last_save_path != None:
         save_item.set_sensitive(True) # Disabled at load and save, first edit enables if project has been saved.
     undo_item.set_sensitive(True)
     redo_item.set_sensitive(False)
 
+def get_memory_stats():
+    """
+    Returns tuple (edits_count, used_bytes, budget_bytes).
+    """
+    return (len(undo_stack), sum(undo_sizes), editorpersistance.prefs.undo_memory_budget_mb * 1024 * 1024)
+
+def get_edit_memory_size(undo_edit):
+    """
+    Returns approximate memory in bytes kept alive by edit.
+    Clips still on timeline are not counted because edit is not the only holder for those.
+    """
+    try:
+        # ConsolidatedEditAction
+        return sum(get_edit_memory_size(edit_action) for edit_action in undo_edit.edit_actions)
+    except AttributeError:
+        pass
+
+    seq = editorstate.current_sequence()
+    size = EDIT_MEMORY_SIZE
+    for value in undo_edit.__dict__.values():
+        if isinstance(value, (list, tuple)):
+            for item in value:
+                size += _get_object_memory_size(item, seq)
+        else:
+            size += _get_object_memory_size(value, seq)
+
+    return size
+
+def _get_object_memory_size(obj, seq):
+    if hasattr(obj, "mlt_filter"): # mltfilters.FilterObject
+        return FILTER_MEMORY_SIZE
+    if hasattr(obj, "transition") and hasattr(obj, "destroy_id"): # mlttransitions.CompositorObject
+        return FILTER_MEMORY_SIZE
+    if hasattr(obj, "clip_in") and hasattr(obj, "filters") and hasattr(obj, "id"): # Clip producer
+        if obj.is_blanck_clip == True or seq.get_clip_for_id(obj.id) == obj:
+            return 0
+        return PRODUCER_MEMORY_SIZE + FILTER_MEMORY_SIZE * len(obj.filters)
+    return 0
+
+def _update_memory_info():
+    if undo_item == None:
+        return
+
+    edits_count, used_bytes, budget_bytes = get_memory_stats()
+    info = _("Undo history: ") + str(edits_count) + _(" edits, ") \
+            + "{0:.1f}".format(used_bytes / (1024.0 * 1024.0)) + " / " + str(budget_bytes // (1024 * 1024)) + " MB"
+    undo_item.set_tooltip_text(info)
+    redo_item.set_tooltip_text(info)
+
 def do_undo_and_repaint(widget=None, data=None):
     do_undo()
     repaint_tline()
@@ -94,7 +173,9 @@ def do_redo_and_repaint(widget=None, data=None):
     repaint_tline()
     
 def do_undo():
-    global index
+    global index, _last_register_time
+    _last_register_time = 0.0 # Edits done after undo are not collapsed with earlier edits.
+
     if index == 0:
         return
     
@@ -118,7 +199,8 @@ def do_undo():
     redo_item.set_sensitive(True)
     
 def do_redo():
-    global index
+    global index, _last_register_time
+    _last_register_time = 0.0
         
     # If we are at the top of the stack, can't do redo
     if index == len(undo_stack):
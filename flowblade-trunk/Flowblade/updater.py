@@ -150,6 +150,14 @@ def repaint_tline():
     gui.tline_scale.widget.queue_draw()
     gui.tline_render_strip.widget.queue_draw()
 
+def media_file_thumbnail_updated(media_file):
+    """
+    Called when thumbnail written in background replaces placeholder icon.
+    """
+    tlinewidgets.clip_thumbnails.pop(media_file.path, None)
+    gui.media_list_view.widget.queue_draw()
+    repaint_tline()
+
 # --- SCROLL AND LENGTH EVENTS
 def update_tline_scrollbar():
     """
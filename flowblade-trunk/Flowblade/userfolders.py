@@ -157,8 +157,16 @@ def _maybe_create_xdg_dirs():
     # Cache individual folders
     if not os.path.exists(get_cache_dir() + appconsts.AUTOSAVE_DIR):
         os.mkdir(get_cache_dir() + appconsts.AUTOSAVE_DIR)
+    if not os.path.exists(get_cache_dir() + appconsts.AUTOSAVE_CHUNKS_DIR):
+        os.mkdir(get_cache_dir() + appconsts.AUTOSAVE_CHUNKS_DIR)
     if not os.path.exists(get_cache_dir() + appconsts.THUMBNAILS_DIR):
         os.mkdir(get_cache_dir() + appconsts.THUMBNAILS_DIR)
+    if not os.path.exists(get_cache_dir() + appconsts.FILMSTRIP_DIR):
+        os.mkdir(get_cache_dir() + appconsts.FILMSTRIP_DIR)
+    if not os.path.exists(get_cache_dir() + appconsts.CONTAINER_PREVIEWS_DIR):
+        os.mkdir(get_cache_dir() + appconsts.CONTAINER_PREVIEWS_DIR)
+    if not os.path.exists(get_cache_dir() + appconsts.RENDER_CHUNKS_DIR):
+        os.mkdir(get_cache_dir() + appconsts.RENDER_CHUNKS_DIR)
     if not os.path.exists(get_cache_dir() + appconsts.GMIC_DIR):
         os.mkdir(get_cache_dir() + appconsts.GMIC_DIR)
     if not os.path.exists(get_cache_dir() + appconsts.MATCH_FRAME_DIR):